@@ -0,0 +1,632 @@
+"""
+Comunicación serial asíncrona con ESP32 LoRa
+Transporte asyncio sobre el descriptor del puerto serial: las líneas llegan
+al event loop como eventos tipados, sin threads de lectura ni saltos entre
+threads. En Windows, donde el event loop no puede esperar sobre el puerto,
+un thread lee con pyserial y entrega los bytes al loop.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import logging
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import serial
+
+from lora_protocol import (
+    LoRaEvent, ErrorEvent, StatusEvent, RssiEvent, PongEvent, ConfigEvent, parse_line
+)
+import serial_comm
+from log_pipeline import raw_logger, raw_trace_enabled
+from metrics import LineMetrics
+from serial_capture import DIRECTION_TX
+from serial_comm import (
+    LineFramer, log_event, serial_handshake, AirtimePacer, TxQueueFullError, TX_QUEUE_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Eventos pendientes de consumir antes de empezar a descartar
+EVENT_QUEUE_SIZE = 10000
+
+# Espera por defecto de la respuesta a una consulta (segundos). El firmware no
+# lee el serial mientras transmite, así que debe cubrir una trama en aire
+QUERY_TIMEOUT = 1.0
+# Una consulta que expiró sigue esperando su respuesta tardía (para que no
+# la tome la consulta siguiente) hasta este plazo desde el envío (segundos)
+STALE_REPLY_WINDOW = 3.0
+
+# Lectura con un thread en vez de connect_read_pipe (Windows no soporta
+# pipes de asyncio sobre un puerto COM)
+THREADED_TRANSPORT = sys.platform == "win32"
+
+
+def _reply_kind(event: LoRaEvent) -> Optional[str]:
+    """Comando al que responde un evento, o None si no es una respuesta"""
+    kind = type(event)
+    if kind is RssiEvent:
+        return "RSSI"
+    if kind is PongEvent:
+        return "PING"
+    if kind is StatusEvent and event.code == "OK":
+        return "STATUS"
+    if kind is ConfigEvent and event.key == "ID":
+        return "ID"
+    return None
+
+
+def _drop_expired(waiters: Deque[Tuple[asyncio.Future, float]], now: float):
+    """Olvida las consultas expiradas cuya respuesta ya no se espera"""
+    while waiters and waiters[0][0].done() and now - waiters[0][1] > STALE_REPLY_WINDOW:
+        waiters.popleft()
+
+
+class _SerialReadProtocol(asyncio.Protocol):
+    """Protocolo de lectura: entrega los bytes recibidos al comunicador"""
+
+    def __init__(self, owner: "AsyncLoRaSerialCommunicator"):
+        self._owner = owner
+
+    def data_received(self, data: bytes):
+        self._owner._data_received(data)
+
+    def eof_received(self):
+        # Devolver False cierra el transporte y provoca connection_lost
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._owner._connection_lost(exc)
+
+
+class _ThreadedSerialTransport:
+    """
+    Transporte de lectura y escritura para THREADED_TRANSPORT: un thread
+    lee el puerto (bloqueando hasta READ_TIMEOUT) y entrega los bytes al
+    protocolo en el event loop; las escrituras van directo al puerto
+    """
+
+    def __init__(self, serial_port: serial.Serial, protocol: asyncio.Protocol,
+                 loop: asyncio.AbstractEventLoop):
+        self._port = serial_port
+        self._protocol = protocol
+        self._loop = loop
+        self._closing = False
+        self._port.timeout = serial_comm.READ_TIMEOUT
+        self._thread = threading.Thread(target=self._read_loop, daemon=True,
+                                        name=f"serial-{serial_port.port}")
+        self._thread.start()
+
+    def _read_loop(self):
+        error = None
+        try:
+            while not self._closing:
+                # Bloquear hasta el primer byte y vaciar lo ya disponible
+                data = self._port.read(1)
+                if data and self._port.in_waiting:
+                    data += self._port.read(self._port.in_waiting)
+                if data and not self._closing:
+                    self._loop.call_soon_threadsafe(self._protocol.data_received, data)
+        except (serial.SerialException, OSError) as e:
+            error = None if self._closing else e
+        finally:
+            self._port.close()
+        try:
+            self._loop.call_soon_threadsafe(self._protocol.connection_lost, error)
+        except RuntimeError:
+            pass  # El event loop ya terminó
+
+    def write(self, data: bytes):
+        try:
+            self._port.write(data)
+        except (serial.SerialException, OSError) as e:
+            # Igual que un transporte de asyncio: el error cierra la conexión
+            logger.error(f"❌ Error al enviar comando: {e}")
+            self.close()
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self):
+        """Termina la lectura; el thread cierra el puerto y avisa connection_lost"""
+        if self._closing:
+            return
+        self._closing = True
+        try:
+            self._port.cancel_read()
+        except (serial.SerialException, OSError, AttributeError):
+            pass
+
+
+class AsyncTxScheduler:
+    """
+    Versión asyncio de serial_comm.TxScheduler: cola acotada de
+    transmisiones entregadas al ritmo que permite el tiempo en aire
+    """
+
+    def __init__(self, write: Callable[[str], bool], max_queue: int = TX_QUEUE_SIZE,
+                 pacer: Optional[AirtimePacer] = None):
+        """
+        Args:
+            write: Función que escribe un comando en el transporte; False si falla
+            max_queue: Mensajes pendientes como máximo
+            pacer: Control de tiempo en aire (default: radio de src/main.cpp)
+        """
+        self.max_queue = max_queue
+        self.pacer = pacer or AirtimePacer()
+        self._write = write
+        self._queue = deque()
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Mensajes esperando transmisión"""
+        return len(self._queue)
+
+    async def submit(self, command: str, payload_bytes: int = 0,
+                     wait: bool = False, timeout: Optional[float] = None):
+        """
+        Encola un comando TX
+
+        Args:
+            command: Línea de comando sin '\\n'
+            payload_bytes: Bytes de usuario (para el throughput efectivo)
+            wait: Esperar lugar en la cola en vez de rechazar
+            timeout: Espera máxima si wait=True (None = sin límite)
+
+        Raises:
+            TxQueueFullError: Si la cola está llena (o sigue llena tras timeout)
+        """
+        async with self._changed:
+            if len(self._queue) >= self.max_queue:
+                try:
+                    if not wait:
+                        raise asyncio.TimeoutError
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: len(self._queue) < self.max_queue),
+                        timeout)
+                except asyncio.TimeoutError:
+                    self.pacer.rejected += 1
+                    raise TxQueueFullError(
+                        f"Cola de transmisión llena ({self.max_queue} mensajes pendientes)") from None
+            self._queue.append((command, payload_bytes))
+            self._changed.notify_all()
+
+    def start(self):
+        """Inicia la tarea de transmisión"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Detiene la tarea; los mensajes pendientes se conservan"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._queue)
+
+            delay = self.pacer.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            command, payload_bytes = self._queue[0]
+            if not self._write(command):
+                # Conservar el mensaje para reintentarlo tras reconectar
+                return
+
+            self.pacer.record(payload_bytes)
+            async with self._changed:
+                self._queue.popleft()
+                self._changed.notify_all()
+
+
+class AsyncLoRaSerialCommunicator:
+    """
+    Comunicador LoRa para asyncio
+
+    Los eventos recibidos se consumen iterando el comunicador:
+
+        comm = AsyncLoRaSerialCommunicator()
+        await comm.connect("/dev/ttyUSB0")
+        async for event in comm:
+            ...
+
+    La iteración termina al desconectar o al perder el puerto. En POSIX el
+    transporte trabaja sobre el descriptor del puerto; en Windows usa un
+    thread de lectura (ver THREADED_TRANSPORT).
+    """
+
+    def __init__(self, baudrate: int = 115200, event_queue_size: int = EVENT_QUEUE_SIZE):
+        """
+        Inicializa el comunicador
+
+        Args:
+            baudrate: Velocidad de comunicación (default: 115200)
+            event_queue_size: Eventos sin consumir antes de descartar
+        """
+        self.baudrate = baudrate
+        self.serial_port: Optional[serial.Serial] = None
+        self.is_connected = False
+        self.dropped_events = 0
+        # Última vez que llegaron datos del puerto (time.monotonic)
+        self.last_rx = 0.0
+        # Captura opcional de lo leído y escrito (serial_capture.CaptureWriter)
+        self.recorder = None
+        # Contadores de /metrics (con el nombre del puerto al conectar)
+        self.metrics = LineMetrics()
+
+        self._framer = LineFramer()
+        self._events: asyncio.Queue = asyncio.Queue(maxsize=event_queue_size)
+        self._read_transport: Optional[asyncio.ReadTransport] = None
+        self._write_transport: Optional[asyncio.WriteTransport] = None
+
+        # Transmisiones LoRa espaciadas según el tiempo en aire
+        self.tx_scheduler = AsyncTxScheduler(self._write_command)
+
+        # Consultas esperando respuesta, por comando y en orden de envío:
+        # (future, instante de envío)
+        self._pending: Dict[str, Deque[Tuple[asyncio.Future, float]]] = defaultdict(deque)
+
+    # ===================== CONEXIÓN =====================
+
+    async def connect(self, port: str, ready_timeout: Optional[float] = None) -> bool:
+        """
+        Conecta al puerto serial especificado
+
+        Espera el READY del firmware (o la respuesta a un PING si ya estaba
+        corriendo) en un executor; si no llega dentro del plazo la conexión
+        sigue igual, con una advertencia.
+
+        Args:
+            port: Nombre del puerto (ej: 'COM3 - USB Serial' o '/dev/ttyUSB0')
+            ready_timeout: Espera máxima del saludo (default: serial_comm.READY_TIMEOUT)
+
+        Returns:
+            True si la conexión fue exitosa
+        """
+        port_name = port.split(' - ')[0] if ' - ' in port else port
+        self.metrics = LineMetrics(port_name)
+        logger.info(f"🔌 Conectando al puerto {port_name}...")
+
+        loop = asyncio.get_running_loop()
+        try:
+            self.serial_port = await loop.run_in_executor(None, self._open_port, port_name)
+
+            # Esperar a que el ESP32 esté listo
+            self._framer.reset()
+            self._drain_events()
+            if ready_timeout is None:
+                ready_timeout = serial_comm.READY_TIMEOUT
+            start = time.monotonic()
+            ready, lines, pings = await loop.run_in_executor(
+                None, lambda: serial_handshake(self.serial_port, ready_timeout,
+                                               framer=self._framer))
+            elapsed_ms = (time.monotonic() - start) * 1000
+
+            if THREADED_TRANSPORT:
+                # Un solo transporte para leer y escribir; cierra el puerto al cerrarse
+                self._read_transport = self._write_transport = _ThreadedSerialTransport(
+                    self.serial_port, _SerialReadProtocol(self), loop)
+            else:
+                # Lectura: el transporte cierra el puerto serial al cerrarse
+                self._read_transport, _ = await loop.connect_read_pipe(
+                    lambda: _SerialReadProtocol(self), self.serial_port)
+
+                # Escritura: copia del descriptor para que cada transporte cierre el suyo
+                write_pipe = os.fdopen(os.dup(self.serial_port.fileno()), 'wb', buffering=0)
+                self._write_transport, _ = await loop.connect_write_pipe(asyncio.Protocol,
+                                                                         write_pipe)
+
+        except (serial.SerialException, OSError) as e:
+            logger.error(f"❌ Error de conexión: {e}")
+            self._close_transports()
+            return False
+
+        self.is_connected = True
+        self.last_rx = time.monotonic()
+        if ready:
+            logger.info(f"✅ Conectado exitosamente a {port_name} ({ready.raw} en {elapsed_ms:.0f} ms)")
+        else:
+            logger.warning(f"⚠️  Conectado a {port_name} sin READY ni PONG en {elapsed_ms:.0f} ms")
+        # Lo recibido durante el saludo (banner, READY) se entrega como siempre
+        if self.recorder and lines:
+            # Las líneas ya separadas: se guardan como un bloque terminado en '\n'
+            self.recorder.record("".join(f"{line}\n" for line in lines).encode('utf-8'))
+        self._handle_lines(lines)
+        # Los PONG tardíos de los PING del saludo no responden a un ping() posterior:
+        # ocupan su lugar como consultas ya expiradas (ver _resolve_reply)
+        for sent in pings:
+            expired = loop.create_future()
+            expired.cancel()
+            self._pending["PING"].append((expired, sent))
+        self.tx_scheduler.start()
+
+        await self.request_status()
+        return True
+
+    def _open_port(self, port_name: str) -> serial.Serial:
+        return serial.Serial(
+            port=port_name,
+            baudrate=self.baudrate,
+            timeout=0,
+            write_timeout=1
+        )
+
+    async def disconnect(self):
+        """Desconecta del puerto serial y termina la iteración de eventos"""
+        logger.info("🔌 Desconectando...")
+        await self.tx_scheduler.stop()
+        self._close_transports()
+        logger.info("✅ Desconectado exitosamente")
+
+    def abort(self, detail: str):
+        """
+        Da el enlace por perdido (ej: el firmware no responde): cierra el
+        puerto y termina la iteración con ERROR:SERIAL_LOST como si el
+        puerto hubiera desaparecido. La cola de transmisión se conserva
+        """
+        if self.is_connected:
+            logger.error(f"❌ Enlace abortado: {detail}")
+            self._put_event(ErrorEvent(f"ERROR:SERIAL_LOST:{detail}", "SERIAL_LOST", detail))
+        self._close_transports()
+
+    def _close_transports(self):
+        self.is_connected = False
+
+        if self._write_transport:
+            self._write_transport.close()
+            self._write_transport = None
+
+        if self._read_transport:
+            # Cierra también el puerto serial; connection_lost encola el fin de la iteración
+            self._read_transport.close()
+        elif self.serial_port:
+            if self.serial_port.is_open:
+                self.serial_port.close()
+            self.serial_port = None
+
+    # ===================== ENVÍO =====================
+
+    def _write_command(self, command: str) -> bool:
+        """
+        Escribe una línea de comando en el transporte
+
+        Args:
+            command: Comando sin '\\n' (ej: 'STATUS', 'TX:Nombre:Mensaje')
+
+        Returns:
+            True si el comando se entregó al transporte
+        """
+        if not self.is_connected or not self._write_transport \
+                or self._write_transport.is_closing():
+            return False
+        payload = f"{command}\n".encode('utf-8')
+        self._write_transport.write(payload)
+        if self.recorder:
+            self.recorder.record(payload, DIRECTION_TX)
+        return True
+
+    async def send(self, command: str) -> bool:
+        """
+        Envía una línea de comando al ESP32 (sin pasar por la cola de TX)
+
+        Args:
+            command: Comando sin '\\n' (ej: 'STATUS', 'RSSI')
+
+        Returns:
+            True si el comando se entregó al transporte
+        """
+        return self._write_command(command)
+
+    async def send_message(self, sender_name: str, message: str,
+                           wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Encola un mensaje para enviarlo vía LoRa
+
+        Args:
+            sender_name: Nombre del remitente
+            message: Contenido del mensaje
+            wait: Esperar lugar en la cola de transmisión si está llena
+            timeout: Espera máxima en segundos si wait=True
+
+        Returns:
+            True si el mensaje quedó en cola, False si no hay conexión
+
+        Raises:
+            TxQueueFullError: Si la cola de transmisión está llena
+        """
+        if not self.is_connected:
+            logger.warning("⚠️  Intento de envío sin conexión activa")
+            return False
+
+        # Formato: TX:Nombre:Mensaje\n
+        await self.tx_scheduler.submit(f"TX:{sender_name}:{message}",
+                                       len(message.encode('utf-8')), wait, timeout)
+        logger.info("📡 Enviando mensaje de '%s': %s", sender_name, message)
+        return True
+
+    async def request_status(self) -> bool:
+        """Solicita el estado del dispositivo"""
+        return await self.send("STATUS")
+
+    async def request_rssi(self) -> bool:
+        """Solicita el RSSI del último mensaje"""
+        return await self.send("RSSI")
+
+    async def set_device_id(self, device_id: str) -> bool:
+        """
+        Configura el ID del dispositivo
+
+        Args:
+            device_id: ID en formato hexadecimal
+        """
+        return await self.send(f"ID:{device_id}")
+
+    # ===================== CONSULTAS =====================
+    # El firmware responde cada comando en orden, así que cada respuesta se
+    # asigna a la consulta pendiente más antigua del mismo comando. Las
+    # respuestas sin consulta pendiente (ej: el STATUS al conectar) solo
+    # llegan como eventos. Una consulta que expiró conserva su lugar durante
+    # STALE_REPLY_WINDOW: si su respuesta llega tarde se descarta en vez de
+    # resolver la consulta siguiente con datos viejos.
+
+    async def _query(self, command: str, reply_kind: str, timeout: float) -> LoRaEvent:
+        """
+        Envía un comando y espera el evento que lo responde
+
+        Raises:
+            ConnectionError: Si no hay conexión, falla el envío o se pierde
+                             la conexión durante la espera
+            asyncio.TimeoutError: Si no llega respuesta en timeout segundos
+        """
+        if not self.is_connected:
+            raise ConnectionError("No hay conexión con el dispositivo")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic())
+        waiters = self._pending[reply_kind]
+        _drop_expired(waiters, entry[1])
+        waiters.append(entry)
+        if not self._write_command(command):
+            # No va a llegar respuesta: fallar ya en vez de esperar el timeout
+            waiters.remove(entry)
+            raise ConnectionError(f"No se pudo enviar {command} al dispositivo")
+        # Al expirar o cancelarse, la consulta queda en la cola (ver _resolve_reply)
+        return await asyncio.wait_for(future, timeout)
+
+    async def query_status(self, timeout: float = QUERY_TIMEOUT) -> StatusEvent:
+        """Consulta el estado del dispositivo (incluye su ID)"""
+        return await self._query("STATUS", "STATUS", timeout)
+
+    async def query_rssi(self, timeout: float = QUERY_TIMEOUT) -> Optional[float]:
+        """Consulta el RSSI del último paquete recibido, en dBm"""
+        event = await self._query("RSSI", "RSSI", timeout)
+        return event.rssi
+
+    async def ping(self, timeout: float = QUERY_TIMEOUT) -> float:
+        """
+        Envía PING y espera PONG
+
+        Returns:
+            Tiempo de ida y vuelta en segundos
+        """
+        start = time.perf_counter()
+        await self._query("PING", "PING", timeout)
+        return time.perf_counter() - start
+
+    async def configure_device_id(self, device_id: str, timeout: float = QUERY_TIMEOUT) -> str:
+        """
+        Configura el ID del dispositivo y espera la confirmación
+
+        Args:
+            device_id: ID en formato hexadecimal
+
+        Returns:
+            ID confirmado por el firmware (hexadecimal)
+        """
+        event = await self._query(f"ID:{device_id}", "ID", timeout)
+        return event.value
+
+    def _resolve_reply(self, event: LoRaEvent):
+        kind = _reply_kind(event)
+        if kind is None:
+            return
+        waiters = self._pending.get(kind)
+        if not waiters:
+            return
+        _drop_expired(waiters, time.monotonic())
+        if waiters:
+            future, _ = waiters.popleft()
+            if not future.done():
+                future.set_result(event)
+            # Si la consulta ya había expirado, la respuesta era suya: se descarta
+
+    def _fail_pending(self, detail: str):
+        for waiters in self._pending.values():
+            while waiters:
+                future, _ = waiters.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError(detail))
+
+    # ===================== RECEPCIÓN =====================
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> LoRaEvent:
+        event = await self._events.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def _data_received(self, data: bytes):
+        self.last_rx = time.monotonic()
+        if self.recorder:
+            self.recorder.record(data)
+        self.feed(data)
+
+    def feed(self, data: bytes):
+        """
+        Procesa bytes como si se hubieran leído del puerto (ej: reproducir
+        una captura sin hardware, ver serial_capture.replay_async)
+
+        Args:
+            data: Bytes crudos (pueden cortar líneas a la mitad)
+        """
+        self._handle_lines(self._framer.feed(data))
+
+    def _handle_lines(self, lines):
+        trace = raw_trace_enabled()
+        for line in lines:
+            if trace:
+                raw_logger.debug("[SERIAL RAW] %s", line)
+            self._handle_line(line)
+
+    def _handle_line(self, line: str):
+        started = self.metrics.parse_started()
+        event = parse_line(line)
+        self.metrics.observe(event, started)
+        log_event(event)
+        self._resolve_reply(event)
+        self._put_event(event)
+
+    def _connection_lost(self, exc: Optional[Exception]):
+        if self.is_connected:
+            # El puerto desapareció sin llamar a disconnect()
+            self.is_connected = False
+            detail = str(exc) if exc else "puerto cerrado"
+            logger.error(f"❌ Error de lectura: {detail}")
+            self._put_event(ErrorEvent(f"ERROR:SERIAL_LOST:{detail}", "SERIAL_LOST", detail))
+
+        if self._write_transport:
+            self._write_transport.close()
+            self._write_transport = None
+        self._read_transport = None
+        self.serial_port = None
+        self._fail_pending("Conexión con el dispositivo cerrada")
+        self._put_event(None)
+
+    def _put_event(self, event: Optional[LoRaEvent]):
+        try:
+            self._events.put_nowait(event)
+        except asyncio.QueueFull:
+            if event is None:
+                # El fin de la iteración no se puede perder: hacer lugar
+                self._events.get_nowait()
+                self._events.put_nowait(None)
+            self.dropped_events += 1
+
+    def _drain_events(self):
+        while not self._events.empty():
+            self._events.get_nowait()
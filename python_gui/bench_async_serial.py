@@ -0,0 +1,116 @@
+"""
+Benchmark de latencia serial → event loop del servidor web
+Compara el camino anterior (thread lector + run_coroutine_threadsafe por
+línea) con AsyncLoRaSerialCommunicator (transporte asyncio, sin saltos de
+thread). La latencia se mide hasta la corrutina que hace el broadcast al
+WebSocket, sobre un par pty
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import serial_comm
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from serial_comm import LoRaSerialCommunicator
+
+LINES = 1000
+LINE_INTERVAL = 0.001
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench_line() -> bytes:
+    return f"RX:bench:{time.perf_counter_ns()}:-80.00\n".encode()
+
+
+async def write_lines(master: int):
+    for _ in range(LINES):
+        os.write(master, bench_line())
+        await asyncio.sleep(LINE_INTERVAL)
+
+
+async def run_threaded(port: str, master: int) -> list:
+    """Camino anterior: callback en el thread lector + salto al event loop"""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    done = asyncio.Event()
+
+    async def broadcast(sent_ns: int):
+        latencies.append(time.perf_counter_ns() - sent_ns)
+        if len(latencies) >= LINES:
+            done.set()
+
+    def on_message(sender, message, rssi):
+        asyncio.run_coroutine_threadsafe(broadcast(int(message)), loop)
+
+    comm = LoRaSerialCommunicator()
+    comm.on_message_received = on_message
+    if not await loop.run_in_executor(None, comm.connect, port):
+        raise RuntimeError(f"No se pudo abrir {port}")
+    try:
+        await write_lines(master)
+        await asyncio.wait_for(done.wait(), timeout=10)
+    finally:
+        comm.disconnect()
+    return latencies
+
+
+async def run_async(port: str, master: int) -> list:
+    """Camino nuevo: eventos consumidos en el propio event loop"""
+    latencies = []
+
+    async def broadcast(sent_ns: int):
+        latencies.append(time.perf_counter_ns() - sent_ns)
+
+    comm = AsyncLoRaSerialCommunicator()
+    if not await comm.connect(port):
+        raise RuntimeError(f"No se pudo abrir {port}")
+
+    async def consume():
+        async for event in comm:
+            await broadcast(int(event.text))
+            if len(latencies) >= LINES:
+                break
+
+    consumer = asyncio.create_task(consume())
+    try:
+        await write_lines(master)
+        await asyncio.wait_for(consumer, timeout=10)
+    finally:
+        await comm.disconnect()
+    return latencies
+
+
+async def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("Latencia serial → broadcast WebSocket (par pty)")
+    print("=" * 60)
+    print(f"Líneas: {LINES} cada {LINE_INTERVAL * 1000:.0f} ms")
+    print()
+    print(f"{'Camino':<22} {'p50 (µs)':>10} {'p99 (µs)':>10} {'máx (µs)':>10}")
+
+    for name, runner in (("thread + threadsafe", run_threaded), ("asyncio nativo", run_async)):
+        master, slave = os.openpty()
+        try:
+            latencies = [ns / 1000 for ns in await runner(os.ttyname(slave), master)]
+        finally:
+            os.close(master)
+            os.close(slave)
+        print(f"{name:<22} {statistics.median(latencies):>10.0f} "
+              f"{percentile(latencies, 0.99):>10.0f} {max(latencies):>10.0f}")
+
+
+if __name__ == "__main__":
+    # En el par pty nadie contesta el saludo: no esperar su plazo completo
+    serial_comm.READY_TIMEOUT = 0.1
+    asyncio.run(main())
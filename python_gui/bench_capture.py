@@ -0,0 +1,126 @@
+"""
+Benchmark de captura y reproducción del tráfico serial
+Graba una captura sintética con el ritmo y la mezcla de líneas de un enlace
+real (bloques cortados como en las lecturas del puerto), la recorre con
+mmap y la reproduce dentro de LoRaSerialCommunicator a máxima velocidad y
+a N× tiempo real
+"""
+
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from serial_capture import CaptureWriter, CaptureReader, replay, replay_async
+from serial_comm import LoRaSerialCommunicator
+
+LINES = 50_000
+LINE_RATE = 200.0         # Líneas por segundo en la captura
+TIMED_SECONDS = 2.0       # Tramo reproducido con tiempos reales
+SPEEDS = (1.0, 10.0)
+
+SAMPLE_LINES = [
+    "RX:nodo{i}:mensaje de prueba {i}:-87.5",
+    "DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED",
+    "STATUS:OK:ID:A1B2C3D4E5F60708",
+    "RSSI:-92.0",
+    "SENT:OK:yo:hola {i}",
+]
+
+
+def synthetic_stream(rng: random.Random):
+    """(instante, bloque) como los entregaría el puerto: líneas cortadas al azar"""
+    pending = b""
+    t = 0.0
+    for i in range(LINES):
+        pending += (rng.choice(SAMPLE_LINES).format(i=i % 50) + "\r\n").encode()
+        t += rng.expovariate(LINE_RATE)
+        cut = rng.randrange(1, len(pending) + 1)
+        yield t, pending[:cut]
+        pending = pending[cut:]
+    if pending:
+        yield t, pending
+
+
+def write_capture(path: str) -> tuple:
+    rng = random.Random(7)
+    chunks = list(synthetic_stream(rng))
+    writer = CaptureWriter(path)
+    start = time.perf_counter()
+    for _, chunk in chunks:
+        writer.record(chunk)
+    elapsed = time.perf_counter() - start
+    writer.close()
+
+    # La misma captura con los instantes del enlace simulado
+    with CaptureWriter(path + ".timed") as timed:
+        for t, chunk in chunks:
+            timed.record(chunk, t=t)
+    return len(chunks), elapsed
+
+
+def quiet_feed(comm: LoRaSerialCommunicator):
+    lines = [0]
+
+    def count(_event):
+        lines[0] += 1
+    comm.on_event = count
+    return comm.feed, lines
+
+
+def main():
+    # Se mide el pipeline, no la salida por consola
+    logging.disable(logging.INFO)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "bench.lcap")
+
+    print("=" * 60)
+    print(f"Captura serial: {LINES} líneas a ~{LINE_RATE:.0f} líneas/s")
+    print("=" * 60)
+
+    records, elapsed = write_capture(path)
+    size = os.path.getsize(path)
+    print(f"Grabar:     {elapsed / records * 1e6:6.2f} µs/bloque | {records} bloques | "
+          f"{size / 1024:.0f} KiB ({size / LINES:.1f} B/línea)")
+
+    with CaptureReader(path) as capture:
+        start = time.perf_counter()
+        count = sum(1 for _ in capture)
+        elapsed = time.perf_counter() - start
+    print(f"Recorrer:   {elapsed / count * 1e6:6.2f} µs/bloque (mmap)")
+
+    # Máxima velocidad: el pipeline RX completo (framing, parseo, callbacks)
+    comm = LoRaSerialCommunicator()
+    feed, lines = quiet_feed(comm)
+    with CaptureReader(path) as capture:
+        stats = replay(capture, feed, speed=0)
+    print(f"Reproducir (thread, sin esperas):  {lines[0] / stats.elapsed:>10,.0f} líneas/s")
+
+    async def run_async():
+        comm = AsyncLoRaSerialCommunicator(event_queue_size=LINES + 1)
+        with CaptureReader(path) as capture:
+            stats = await replay_async(capture, comm.feed, speed=0)
+        return comm._events.qsize(), stats
+    events, stats = asyncio.run(run_async())
+    print(f"Reproducir (asyncio, sin esperas): {events / stats.elapsed:>10,.0f} líneas/s")
+
+    # Tiempos reales: un tramo al comienzo de la captura
+    print()
+    print(f"{'Velocidad':<10} {'Capturado (s)':>14} {'Reproducido (s)':>16} {'Atraso máx (ms)':>16}")
+    with CaptureReader(path + ".timed") as capture:
+        for speed in SPEEDS:
+            window = TIMED_SECONDS * speed
+            section = [r for r in capture if r.t <= window]
+            comm = LoRaSerialCommunicator()
+            feed, _ = quiet_feed(comm)
+            stats = replay(section, feed, speed=speed)
+            span = section[-1].t - section[0].t
+            print(f"{f'{speed:g}x':<10} {span:>14.2f} {stats.elapsed:>16.2f} "
+                  f"{stats.max_lag * 1000:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de latencia de conexión
+Firmware simulado sobre un par pty: un equipo ya encendido que contesta
+PONG al PING, y uno que arranca (banner + READY tras BOOT_TIME, ignorando lo
+recibido mientras tanto). Compara con la espera fija de 2 s anterior
+"""
+
+import asyncio
+import os
+import select
+import sys
+import threading
+import time
+
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from serial_comm import LoRaSerialCommunicator
+
+BOOT_TIME = 1.0       # Arranque simulado del ESP32 (segundos)
+FIXED_DELAY = 2.0     # Espera fija anterior
+ROUNDS = 5
+
+
+def firmware(master: int, booting: bool, stop: threading.Event):
+    """Contesta PING con PONG; si arranca, primero banner y READY"""
+    try:
+        if booting:
+            if stop.wait(BOOT_TIME):
+                return
+            # Lo recibido durante el arranque se pierde
+            while select.select([master], [], [], 0)[0]:
+                os.read(master, 1024)
+            os.write(master, b"\n  Sistema LoRa P2P Chat v2.0\nDEVICE_ID: 0xA1B2C3D4E5F60708\nREADY\n")
+        while not stop.is_set():
+            if select.select([master], [], [], 0.05)[0]:
+                data = os.read(master, 1024)
+                for _ in range(data.count(b"PING")):
+                    os.write(master, b"PONG:LORA_P2P\n")
+                if b"STATUS" in data:
+                    os.write(master, b"STATUS:OK:ID:A1B2C3D4E5F60708\n")
+    except OSError:
+        return  # Puerto cerrado: termina el firmware
+
+
+def run_firmware(booting: bool):
+    master, slave = os.openpty()
+    stop = threading.Event()
+    thread = threading.Thread(target=firmware, args=(master, booting, stop), daemon=True)
+    thread.start()
+    return master, slave, stop, thread
+
+
+def close(master: int, slave: int, stop: threading.Event, thread: threading.Thread):
+    # Se espera al thread antes de cerrar: si no, la siguiente ronda puede
+    # reusar el mismo número de descriptor y este firmware contestarle
+    stop.set()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+
+
+def connect_threaded(booting: bool) -> float:
+    master, slave, stop, thread = run_firmware(booting)
+    comm = LoRaSerialCommunicator()
+    start = time.perf_counter()
+    assert comm.connect(os.ttyname(slave))
+    elapsed = time.perf_counter() - start
+    comm.disconnect()
+    close(master, slave, stop, thread)
+    return elapsed
+
+
+async def connect_async(booting: bool) -> float:
+    master, slave, stop, thread = run_firmware(booting)
+    comm = AsyncLoRaSerialCommunicator()
+    start = time.perf_counter()
+    assert await comm.connect(os.ttyname(slave))
+    elapsed = time.perf_counter() - start
+    await comm.disconnect()
+    close(master, slave, stop, thread)
+    return elapsed
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Latencia de conexión (mediana de {ROUNDS}, arranque simulado de {BOOT_TIME:.0f} s)")
+    print("=" * 60)
+    print(f"{'Comunicador':<14} {'Equipo':<12} {'Antes (ms)':>11} {'Ahora (ms)':>11}")
+    for booting, name in ((False, "encendido"), (True, "arrancando")):
+        threaded = sorted(connect_threaded(booting) for _ in range(ROUNDS))[ROUNDS // 2]
+        async_ = sorted(asyncio.run(connect_async(booting)) for _ in range(ROUNDS))[ROUNDS // 2]
+        before = FIXED_DELAY * 1000
+        print(f"{'thread':<14} {name:<12} {before:>11.0f} {threaded * 1000:>11.1f}")
+        print(f"{'asyncio':<14} {name:<12} {before:>11.0f} {async_ * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
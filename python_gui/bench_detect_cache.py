@@ -0,0 +1,90 @@
+"""
+Benchmark de la caché de detección de puertos
+Simula varios sticks LoRa sobre pares pty (responden PONG:LORA_P2P) y
+otros puertos mudos, y mide la detección en frío, en caliente y tras
+"reenchufar" un dispositivo con otra identidad USB en el mismo puerto
+"""
+
+import os
+import select
+import sys
+import threading
+import time
+
+import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+from serial_comm import LoRaSerialCommunicator, DetectionCache
+
+LORA_DEVICES = 3
+SILENT_DEVICES = 2
+
+
+def responder(masters: list, stop: threading.Event):
+    """Firmware simulado: contesta PONG a cada PING"""
+    while not stop.is_set():
+        ready, _, _ = select.select(masters, [], [], 0.05)
+        for fd in ready:
+            try:
+                if b"PING" in os.read(fd, 1024):
+                    os.write(fd, b"PONG:LORA_P2P\n")
+            except OSError:
+                pass
+
+
+def port_info(device: str, serial_number: str) -> ListPortInfo:
+    info = ListPortInfo(device)
+    info.vid, info.pid = 0x10C4, 0xEA60
+    info.serial_number = serial_number
+    info.location = f"1-{device[-1]}"
+    info.description = "CP2102 USB to UART Bridge Controller"
+    return info
+
+
+def timed_detect(cache: DetectionCache) -> tuple:
+    start = time.perf_counter()
+    found = LoRaSerialCommunicator.detect_lora_ports(cache=cache, ping_timeout=0.5)
+    return time.perf_counter() - start, found
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    pairs = [os.openpty() for _ in range(LORA_DEVICES + SILENT_DEVICES)]
+    lora_masters = [master for master, _ in pairs[:LORA_DEVICES]]
+    infos = [port_info(os.ttyname(slave), f"SN{i}") for i, (_, slave) in enumerate(pairs)]
+
+    # Los pty no aparecen en list_ports: se publican con identidad USB simulada
+    serial.tools.list_ports.comports = lambda: list(infos)
+
+    stop = threading.Event()
+    threading.Thread(target=responder, args=(lora_masters, stop), daemon=True).start()
+
+    cache = DetectionCache()
+    print("=" * 60)
+    print(f"Detección: {LORA_DEVICES} LoRa + {SILENT_DEVICES} mudos (pty)")
+    print("=" * 60)
+    print(f"{'Pasada':<28} {'Tiempo (ms)':>12} {'LoRa':>5} {'Sondeados':>10}")
+
+    rounds = [("en frío", None), ("en caliente", None), ("en caliente", None),
+              ("otro dispositivo en puerto 0", 0)]
+    for name, replug in rounds:
+        if replug is not None:
+            infos[replug].serial_number = "SN-NUEVO"
+        misses = cache.misses
+        elapsed, found = timed_detect(cache)
+        print(f"{name:<28} {elapsed * 1000:>12.1f} {len(found):>5} {cache.misses - misses:>10}")
+
+    elapsed, found = timed_detect(None)
+    print(f"{'sin caché':<28} {elapsed * 1000:>12.1f} {len(found):>5} {len(infos):>10}")
+
+    stop.set()
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark de la detección de puertos en segundo plano
+Con el servidor web en proceso y puertos pty mudos (cada sondeo agota su
+timeout), consulta /api/status sin parar mientras corre una detección y mide
+el mayor hueco entre respuestas: detect_lora_ports() dentro del event loop
+(handler anterior) vs el trabajo en segundo plano de POST /api/ports/detect
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import time
+
+import httpx
+import serial.tools.list_ports
+import uvicorn
+from serial.tools.list_ports_common import ListPortInfo
+
+import web_server
+from serial_comm import LoRaSerialCommunicator
+
+SILENT_PORTS = 4
+PROBE_INTERVAL = 0.05
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def probe_status(http: httpx.AsyncClient, url: str, stop: asyncio.Event, answers: list):
+    """Consulta periódica; registra el instante de cada respuesta"""
+    while not stop.is_set():
+        await http.get(url)
+        answers.append(time.perf_counter())
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def run(base: str, mode: str) -> tuple:
+    answers = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(timeout=30) as http:
+        prober = asyncio.create_task(probe_status(http, f"{base}/api/status", stop, answers))
+        await asyncio.sleep(0.2)
+        start = time.perf_counter()
+        if mode == "en el event loop":
+            # Lo que hacía el handler anterior: sondeo bloqueante dentro del loop
+            LoRaSerialCommunicator.detect_lora_ports(cache=None)
+            await asyncio.sleep(0)
+        else:
+            job = (await http.post(f"{base}/api/ports/detect", params={"refresh": True})).json()
+            while job["status"] == "running":
+                await asyncio.sleep(0.1)
+                job = (await http.get(f"{base}/api/ports/detect/{job['job_id']}")).json()
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0.2)
+        stop.set()
+        await prober
+    gaps = [b - a for a, b in zip(answers, answers[1:])]
+    return elapsed, max(gaps), len(answers)
+
+
+async def main():
+    pairs = [os.openpty() for _ in range(SILENT_PORTS)]
+    infos = [ListPortInfo(os.ttyname(slave)) for _, slave in pairs]
+    # Los pty no aparecen en list_ports: se publican a mano
+    serial.tools.list_ports.comports = lambda: list(infos)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base = f"http://127.0.0.1:{port}"
+
+    print("=" * 60)
+    print(f"Detección con {SILENT_PORTS} puertos mudos: respuestas de /api/status")
+    print("=" * 60)
+    print(f"{'Detección':<20} {'Duración (s)':>13} {'Hueco máx (ms)':>18} {'Respuestas':>11}")
+    for mode in ("en el event loop", "en segundo plano"):
+        elapsed, worst, count = await run(base, mode)
+        print(f"{mode:<20} {elapsed:>13.2f} {worst * 1000:>18.1f} {count:>11}")
+
+    server.should_exit = True
+    await server_task
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+
+
+if __name__ == "__main__":
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+    web_server.HISTORY_DB = ""
+    asyncio.run(main())
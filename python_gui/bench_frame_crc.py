@@ -0,0 +1,90 @@
+"""
+Benchmark del CRC de tramas LoRa
+Valida una captura simulada (tramas de chat de 151 bytes, algunas con ruido,
+bits invertidos o truncadas) con el CRC bit a bit del firmware, con la tabla
+de 256 entradas y con la validación en lote de NumPy
+"""
+
+import random
+import time
+
+import lora_frame
+from lora_frame import (
+    encode_chat_frame, frame_error, validate_frames, crc16, crc16_bitwise,
+    CRC_INVALID, INVALID_MAGIC_BYTES, PACKET_TOO_SHORT
+)
+
+FRAMES = (1_000, 10_000, 50_000)
+CORRUPT_RATE = 0.05
+
+
+def capture(count: int, rng: random.Random) -> list:
+    frames = []
+    for i in range(count):
+        raw = bytearray(encode_chat_frame(0xA1B2C3D4E5F60708, rng.getrandbits(64),
+                                          f"nodo{i % 20}", f"mensaje {i} " * 4))
+        roll = rng.random()
+        if roll < CORRUPT_RATE:
+            raw[rng.randrange(len(raw))] ^= 1 << rng.randrange(8)
+        elif roll < CORRUPT_RATE * 1.5:
+            raw[:4] = b"\x40\x00\x01\x02"  # LoRaWAN u otro protocolo
+        elif roll < CORRUPT_RATE * 1.6:
+            raw = raw[:rng.randrange(5, 23)]
+        frames.append(bytes(raw))
+    return frames
+
+
+def bitwise_errors(frames: list) -> list:
+    # Mismo recorrido que frame_error, con el CRC bit a bit
+    errors = []
+    for raw in frames:
+        if len(raw) < 23:
+            errors.append(PACKET_TOO_SHORT)
+        elif raw[:4] != b"PPPP":
+            errors.append(INVALID_MAGIC_BYTES)
+        elif crc16_bitwise(raw) != 0:
+            errors.append(CRC_INVALID)
+        else:
+            errors.append(None)
+    return errors
+
+
+def timed(function, frames: list) -> tuple:
+    start = time.perf_counter()
+    result = function(frames)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = random.Random(1)
+    sample = capture(1000, rng)
+    assert all(crc16(raw) == crc16_bitwise(raw) for raw in sample)
+
+    print("=" * 60)
+    print(f"Validación de capturas ({CORRUPT_RATE:.0%} con bits invertidos + ruido/truncadas)")
+    print("=" * 60)
+    print(f"{'Tramas':>8} {'Método':<14} {'Tiempo (ms)':>12} {'µs/trama':>9} {'Inválidas':>10}")
+
+    for count in FRAMES:
+        frames = capture(count, rng)
+        methods = [("bit a bit", bitwise_errors),
+                   ("tabla", lambda f: [frame_error(raw) for raw in f])]
+        if lora_frame.np is not None:
+            methods.append(("NumPy (lote)", validate_frames))
+
+        reference = None
+        for name, function in methods:
+            elapsed, errors = timed(function, frames)
+            if reference is None:
+                reference = errors
+            assert errors == reference, f"{name} no coincide con la referencia"
+            invalid = sum(error is not None for error in errors)
+            print(f"{count:>8} {name:<14} {elapsed * 1000:>12.1f} "
+                  f"{elapsed / count * 1e6:>9.2f} {invalid:>10}")
+
+    if lora_frame.np is None:
+        print("\nNumPy no está instalado: se omitió la validación en lote")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark del separador de líneas del RX
+Compara el buffer str + split('\\n', 1) anterior con LineFramer sobre ráfagas
+de 1 MB de tráfico serial típico
+"""
+
+import time
+
+from serial_comm import LineFramer
+
+BURST_SIZE = 1024 * 1024
+CHUNK_SIZES = (64, 4096, BURST_SIZE)
+ROUNDS = 3
+
+SAMPLE_LINES = (
+    b"RX:Estacion_Norte:Hola desde el cerro, todo en orden:-87.50\n",
+    b"DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED\n",
+    b"SENT:OK:Base:Recibido, cambio\n",
+    b"RSSI:-92.00\n",
+)
+
+
+def build_burst() -> bytes:
+    """Construye ~1 MB de líneas del firmware"""
+    block = b"".join(SAMPLE_LINES)
+    return (block * (BURST_SIZE // len(block) + 1))[:BURST_SIZE]
+
+
+def legacy_framer(chunks) -> int:
+    """Separador anterior de _read_loop (str + split)"""
+    buffer = ""
+    count = 0
+    for data in chunks:
+        buffer += data.decode('utf-8', errors='ignore')
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            line = line.strip()
+            if line:
+                count += 1
+    return count
+
+
+def new_framer(chunks) -> int:
+    """LineFramer sobre bytearray"""
+    framer = LineFramer()
+    count = 0
+    for data in chunks:
+        count += len(framer.feed(data))
+    return count
+
+
+def measure(func, chunks) -> tuple:
+    """Devuelve (mejor tiempo en segundos, líneas)"""
+    best = float('inf')
+    lines = 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        lines = func(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, lines
+
+
+def main():
+    burst = build_burst()
+
+    print("=" * 60)
+    print("Micro-benchmark del separador de líneas (ráfaga de 1 MB)")
+    print("=" * 60)
+    print(f"{'Bloque':>10} {'Anterior (ms)':>14} {'LineFramer (ms)':>16} {'Mejora':>8}")
+
+    for chunk_size in CHUNK_SIZES:
+        chunks = [burst[i:i + chunk_size] for i in range(0, len(burst), chunk_size)]
+        legacy_time, legacy_lines = measure(legacy_framer, chunks)
+        new_time, new_lines = measure(new_framer, chunks)
+        assert legacy_lines == new_lines, "Los separadores no coinciden"
+        print(f"{chunk_size:>10} {legacy_time * 1000:>14.1f} {new_time * 1000:>16.1f} "
+              f"{legacy_time / new_time:>7.1f}x")
+
+    print(f"\nLíneas por ráfaga: {new_lines}")
+
+
+if __name__ == "__main__":
+    main()
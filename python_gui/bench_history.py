@@ -0,0 +1,113 @@
+"""
+Benchmark del historial persistente
+Con una base SQLite ya cargada con muchos mensajes, simula una ráfaga de RX
+y mide cuánto se bloquea el event loop (lo que retrasaría la entrega por
+WebSocket) escribiendo cada mensaje en el loop con commit propio vs
+encolándolo para el thread escritor con tandas
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from history_store import MessageHistoryStore
+
+PREFILL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BURST = 5000
+TICK = 0.001  # Periodo del medidor de latencia del loop
+
+
+def prefill(path: str, rows: int):
+    """Carga la base con mensajes de relleno"""
+    store = MessageHistoryStore(path)
+    store.close()
+    conn = sqlite3.connect(path)
+    now = time.time()
+    chunk = 100_000
+    with conn:
+        for start in range(0, rows, chunk):
+            conn.executemany(
+                "INSERT INTO messages (ts, sender, content, rssi, device) VALUES (?, ?, ?, ?, ?)",
+                ((now - rows + i, f"nodo{i % 50}", f"mensaje de relleno {i}", -80.0, "/dev/ttyUSB0")
+                 for i in range(start, min(rows, start + chunk))))
+    conn.close()
+
+
+async def loop_lag(stop: asyncio.Event, lags: list):
+    """Registra cuánto se atrasa un tick periódico del event loop"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(path: str, mode: str) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_lag(stop, lags))
+    await asyncio.sleep(0.05)
+
+    if mode == "en el loop":
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        start = time.perf_counter()
+        for i in range(BURST):
+            with conn:
+                conn.execute(
+                    "INSERT INTO messages (ts, sender, content, rssi, device) VALUES (?, ?, ?, ?, ?)",
+                    (time.time(), "bench", f"rx {i}", -70.0, "/dev/ttyUSB0"))
+            if i % 10 == 0:
+                await asyncio.sleep(0)
+        enqueue_time = time.perf_counter() - start
+        stored_time = enqueue_time
+        conn.close()
+    else:
+        store = MessageHistoryStore(path)
+        store.start()
+        start = time.perf_counter()
+        for i in range(BURST):
+            store.append("bench", f"rx {i}", -70.0, "/dev/ttyUSB0")
+            if i % 10 == 0:
+                await asyncio.sleep(0)
+        enqueue_time = time.perf_counter() - start
+        while store.written < BURST:
+            await asyncio.sleep(0.01)
+        stored_time = time.perf_counter() - start
+        await asyncio.get_running_loop().run_in_executor(None, store.close)
+
+    stop.set()
+    await ticker
+    lags.sort()
+    return {
+        "per_message_us": enqueue_time / BURST * 1e6,
+        "stored_s": stored_time,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        start = time.perf_counter()
+        prefill(path, PREFILL)
+        print("=" * 60)
+        print("Benchmark del historial SQLite")
+        print("=" * 60)
+        print(f"Base precargada con {PREFILL} mensajes en {time.perf_counter() - start:.1f} s "
+              f"({os.path.getsize(path) / 1e6:.0f} MB)")
+        print(f"Ráfaga: {BURST} mensajes RX")
+        print()
+        print(f"{'Escritura':<16} {'µs/msg en loop':>15} {'Guardados (s)':>14} "
+              f"{'Lag p99 (ms)':>13} {'Lag máx (ms)':>13}")
+        for mode in ("en el loop", "thread + tandas"):
+            r = await run(path, mode)
+            print(f"{mode:<16} {r['per_message_us']:>15.1f} {r['stored_s']:>14.2f} "
+                  f"{r['lag_p99_ms']:>13.2f} {r['lag_max_ms']:>13.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
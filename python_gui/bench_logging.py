@@ -0,0 +1,129 @@
+"""
+Benchmark del logging en el camino caliente serial
+Mide el ritmo del lector (LoRaSerialCommunicator.feed con el pipeline RX
+completo) ante una ráfaga de líneas, con el logging apagado, escribiendo
+de forma síncrona desde el lector (como antes) y a través de la cola con
+el thread de escritura, con y sin la traza cruda. La salida va a un pipe
+que lee otro proceso, como la consola de Docker.
+
+En los casos con cola también se informa cuánto tarda el listener en
+vaciarla después de la ráfaga y cuántos registros se descartaron.
+"""
+
+import io
+import logging
+import subprocess
+import sys
+import time
+
+import log_pipeline
+from log_pipeline import setup_logging, stop_logging, set_raw_trace, LOG_FORMAT
+from serial_comm import LoRaSerialCommunicator
+
+LINES = 20_000
+CHUNK = 64
+
+SAMPLE_LINES = [
+    "RX:nodo{i}:mensaje de prueba {i}:-87.50",
+    "RX:nodo{i}:otro mensaje un poco más largo que el anterior:-101.25",
+    "DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED",
+    "RSSI:-92.00",
+    "SENT:OK:Base:Recibido, cambio",
+    "ERROR:CRC_INVALID",
+]
+
+
+def sink() -> subprocess.Popen:
+    """Proceso que lee y descarta lo que se le escribe (hace de consola)"""
+    code = "import os, shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(os.devnull, 'wb'))"
+    return subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE)
+
+
+def chunks() -> list:
+    text = "".join(SAMPLE_LINES[i % len(SAMPLE_LINES)].format(i=i % 20) + "\r\n"
+                   for i in range(LINES))
+    data = text.encode()
+    return [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+def burst(data: list) -> float:
+    """Ritmo del lector (líneas/s) procesando la ráfaga"""
+    comm = LoRaSerialCommunicator()
+    start = time.perf_counter()
+    for chunk in data:
+        comm.feed(chunk)
+    return LINES / (time.perf_counter() - start)
+
+
+def run_disabled(data: list, stream) -> tuple:
+    logging.disable(logging.CRITICAL)
+    try:
+        return burst(data), None, None
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def run_sync(data: list, stream, trace: bool) -> tuple:
+    # Como antes: el lector formatea y escribe cada registro
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    set_raw_trace(trace)
+    try:
+        return burst(data), None, None
+    finally:
+        root.removeHandler(handler)
+        set_raw_trace(False)
+
+
+def run_queue(data: list, stream, trace: bool, level=logging.INFO) -> tuple:
+    setup_logging(level, stream=stream, raw_trace=trace)
+    handler = log_pipeline._handler
+    rate = burst(data)
+    # stop_logging espera a que el listener escriba todo lo pendiente
+    start = time.perf_counter()
+    stop_logging()
+    drain = time.perf_counter() - start
+    set_raw_trace(False)
+    return rate, drain, handler.dropped
+
+
+def main():
+    data = chunks()
+    process = sink()
+    stream = io.TextIOWrapper(process.stdin, encoding="utf-8", write_through=True)
+
+    cases = [
+        ("sin logging", lambda: run_disabled(data, stream)),
+        ("síncrono + traza (antes)", lambda: run_sync(data, stream, True)),
+        ("síncrono", lambda: run_sync(data, stream, False)),
+        ("cola + traza", lambda: run_queue(data, stream, True)),
+        ("cola (default)", lambda: run_queue(data, stream, False)),
+        ("cola, nivel WARNING", lambda: run_queue(data, stream, False, logging.WARNING)),
+    ]
+
+    print("=" * 60)
+    print(f"Logging en el lector serial: ráfaga de {LINES} líneas en bloques de {CHUNK} bytes")
+    print("=" * 60)
+    print(f"{'Caso':<26} {'Líneas/s':>10} {'µs/línea':>9} {'Vaciado (ms)':>13} {'Descartados':>12}")
+
+    for name, case in cases:
+        logging.disable(logging.CRITICAL)
+        burst(data[:100])  # Calentamiento
+        logging.disable(logging.NOTSET)
+        rate, drain, dropped = case()
+        drain_text = "-" if drain is None else f"{drain * 1000:.0f}"
+        dropped_text = "-" if dropped is None else str(dropped)
+        print(f"{name:<26} {rate:>10,.0f} {1e6 / rate:>9.2f} {drain_text:>13} {dropped_text:>12}")
+
+    stream.close()
+    process.wait()
+    print()
+    print(f"Cola de log: {log_pipeline.LOG_QUEUE_SIZE} registros; lo que no entra se descarta "
+          f"y se cuenta en lora_log_records_dropped_total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark del historial en memoria
+Compara la lista con pop(0) al llenarse (y filtrado completo para paginar)
+con MessageRing (desalojo O(1), búsqueda binaria por ID e índice por
+remitente) para distintas capacidades
+"""
+
+import time
+from typing import NamedTuple
+
+from message_ring import MessageRing
+
+CAPACITIES = (100, 10_000, 100_000)
+MESSAGES = 200_000
+QUERIES = 1000
+
+
+class Msg(NamedTuple):
+    id: int
+    sender: str
+    content: str
+
+
+def make(i: int) -> Msg:
+    return Msg(i, f"nodo{i % 20}", "hola")
+
+
+def bench_list(capacity: int):
+    messages = []
+    start = time.perf_counter()
+    for i in range(1, MESSAGES + 1):
+        messages.append(make(i))
+        if len(messages) > capacity:
+            messages.pop(0)
+    append_us = (time.perf_counter() - start) / MESSAGES * 1e6
+
+    after = MESSAGES - 50
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        [m for m in messages if m.id > after][:100]
+        [m for m in messages if m.sender == "nodo3"][-100:]
+    query_us = (time.perf_counter() - start) / QUERIES * 1e6
+    return append_us, query_us
+
+
+def bench_ring(capacity: int):
+    ring = MessageRing(capacity)
+    start = time.perf_counter()
+    for i in range(1, MESSAGES + 1):
+        ring.append(make(i))
+    append_us = (time.perf_counter() - start) / MESSAGES * 1e6
+
+    after = MESSAGES - 50
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        ring.page(after=after, limit=100)
+        ring.by_sender("nodo3", limit=100)
+    query_us = (time.perf_counter() - start) / QUERIES * 1e6
+    return append_us, query_us
+
+
+def main():
+    print("=" * 60)
+    print(f"Historial en memoria: {MESSAGES} mensajes agregados, {QUERIES} consultas")
+    print("=" * 60)
+    print(f"{'Capacidad':>10} {'Estructura':<12} {'Agregar (µs)':>13} {'Consulta (µs)':>14}")
+    for capacity in CAPACITIES:
+        for name, bench in (("lista", bench_list), ("buffer", bench_ring)):
+            append_us, query_us = bench(capacity)
+            print(f"{capacity:>10} {name:<12} {append_us:>13.2f} {query_us:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
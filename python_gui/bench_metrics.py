@@ -0,0 +1,104 @@
+"""
+Benchmark del costo de las métricas de /metrics
+Mide cuánto agrega la instrumentación por línea (conteo, clasificación y
+cronometraje muestreado del parseo) frente al parseo solo y al pipeline
+RX completo de LoRaSerialCommunicator, y cuánto tarda armar el texto de
+Prometheus en cada consulta
+"""
+
+import logging
+import time
+
+import metrics
+from lora_protocol import parse_line
+from metrics import LineMetrics, REGISTRY, RX_MESSAGES
+from serial_comm import LoRaSerialCommunicator
+
+ROUNDS = 5
+LINES = 50_000
+
+SAMPLE_LINES = [
+    "RX:nodo{i}:mensaje de prueba {i}:-87.50",
+    "SENT:OK:Base:Recibido, cambio",
+    "STATUS:OK:ID:A1B2C3D4",
+    "RSSI:-92.00",
+    "ERROR:CRC_INVALID",
+    "DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED",
+    "DEBUG:IGNORING_OWN_MESSAGE",
+    "PONG:LORA_P2P",
+]
+
+
+class NoMetrics:
+    """Misma interfaz que LineMetrics, sin hacer nada (referencia)"""
+
+    def parse_started(self) -> int:
+        return 0
+
+    def observe(self, event, started: int = 0):
+        pass
+
+
+def lines() -> list:
+    return [SAMPLE_LINES[i % len(SAMPLE_LINES)].format(i=i % 20) for i in range(LINES)]
+
+
+def best_of(function) -> float:
+    """Mejor tiempo de ROUNDS corridas (segundos)"""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_only(sample: list, line_metrics):
+    def run():
+        for line in sample:
+            started = line_metrics.parse_started()
+            event = parse_line(line)
+            line_metrics.observe(event, started)
+    return run
+
+
+def pipeline(sample: list, line_metrics):
+    comm = LoRaSerialCommunicator()
+    comm.metrics = line_metrics
+    data = "".join(f"{line}\r\n" for line in sample).encode()
+    chunks = [data[i:i + 64] for i in range(0, len(data), 64)]
+
+    def run():
+        for chunk in chunks:
+            comm.feed(chunk)
+    return run
+
+
+def main():
+    # Se mide el pipeline, no la salida por consola
+    logging.disable(logging.CRITICAL)
+    sample = lines()
+
+    print("=" * 60)
+    print(f"Costo de las métricas: {LINES} líneas, mejor de {ROUNDS} corridas")
+    print("=" * 60)
+    print(f"{'Camino':<26} {'Sin (µs/línea)':>15} {'Con (µs/línea)':>15} {'Agregado':>9}")
+
+    for name, build in (("parse_line", parse_only), ("pipeline RX completo", pipeline)):
+        off = best_of(build(sample, NoMetrics()))
+        on = best_of(build(sample, LineMetrics("bench")))
+        print(f"{name:<26} {off / LINES * 1e6:>15.2f} {on / LINES * 1e6:>15.2f} "
+              f"{(on - off) / LINES * 1e6:>8.2f}µ")
+
+    # Consulta con muchos remitentes distintos (hasta el tope de etiquetas)
+    for i in range(metrics.MAX_LABEL_VALUES):
+        RX_MESSAGES.labels(f"remitente{i}").inc()
+    text = REGISTRY.render()
+    elapsed = best_of(REGISTRY.render)
+    print()
+    print(f"Consulta /metrics: {elapsed * 1000:.2f} ms, {len(text) / 1024:.0f} KiB, "
+          f"{text.count(chr(10))} líneas")
+
+
+if __name__ == "__main__":
+    main()
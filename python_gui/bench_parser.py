@@ -0,0 +1,102 @@
+"""
+Benchmark de throughput del parser de protocolo
+Compara la cadena if/elif con startswith/split/búsquedas de subcadenas
+anterior con la tabla de despacho de lora_protocol.parse_line (líneas/s)
+"""
+
+import time
+
+from lora_protocol import parse_line
+
+ROUNDS = 5
+REPEAT = 20000
+
+SAMPLE_LINES = [
+    "RX:Estacion_Norte:Hola desde el cerro:-87.50",
+    "SENT:OK:Base:Recibido, cambio",
+    "STATUS:OK:ID:A1B2C3D4",
+    "RSSI:-92.00",
+    "ERROR:CRC_INVALID",
+    "ERROR:RX_FAILED:-7",
+    "DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED",
+    "DEBUG:IGNORING_OWN_MESSAGE",
+    "DEBUG:PACKET_TOO_SHORT",
+    "PONG:LORA_P2P",
+    "CONFIG:ID:A1B2C3D4",
+    "READY",
+    "DEVICE_ID: 0xA1B2C3D4",
+]
+
+
+def legacy_parse(line: str):
+    """Parser anterior de _process_line, sin logging ni callbacks"""
+    if line.startswith("RX:"):
+        parts = line.split(':', 3)
+        if len(parts) >= 4:
+            return ("rx", parts[1], parts[2], parts[3])
+    elif line.startswith("SENT:OK:"):
+        parts = line.split(':', 3)
+        if len(parts) >= 4:
+            return ("sent", parts[2], parts[3])
+        return ("sent",)
+    elif line.startswith("STATUS:"):
+        return ("status", line)
+    elif line.startswith("RSSI:"):
+        return ("rssi", line)
+    elif line.startswith("ERROR:"):
+        if "CRC_INVALID" in line:
+            return ("error", "CRC_INVALID", line)
+        elif "TX_FAILED" in line:
+            return ("error", "TX_FAILED", line)
+        elif "RX_FAILED" in line:
+            return ("error", "RX_FAILED", line)
+        return ("error", None, line)
+    elif line == "READY":
+        return ("ready",)
+    elif line.startswith("PONG:"):
+        return ("pong", line)
+    elif line.startswith("DEBUG:"):
+        if "IGNORING_OWN_MESSAGE" in line:
+            return ("debug", "IGNORING_OWN_MESSAGE", line)
+        elif "INVALID_MAGIC_BYTES" in line:
+            return ("debug", "INVALID_MAGIC_BYTES", line)
+        elif "PACKET_TOO_SHORT" in line:
+            return ("debug", "PACKET_TOO_SHORT", line)
+        return ("debug", None, line)
+    return ("other", line)
+
+
+def measure(func, lines) -> float:
+    """Devuelve el mejor throughput en líneas por segundo"""
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    mixed = SAMPLE_LINES * REPEAT
+    rx_only = [SAMPLE_LINES[0]] * len(mixed)
+    debug_only = [SAMPLE_LINES[6]] * len(mixed)
+
+    print("=" * 60)
+    print("Benchmark del parser de protocolo (líneas/s)")
+    print("=" * 60)
+    print(f"{'Tráfico':<12} {'Anterior':>14} {'parse_line':>14} {'Relación':>9}")
+
+    for name, lines in (("mixto", mixed), ("solo RX", rx_only), ("solo DEBUG", debug_only)):
+        legacy = measure(legacy_parse, lines)
+        table = measure(parse_line, lines)
+        print(f"{name:<12} {legacy:>14,.0f} {table:>14,.0f} {table / legacy:>8.2f}x")
+
+    print()
+    print("Nota: el parser anterior solo separa strings; parse_line además")
+    print("construye el evento tipado (RSSI como float) que antes cada")
+    print("consumidor volvía a parsear.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark de escala con el canal de radio simulado
+N nodos (ESP32Simulator sobre pty, cada uno con su
+AsyncLoRaSerialCommunicator) repartidos en un área de 1 km², transmitiendo
+mensajes de chat con llegadas de Poisson. Para cada cantidad de nodos y
+carga ofrecida G (fracción del tiempo que el canal estaría ocupado si no
+hubiera colisiones) mide la tasa de entrega (recepciones / (enviados ×
+(N - 1))) y la latencia desde send_message hasta el RxEvent en cada
+receptor, y la compara con ALOHA puro (e^-2G).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from lora_protocol import RxEvent
+from radio_medium import RadioMedium
+from serial_comm import lora_time_on_air, LORA_FRAME_SIZE, DEFAULT_RADIO
+
+NODE_COUNTS = (10, 25, 50)
+LOADS = (0.2, 0.5, 1.0)        # Carga ofrecida G
+RUN_SECONDS = 15.0
+AREA = 1000.0                  # Lado del área (m)
+BOOT_DELAY = 0.1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(nodes: int, load: float, seed: int) -> dict:
+    airtime = lora_time_on_air(LORA_FRAME_SIZE, DEFAULT_RADIO)
+    rate = load / (nodes * airtime)   # Mensajes por segundo de cada nodo
+    rng = random.Random(seed)
+
+    medium = RadioMedium(seed=seed).start()
+    simulators = [medium.add_node((rng.uniform(0, AREA), rng.uniform(0, AREA)),
+                                  boot_delay=BOOT_DELAY) for _ in range(nodes)]
+    comms = [AsyncLoRaSerialCommunicator() for _ in simulators]
+    connected = await asyncio.gather(*(comm.connect(sim.port)
+                                       for comm, sim in zip(comms, simulators)))
+    assert all(connected), "no se pudieron conectar todos los nodos"
+
+    latencies, sent = [], [0]
+
+    async def receive(comm):
+        async for event in comm:
+            if type(event) is RxEvent and event.sender.startswith("n"):
+                latencies.append((time.perf_counter_ns() - int(event.text)) / 1e6)
+
+    async def transmit(index, comm, stop_at):
+        node_rng = random.Random(seed * 1000 + index)
+        while True:
+            delay = node_rng.expovariate(rate)
+            if time.perf_counter() + delay >= stop_at:
+                return
+            await asyncio.sleep(delay)
+            if await comm.send_message(f"n{index}", str(time.perf_counter_ns())):
+                sent[0] += 1
+
+    receivers = [asyncio.create_task(receive(comm)) for comm in comms]
+    stop_at = time.perf_counter() + RUN_SECONDS
+    await asyncio.gather(*(transmit(i, comm, stop_at) for i, comm in enumerate(comms)))
+    # Lo que quedó en cola o en el aire
+    while any(comm.tx_scheduler.pending for comm in comms):
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(airtime + 0.3)
+
+    for comm in comms:
+        await comm.disconnect()
+    await asyncio.gather(*receivers)
+    medium.stop()
+
+    expected = sent[0] * (nodes - 1)
+    return {
+        "sent": sent[0],
+        "pdr": len(latencies) / expected if expected else float("nan"),
+        "p50": percentile(latencies, 0.50) if latencies else float("nan"),
+        "p99": percentile(latencies, 0.99) if latencies else float("nan"),
+        "stats": medium.stats,
+    }
+
+
+async def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    # Se mide el canal, no la consola
+    logging.disable(logging.CRITICAL)
+    airtime = lora_time_on_air(LORA_FRAME_SIZE, DEFAULT_RADIO)
+
+    print("=" * 60)
+    print(f"Canal simulado: SF{DEFAULT_RADIO.spreading_factor}/{DEFAULT_RADIO.bandwidth_khz:g} kHz, "
+          f"{airtime * 1000:.0f} ms por trama, {RUN_SECONDS:g} s por prueba")
+    print("=" * 60)
+    print(f"{'Nodos':>5} {'G':>5} {'Enviados':>9} {'Entrega':>8} {'ALOHA':>6} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'Colisiones':>11} {'Half-dup':>9}")
+
+    seed = 1
+    for nodes in NODE_COUNTS:
+        for load in LOADS:
+            r = await run(nodes, load, seed)
+            seed += 1
+            print(f"{nodes:>5} {load:>5.1f} {r['sent']:>9} {r['pdr']:>8.1%} "
+                  f"{math.exp(-2 * load):>6.0%} {r['p50']:>9.0f} {r['p99']:>9.0f} "
+                  f"{r['stats']['collided']:>11} {r['stats']['half_duplex']:>9}")
+    print()
+    print("Entrega: recepciones / (enviados × (N-1)); Colisiones y Half-dup en recepciones")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark del lector serial: modo poll vs modo bloqueante
+Mide el uso de CPU en reposo y la latencia por línea (desde la escritura en
+el puerto hasta el callback) sobre un par pty, sin hardware
+"""
+
+import os
+import sys
+import threading
+import time
+import statistics
+
+from serial_comm import LoRaSerialCommunicator, READ_MODE_BLOCKING, READ_MODE_POLL
+
+IDLE_SECONDS = 3.0
+LINES = 500
+LINE_INTERVAL = 0.002
+
+
+def open_pty():
+    """Crea un par pty y devuelve (fd_maestro, nombre_esclavo)"""
+    master, slave = os.openpty()
+    return master, os.ttyname(slave), slave
+
+
+def run_mode(read_mode: str) -> dict:
+    """Ejecuta el benchmark para un modo de lectura"""
+    master, slave_name, slave = open_pty()
+    comm = LoRaSerialCommunicator(read_mode=read_mode)
+
+    latencies = []
+    done = threading.Event()
+
+    def on_status(line):
+        # Línea de prueba: DEBUG:BENCH:<perf_counter_ns>
+        if line.startswith("DEBUG:BENCH:"):
+            latencies.append(time.perf_counter_ns() - int(line.split(':')[2]))
+            if len(latencies) >= LINES:
+                done.set()
+
+    comm.on_status_update = on_status
+
+    if not comm.connect(slave_name):
+        raise RuntimeError(f"No se pudo abrir {slave_name}")
+
+    try:
+        # CPU en reposo: sin tráfico en el puerto
+        cpu_start = time.process_time()
+        time.sleep(IDLE_SECONDS)
+        idle_cpu = (time.process_time() - cpu_start) / IDLE_SECONDS * 100
+
+        # Latencia por línea
+        for _ in range(LINES):
+            os.write(master, f"DEBUG:BENCH:{time.perf_counter_ns()}\n".encode())
+            time.sleep(LINE_INTERVAL)
+        done.wait(timeout=10)
+    finally:
+        comm.disconnect()
+        os.close(master)
+        os.close(slave)
+
+    latencies_us = sorted(ns / 1000 for ns in latencies)
+    return {
+        "idle_cpu": idle_cpu,
+        "received": len(latencies_us),
+        "p50": statistics.median(latencies_us) if latencies_us else float('nan'),
+        "p99": latencies_us[int(len(latencies_us) * 0.99) - 1] if latencies_us else float('nan'),
+    }
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("Benchmark del lector serial (par pty)")
+    print("=" * 60)
+    print(f"Reposo: {IDLE_SECONDS}s | Líneas: {LINES} cada {LINE_INTERVAL * 1000:.0f} ms")
+    print()
+    print(f"{'Modo':<10} {'CPU reposo':>12} {'Recibidas':>10} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+
+    for mode in (READ_MODE_POLL, READ_MODE_BLOCKING):
+        r = run_mode(mode)
+        print(f"{mode:<10} {r['idle_cpu']:>11.2f}% {r['received']:>10} "
+              f"{r['p50']:>10.0f} {r['p99']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
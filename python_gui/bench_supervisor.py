@@ -0,0 +1,265 @@
+"""
+Benchmark de la supervisión del enlace serial
+Firmware simulado sobre pares pty que se reinicia al reabrir el puerto (como
+el auto-reset por DTR de las placas ESP32). Mide cuánto tarda el supervisor
+en notar la falla y en volver a estar conectado, y cuántos mensajes de la
+cola de TX llegan al firmware, para dos incidentes:
+
+- desenchufar y reenchufar: el puerto desaparece y el dispositivo vuelve
+  con otro nombre pero el mismo número de serie USB
+- firmware colgado: el puerto sigue ahí pero nada responde (ni al PING)
+
+Sin supervisor (comportamiento anterior) ninguno se recupera sin reiniciar.
+"""
+
+import asyncio
+import errno
+import os
+import select
+import sys
+import threading
+import time
+from typing import Optional
+
+import serial
+import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from serial_comm import LoRaSerialCommunicator
+from serial_supervisor import (
+    SerialSupervisor, AsyncSerialSupervisor, Heartbeat, Backoff, PortWatcher,
+    STATE_CONNECTED, STATE_RECONNECTING
+)
+
+BOOT_TIME = 0.2        # Arranque simulado del ESP32 al abrir el puerto
+MESSAGES = 8           # Mensajes en cola al momento del incidente
+INCIDENT_AFTER = 0.5   # Segundos de transmisión antes del incidente
+REPLUG_AFTER = 1.0     # Segundos desenchufado
+
+# Supervisión acelerada para el benchmark
+WATCH_INTERVAL = 0.1
+HEARTBEAT = dict(idle=0.5, timeout=0.25, misses=2)
+BACKOFF = dict(initial=0.1, maximum=1.0)
+
+# Puertos publicados en list_ports (los pty no aparecen solos)
+listed = {}
+serial.tools.list_ports.comports = lambda: list(listed.values())
+
+# Abrir el puerto reinicia el firmware de ese pty (el auto-reset por DTR):
+# se avisa en el open mismo, porque el supervisor cierra y reabre enseguida
+# y el maestro del pty no siempre llega a ver el cierre
+firmwares = {}
+_serial_open = serial.Serial.open
+
+
+def _open_and_reset(self):
+    _serial_open(self)
+    firmware = firmwares.get(self.port)
+    if firmware:
+        firmware.reset()
+
+
+serial.Serial.open = _open_and_reset
+
+
+class Firmware:
+    """ESP32 simulado en el lado maestro de un pty"""
+
+    def __init__(self, delivered: set, serial_number: str = "SN-BENCH"):
+        self.master, slave = os.openpty()
+        self.path = os.ttyname(slave)
+        # Sin el esclavo abierto, leer el maestro da EIO hasta que se abra el puerto
+        os.close(slave)
+        self.delivered = delivered
+        self.stalled = False
+        self._pending = b""
+        self._ready_at: Optional[float] = None   # Fin del arranque en curso
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        info = ListPortInfo(self.path)
+        info.vid, info.pid, info.serial_number = 0x10C4, 0xEA60, serial_number
+        listed[self.path] = info
+        firmwares[self.path] = self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def unplug(self):
+        listed.pop(self.path, None)
+        firmwares.pop(self.path, None)
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master)
+
+    def reset(self):
+        """Reinicio al abrir el puerto: arranca de nuevo y se destraba"""
+        with self._lock:
+            self.stalled = False
+            self._pending = b""
+            self._ready_at = time.monotonic() + BOOT_TIME
+
+    def _run(self):
+        while not self._stop.is_set():
+            readable = select.select([self.master], [], [], 0.02)[0]
+            with self._lock:
+                booting = self._ready_at is not None
+                if booting and time.monotonic() >= self._ready_at:
+                    self._ready_at = None
+                    self._write(b"\n  Sistema LoRa P2P Chat v2.0\nREADY\n")
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    return
+                time.sleep(0.01)   # Puerto cerrado
+                continue
+            # Lo recibido durante el arranque (o colgado) se pierde
+            if booting or self.stalled:
+                continue
+            with self._lock:
+                *lines, self._pending = (self._pending + data).split(b"\n")
+            for line in lines:
+                self._command(line.strip())
+
+    def _write(self, data: bytes):
+        try:
+            os.write(self.master, data)
+        except OSError:
+            pass   # Puerto cerrado mientras arrancaba
+
+    def _command(self, line: bytes):
+        if line == b"PING":
+            self._write(b"PONG:LORA_P2P\n")
+        elif line == b"STATUS":
+            self._write(b"STATUS:OK:ID:A1B2C3D4E5F60708\n")
+        elif line.startswith(b"TX:"):
+            self.delivered.add(line)
+            self._write(b"SENT:OK\n")
+
+
+class Timeline:
+    """Instantes de los cambios de estado del supervisor"""
+
+    def __init__(self):
+        self.lost = None
+        self.back = None
+
+    def __call__(self, state: str, detail: str):
+        now = time.perf_counter()
+        if state == STATE_RECONNECTING and self.lost is None:
+            self.lost = now
+        elif state == STATE_CONNECTED and self.lost is not None:
+            self.back = now
+
+
+def supervisor_args(timeline: Timeline) -> dict:
+    return dict(watch_interval=WATCH_INTERVAL, heartbeat=Heartbeat(**HEARTBEAT),
+                backoff=Backoff(**BACKOFF), watcher=PortWatcher(cache=None),
+                on_state_change=timeline)
+
+
+def incident(firmware: Firmware, kind: str) -> tuple:
+    """
+    Provoca el incidente
+
+    Returns:
+        (firmware que queda, instante desde el que se mide la recuperación)
+    """
+    if kind == "colgado":
+        firmware.stalled = True
+        return firmware, time.perf_counter()
+    firmware.unplug()
+    time.sleep(REPLUG_AFTER)
+    return Firmware(firmware.delivered), time.perf_counter()
+
+
+def run_threaded(kind: str) -> tuple:
+    delivered = set()
+    firmware = Firmware(delivered)
+    comm = LoRaSerialCommunicator()
+    assert comm.connect(firmware.path)
+    timeline = Timeline()
+    supervisor = SerialSupervisor(comm, firmware.path, **supervisor_args(timeline))
+    supervisor.start()
+
+    for i in range(MESSAGES):
+        comm.send_message("bench", f"mensaje {i}")
+    time.sleep(INCIDENT_AFTER)
+    start = time.perf_counter()
+    firmware, recovery_from = incident(firmware, kind)
+
+    deadline = time.perf_counter() + 15
+    while (timeline.back is None or comm.tx_scheduler.pending) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.3)
+    supervisor.stop()
+    firmware.unplug()
+    return result(timeline, start, recovery_from, delivered)
+
+
+async def run_async(kind: str) -> tuple:
+    delivered = set()
+    firmware = Firmware(delivered)
+    comm = AsyncLoRaSerialCommunicator()
+    assert await comm.connect(firmware.path)
+    timeline = Timeline()
+    supervisor = AsyncSerialSupervisor(comm, firmware.path, **supervisor_args(timeline))
+
+    async def handle(event):
+        pass
+
+    task = asyncio.create_task(supervisor.run(handle))
+    for i in range(MESSAGES):
+        await comm.send_message("bench", f"mensaje {i}")
+    await asyncio.sleep(INCIDENT_AFTER)
+    start = time.perf_counter()
+    firmware, recovery_from = await asyncio.get_running_loop().run_in_executor(
+        None, incident, firmware, kind)
+
+    deadline = time.perf_counter() + 15
+    while (timeline.back is None or comm.tx_scheduler.pending) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.3)
+    await supervisor.stop()
+    await task
+    firmware.unplug()
+    return result(timeline, start, recovery_from, delivered)
+
+
+def result(timeline: Timeline, start: float, recovery_from: float, delivered: set) -> tuple:
+    detect = (timeline.lost - start) if timeline.lost else None
+    back = (timeline.back - recovery_from) if timeline.back else None
+    return detect, back, len(delivered)
+
+
+def ms(value) -> str:
+    return "nunca" if value is None else f"{value * 1000:.0f}"
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Supervisión del enlace: {MESSAGES} mensajes en cola, "
+          f"PING tras {HEARTBEAT['idle']} s de silencio")
+    print("=" * 60)
+    print(f"{'Comunicador':<12} {'Incidente':<12} {'Detección (ms)':>15} "
+          f"{'Reconexión (ms)':>16} {'TX entregados':>14}")
+    for kind in ("reenchufado", "colgado"):
+        for name, run in (("thread", run_threaded),
+                          ("asyncio", lambda k: asyncio.run(run_async(k)))):
+            detect, back, count = run(kind)
+            print(f"{name:<12} {kind:<12} {ms(detect):>15} {ms(back):>16} "
+                  f"{f'{count}/{MESSAGES}':>14}")
+    print()
+    print("Reconexión: desde que el dispositivo vuelve a estar disponible "
+          "(reenchufado) o desde que se colgó (colgado)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark del planificador de TX
+Envía una ráfaga de mensajes por LoRaSerialCommunicator sobre un par pty y
+mide a qué ritmo llegan los comandos TX al "firmware", comparado con el
+tiempo en aire teórico de SF7/125 kHz/CR 4/5
+"""
+
+import os
+import sys
+import threading
+import time
+
+from serial_comm import (
+    LoRaSerialCommunicator, TxQueueFullError, lora_time_on_air,
+    DEFAULT_RADIO, LORA_FRAME_SIZE, TX_GUARD_TIME, TX_QUEUE_SIZE
+)
+
+BURST = 40
+
+
+def collect_tx(master: int, arrivals: list, stop: threading.Event):
+    """Lee el lado del firmware y registra la llegada de cada TX"""
+    buffer = b""
+    while not stop.is_set():
+        try:
+            buffer += os.read(master, 4096)
+        except OSError:
+            return
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line.startswith(b"TX:"):
+                arrivals.append(time.monotonic())
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    airtime = lora_time_on_air(LORA_FRAME_SIZE, DEFAULT_RADIO)
+    print("=" * 60)
+    print("Benchmark del planificador de TX (par pty)")
+    print("=" * 60)
+    print(f"Radio: SF{DEFAULT_RADIO.spreading_factor} / {DEFAULT_RADIO.bandwidth_khz:g} kHz / "
+          f"CR 4/{DEFAULT_RADIO.coding_rate} / preámbulo {DEFAULT_RADIO.preamble_length}")
+    print(f"Trama: {LORA_FRAME_SIZE} bytes → {airtime * 1000:.1f} ms en aire "
+          f"(+{TX_GUARD_TIME * 1000:.0f} ms de margen)")
+    print(f"Máximo teórico: {1 / (airtime + TX_GUARD_TIME):.2f} mensajes/s")
+    print()
+
+    master, slave = os.openpty()
+    arrivals = []
+    stop = threading.Event()
+    reader = threading.Thread(target=collect_tx, args=(master, arrivals, stop), daemon=True)
+    reader.start()
+
+    comm = LoRaSerialCommunicator()
+    if not comm.connect(os.ttyname(slave)):
+        print("❌ No se pudo abrir el pty")
+        sys.exit(1)
+
+    try:
+        # Sin esperar: la cola acotada rechaza lo que no cabe
+        rejected = 0
+        for i in range(BURST):
+            try:
+                comm.tx_scheduler.submit(f"TX:bench:mensaje {i}", 12)
+            except TxQueueFullError:
+                rejected += 1
+        print(f"Ráfaga de {BURST} sin esperar: {BURST - rejected} en cola, "
+              f"{rejected} rechazados (cola de {TX_QUEUE_SIZE})")
+
+        # Esperar a que se vacíe la cola
+        while comm.tx_scheduler.pending:
+            time.sleep(0.05)
+        time.sleep(0.1)
+    finally:
+        comm.disconnect()
+        stop.set()
+        os.close(master)
+        os.close(slave)
+
+    if len(arrivals) >= 2:
+        elapsed = arrivals[-1] - arrivals[0]
+        print(f"TX entregados: {len(arrivals)} en {elapsed:.2f} s → "
+              f"{(len(arrivals) - 1) / elapsed:.2f} mensajes/s medidos")
+    print(f"Estadísticas del planificador: {comm.tx_scheduler.pacer.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de extremo a extremo del servidor web con un ESP32 simulado
+Levanta web_server en proceso, lo conecta por /api/connect a un
+ESP32Simulator (pty) y mide la latencia desde que una trama llega a la
+radio simulada (el firmware la valida y escribe la línea RX) hasta que el
+frame WebSocket llega al cliente, a ritmos crecientes de mensajes recibidos.
+
+El simulador, el servidor y el cliente comparten el proceso (y el GIL): las
+latencias incluyen esa competencia, como un peor caso.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+
+import uvicorn
+import websockets
+
+import web_server
+from esp32_simulator import ESP32Simulator
+
+RATES = (10, 100, 500, 2000)   # Mensajes recibidos por segundo
+SECONDS_PER_RATE = 2.0
+MIN_MESSAGES = 50
+SENDER = "bench"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def inject(esp32: ESP32Simulator, rate: float, count: int, run: int):
+    """Mensajes al ritmo pedido; cada uno lleva el instante en que se generó"""
+    start = time.perf_counter()
+    for i in range(count):
+        due = start + i / rate
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        esp32.inject(SENDER, f"{run} {i} {time.perf_counter_ns()}", source_id=0xBE7C4)
+
+
+async def run_rate(ws, esp32: ESP32Simulator, rate: float, run: int) -> dict:
+    count = max(MIN_MESSAGES, int(rate * SECONDS_PER_RATE))
+    latencies = []
+    injector = threading.Thread(target=inject, args=(esp32, rate, count, run), daemon=True)
+    start = time.perf_counter()
+    injector.start()
+
+    deadline = time.perf_counter() + count / rate + 10
+    while len(latencies) < count and time.perf_counter() < deadline:
+        try:
+            raw = await asyncio.wait_for(ws.recv(), timeout=max(0.0, deadline - time.perf_counter()))
+        except asyncio.TimeoutError:
+            break
+        event = json.loads(raw)
+        if event.get("type") != "message" or event["data"]["sender"] != SENDER:
+            continue
+        tag, _, sent_ns = event["data"]["content"].split(" ")
+        if int(tag) == run:
+            latencies.append((time.perf_counter_ns() - int(sent_ns)) / 1e6)
+    elapsed = time.perf_counter() - start
+    injector.join()
+
+    return {
+        "expected": count,
+        "delivered": len(latencies),
+        "p50": percentile(latencies, 0.50) if latencies else float("nan"),
+        "p99": percentile(latencies, 0.99) if latencies else float("nan"),
+        "max": max(latencies, default=float("nan")),
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+async def main():
+    if not hasattr(os, "openpty"):
+        print("❌ Este benchmark requiere un sistema con pty (Linux/macOS)")
+        sys.exit(1)
+
+    # Se mide el camino serial -> WebSocket, no la consola ni SQLite
+    logging.disable(logging.INFO)
+    web_server.HISTORY_DB = ""
+
+    esp32 = ESP32Simulator(boot_delay=0.2, seed=1).start()
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    loop = asyncio.get_running_loop()
+    connect_start = time.perf_counter()
+    await loop.run_in_executor(None, post, f"http://127.0.0.1:{port}/api/connect",
+                               {"name": "e2e", "port": esp32.port})
+    connect_time = time.perf_counter() - connect_start
+
+    print("=" * 60)
+    print("Extremo a extremo: línea RX del ESP32 simulado -> frame WebSocket")
+    print("=" * 60)
+    print(f"Puerto: {esp32.port} | conexión (arranque de {esp32.boot_delay:.1f} s incluido): "
+          f"{connect_time * 1000:.0f} ms")
+    print()
+    print(f"{'Ritmo (msg/s)':>13} {'Entregados':>12} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'máx (ms)':>9} {'Recibidos/s':>12}")
+
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws", max_queue=None) as ws:
+        await ws.recv()  # Estado inicial
+        for run, rate in enumerate(RATES):
+            r = await run_rate(ws, esp32, rate, run)
+            print(f"{rate:>13} {r['delivered']:>6}/{r['expected']:<5} {r['p50']:>9.2f} "
+                  f"{r['p99']:>9.2f} {r['max']:>9.2f} {r['throughput']:>12.0f}")
+
+    await loop.run_in_executor(None, post, f"http://127.0.0.1:{port}/api/disconnect", {})
+    server.should_exit = True
+    await server_task
+    esp32.stop()
+    print()
+    print(f"Firmware simulado: {esp32.stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark de CPU por evento en la difusión WebSocket
+Compara serializar el evento una vez por cliente (send_json en cada
+conexión, como antes) con serializarlo una sola vez y enviar el mismo texto
+a todos, según la cantidad de clientes. Usa WebSockets falsos para medir
+solo el costo del servidor
+"""
+
+import asyncio
+import json
+import time
+
+import ws_fanout
+from ws_fanout import WebSocketFanout
+
+CLIENT_COUNTS = (1, 10, 100, 500)
+EVENTS = 2000
+
+# Evento típico de tráfico DEBUG intenso
+EVENT = {
+    "type": "status",
+    "device": "/dev/ttyUSB0",
+    "data": "DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED",
+}
+
+
+class FakeWebSocket:
+    """WebSocket que descarta lo enviado (mismo JSON que Starlette)"""
+
+    async def send_text(self, data: str):
+        pass
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+
+
+async def drain(fanout: WebSocketFanout):
+    while any(not session.queue.empty() for session in fanout.clients.values()):
+        await asyncio.sleep(0)
+
+
+async def measure(clients: int, mode: str) -> float:
+    """CPU en µs por evento difundido"""
+    fanout = WebSocketFanout(queue_size=EVENTS + 1)
+    for _ in range(clients):
+        fanout.add(FakeWebSocket())
+    sessions = list(fanout.clients.values())
+
+    start = time.process_time()
+    for _ in range(EVENTS):
+        if mode == "por cliente":
+            # Camino anterior: el dict viaja a cada conexión y cada una lo serializa
+            for session in sessions:
+                session.queue.put_nowait((EVENT, 0))
+        else:
+            fanout.publish(EVENT)
+    await drain(fanout)
+    elapsed = time.process_time() - start
+
+    await fanout.close_all()
+    return elapsed / EVENTS * 1e6
+
+
+async def main():
+    backends = [("json", None)]
+    if ws_fanout.orjson is not None:
+        backends.append(("orjson", ws_fanout.orjson))
+
+    print("=" * 60)
+    print("CPU por evento difundido (µs)")
+    print("=" * 60)
+    header = f"{'Clientes':>9} {'por cliente':>12}"
+    for name, _ in backends:
+        header += f" {'una vez (' + name + ')':>18}"
+    print(header)
+
+    original = ws_fanout.orjson
+    for clients in CLIENT_COUNTS:
+        row = f"{clients:>9} {await measure(clients, 'por cliente'):>12.1f}"
+        for _, backend in backends:
+            ws_fanout.orjson = backend
+            row += f" {await measure(clients, 'una vez'):>18.1f}"
+        ws_fanout.orjson = original
+        print(row)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Prueba de carga de la difusión WebSocket
+Levanta el servidor web en proceso, conecta cientos de clientes WebSocket
+locales (algunos que nunca leen) y mide la latencia de entrega p50/p99
+desde state.broadcast() hasta cada cliente
+"""
+
+import asyncio
+import json
+import socket
+import time
+
+import uvicorn
+import websockets
+
+import web_server
+
+CLIENT_COUNTS = (50, 200, 500)
+STALLED_CLIENTS = 10
+EVENTS = 200
+EVENT_RATE = 200  # eventos/s
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def reader(url: str, latencies: list, ready: asyncio.Event, connected: list):
+    """Cliente normal: registra la latencia de cada evento de prueba"""
+    async with websockets.connect(url, max_queue=None) as ws:
+        await ws.recv()  # Estado inicial
+        connected.append(1)
+        ready.set()
+        async for raw in ws:
+            event = json.loads(raw)
+            if event.get("data") == "BENCH":
+                latencies.append(time.perf_counter_ns() - event["sent_ns"])
+                if event["last"]:
+                    return
+
+
+async def stalled(url: str, stop: asyncio.Event, connected: list):
+    """Cliente colgado: se conecta y nunca lee"""
+    async with websockets.connect(url, max_queue=1) as ws:
+        connected.append(1)
+        await stop.wait()
+
+
+async def run_round(url: str, clients: int) -> dict:
+    latencies, connected = [], []
+    stop = asyncio.Event()
+    ready = asyncio.Event()
+
+    stalled_tasks = [asyncio.create_task(stalled(url, stop, connected)) for _ in range(STALLED_CLIENTS)]
+    readers = [asyncio.create_task(reader(url, latencies, ready, connected)) for _ in range(clients)]
+    while len(connected) < clients + STALLED_CLIENTS:
+        await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        await web_server.state.broadcast({
+            "type": "status",
+            "data": "BENCH",
+            "sent_ns": time.perf_counter_ns(),
+            "last": i == EVENTS - 1,
+        })
+        await asyncio.sleep(1 / EVENT_RATE)
+
+    await asyncio.wait(readers, timeout=30)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*stalled_tasks, return_exceptions=True)
+    for task in readers:
+        task.cancel()
+
+    latencies_ms = [ns / 1e6 for ns in latencies]
+    return {
+        "delivered": len(latencies_ms),
+        "expected": clients * EVENTS,
+        "p50": percentile(latencies_ms, 0.50),
+        "p99": percentile(latencies_ms, 0.99),
+        "elapsed": elapsed,
+    }
+
+
+async def main():
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port,
+                                           log_level="warning", ws_max_queue=1))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    print("=" * 60)
+    print("Prueba de carga de la difusión WebSocket")
+    print("=" * 60)
+    print(f"Eventos: {EVENTS} a {EVENT_RATE}/s | Clientes colgados: {STALLED_CLIENTS} | "
+          f"Política: {web_server.WS_SLOW_CLIENT_POLICY}")
+    print()
+    print(f"{'Clientes':>9} {'Entregados':>12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'Duración (s)':>13}")
+
+    for clients in CLIENT_COUNTS:
+        r = await run_round(url, clients)
+        print(f"{clients:>9} {r['delivered']:>6}/{r['expected']:<6}{r['p50']:>9.2f} "
+              f"{r['p99']:>10.2f} {r['elapsed']:>13.2f}")
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
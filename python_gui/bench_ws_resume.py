@@ -0,0 +1,110 @@
+"""
+Benchmark de tormenta de reconexiones
+Tras un corte en el que se difundieron algunos mensajes, cientos de
+clientes se reconectan a la vez. Compara recargar el historial completo por
+REST (comportamiento anterior de app.js) con reanudar el WebSocket con
+?last_seq= y recibir solo los eventos perdidos
+"""
+
+import asyncio
+import json
+import socket
+import time
+
+import httpx
+import uvicorn
+import websockets
+
+import web_server
+
+CLIENTS = 200
+HISTORY = 1000   # Mensajes ya en el historial antes del corte
+MISSED = 20      # Mensajes difundidos durante el corte
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def broadcast_message(i: int):
+    msg = web_server.state.add_message("nodo", f"mensaje {i}", -80.0, "/dev/ttyUSB0")
+    await web_server.state.broadcast({
+        "type": "message",
+        "device": "/dev/ttyUSB0",
+        "data": {"id": msg.id, "sender": msg.sender, "content": msg.content,
+                 "timestamp": msg.timestamp, "rssi": -80.0, "is_own": False,
+                 "device": "/dev/ttyUSB0"}
+    })
+
+
+async def full_reload(base: str, http: httpx.AsyncClient) -> int:
+    """Reconexión anterior: WebSocket nuevo + historial completo por REST"""
+    received = 0
+    async with websockets.connect(f"ws://{base}/ws") as ws:
+        received += len(await ws.recv())
+        response = await http.get(f"http://{base}/api/messages", params={"limit": HISTORY})
+        received += len(response.content)
+    return received
+
+
+async def resume(base: str, last_seq: int, epoch: str) -> int:
+    """Reconexión nueva: el servidor reenvía solo lo perdido"""
+    received = 0
+    async with websockets.connect(f"ws://{base}/ws?last_seq={last_seq}&epoch={epoch}") as ws:
+        while True:
+            raw = await ws.recv()
+            received += len(raw)
+            event = json.loads(raw)
+            if event["type"] == "resync":
+                raise RuntimeError("El registro no alcanzó para reanudar")
+            if "epoch" in event:  # Estado inicial: la reanudación terminó
+                return received
+
+
+async def storm(name: str, reconnect) -> tuple:
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(reconnect() for _ in range(CLIENTS)))
+    return name, time.perf_counter() - start, sum(sizes) / len(sizes)
+
+
+async def main():
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(web_server.app, host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base = f"127.0.0.1:{port}"
+
+    for i in range(HISTORY):
+        await broadcast_message(i)
+    last_seq, epoch = web_server.state.clients.seq, web_server.state.clients.epoch
+    for i in range(MISSED):
+        await broadcast_message(HISTORY + i)
+
+    print("=" * 60)
+    print("Tormenta de reconexiones")
+    print("=" * 60)
+    print(f"Clientes: {CLIENTS} | Historial: {HISTORY} mensajes | Perdidos en el corte: {MISSED}")
+    print()
+    print(f"{'Reconexión':<22} {'Duración (s)':>13} {'Bytes/cliente':>14}")
+
+    limits = httpx.Limits(max_connections=CLIENTS)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as http:
+        results = [
+            await storm("historial completo", lambda: full_reload(base, http)),
+            await storm("reanudar last_seq", lambda: resume(base, last_seq, epoch)),
+        ]
+    for name, elapsed, size in results:
+        print(f"{name:<22} {elapsed:>13.2f} {size:>14.0f}")
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    # Sin historial persistente: el benchmark no debe tocar la base real
+    web_server.HISTORY_DB = ""
+    asyncio.run(main())
@@ -0,0 +1,388 @@
+"""
+ESP32 simulado sobre un pseudo-terminal (pty)
+Implementa el firmware de src/main.cpp del lado del puerto serial para
+probar la aplicación sin hardware: el mismo arranque (banner y READY), los
+comandos de Process_Serial_Command (TX, PING, STATUS, ID, RSSI) con sus
+respuestas, y la recepción de tramas LoRa con el filtrado de
+Process_Received_Message (magic, CRC, mensajes propios, tamaño de datos).
+
+    with ESP32Simulator(boot_delay=0.2) as esp32:
+        comm = LoRaSerialCommunicator()
+        comm.connect(esp32.port)
+        esp32.inject("nodo1", "hola")    # Llega como RX:nodo1:hola:-87.50
+
+Como la placa real, se reinicia cada vez que se abre el puerto (auto-reset
+por DTR) y lo recibido durante el arranque se pierde. Solo POSIX.
+"""
+
+import errno
+import os
+import queue
+import random
+import select
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from lora_frame import (
+    encode_chat_frame, decode_frame, FrameError, CRC_INVALID, INVALID_MAGIC_BYTES,
+    PROTOCOL_MAGIC
+)
+from serial_comm import lora_time_on_air, LoRaRadioConfig, DEFAULT_RADIO
+
+BOOT_DELAY = 1.0           # delay(1000) tras Serial.begin en setup()
+COMMAND_BUFFER_SIZE = 200  # Largo máximo de un comando (serialBuffer)
+DEFAULT_RSSI = -87.5
+
+# Identidad USB publicada (puente CP210x de las placas Heltec)
+USB_VID = 0x10C4
+USB_PID = 0xEA60
+
+BANNER = (
+    "\r\n=================================\r\n"
+    "  Sistema LoRa P2P Chat v2.0\r\n"
+    "  Tekroy Desarrollos\r\n"
+    "=================================\r\n\r\n"
+)
+
+
+def _strtoull_hex(text: str) -> int:
+    """strtoull(text, NULL, 16): dígitos hexadecimales iniciales, 0 si no hay"""
+    text = text.strip()
+    if text[:2].lower() == "0x":
+        text = text[2:]
+    digits = ""
+    for char in text:
+        if char not in "0123456789abcdefABCDEF":
+            break
+        digits += char
+    return min(int(digits, 16), 0xFFFFFFFFFFFFFFFF) if digits else 0
+
+
+def _float_text(value: float) -> str:
+    # Serial.println(float) imprime 2 decimales
+    return f"{value:.2f}"
+
+
+def random_device_id(rng=random) -> int:
+    """DEVICE_ID como Generate_Unique_ID: MAC de 48 bits mezclada con millis()"""
+    mac = rng.getrandbits(48)
+    return (mac ^ (rng.getrandbits(20) << 16)) or 0x544B524F59
+
+
+class ESP32Simulator:
+    """
+    Firmware LoRa P2P del lado maestro de un pty
+
+    `port` es el nombre del lado esclavo, para abrir con pyserial como
+    cualquier puerto. Un thread atiende los comandos y las tramas recibidas
+    en orden, como el loop() del firmware.
+    """
+
+    def __init__(self, device_id: Optional[int] = None, boot_delay: float = BOOT_DELAY,
+                 latency: float = 0.0, rx_rate: float = 0.0, noise_rate: float = 0.0,
+                 rssi: float = DEFAULT_RSSI, radio: Optional[LoRaRadioConfig] = DEFAULT_RADIO,
+                 serial_number: Optional[str] = None, seed: Optional[int] = None):
+        """
+        Args:
+            device_id: DEVICE_ID de 64 bits (default: al azar, como el firmware)
+            boot_delay: Segundos desde que se abre el puerto hasta el banner
+            latency: Segundos que tarda el firmware en responder cada comando
+            rx_rate: Mensajes recibidos por segundo generados solos (llegadas
+                     de Poisson; 0 = solo los que se inyectan)
+            noise_rate: Fracción del tráfico generado que es ruido de otras
+                        redes (magic inválido) o llega con el CRC dañado
+            rssi: RSSI de las tramas recibidas por defecto (dBm)
+            radio: Parámetros de radio para el tiempo en aire de TX (None = TX
+                   instantáneo)
+            serial_number: Número de serie USB (default: derivado del DEVICE_ID)
+            seed: Semilla del tráfico generado (para repetir una prueba)
+        """
+        if not hasattr(os, "openpty"):
+            raise NotImplementedError("ESP32Simulator requiere un sistema con pty (Linux/macOS)")
+
+        self._rng = random.Random(seed)
+        self.device_id = device_id if device_id is not None else random_device_id(self._rng)
+        self.boot_delay = boot_delay
+        self.latency = latency
+        self.rx_rate = rx_rate
+        self.noise_rate = noise_rate
+        self.rssi = rssi
+        self.radio = radio
+        self.serial_number = serial_number or f"SIM-{self.device_id & 0xFFFFFFFF:08X}"
+
+        # Recibe cada trama al comenzar su transmisión (ver radio_medium)
+        self.on_transmit: Optional[Callable[[bytes], None]] = None
+        self.last_rssi = rssi
+        self.boots = 0
+        self.stats = {"commands": 0, "sent": 0, "received": 0, "filtered": 0, "lost": 0}
+
+        self.master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        # Sin el esclavo abierto, leer el maestro da EIO hasta que alguien
+        # abre el puerto: así se detectan las aperturas (y los reinicios)
+        os.close(slave)
+
+        self._radio_rx = queue.SimpleQueue()
+        self._wake_r, self._wake_w = os.pipe()
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ===================== CICLO DE VIDA =====================
+
+    def start(self) -> "ESP32Simulator":
+        """Arranca el firmware (y el tráfico generado si rx_rate > 0)"""
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._loop, daemon=True,
+                                          name=f"esp32-sim-{self.port}")]
+        if self.rx_rate > 0:
+            self._threads.append(threading.Thread(target=self._traffic, daemon=True,
+                                                  name=f"esp32-sim-rx-{self.port}"))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el firmware y cierra el pty (el puerto desaparece)"""
+        self._stop.set()
+        os.write(self._wake_w, b"\0")
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        for fd in (self.master, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def port_info(self):
+        """ListPortInfo del puerto, como lo listaría serial.tools.list_ports"""
+        from serial.tools.list_ports_common import ListPortInfo
+
+        info = ListPortInfo(self.port)
+        info.vid, info.pid, info.serial_number = USB_VID, USB_PID, self.serial_number
+        info.description = "ESP32 simulado (LoRa P2P)"
+        return info
+
+    # ===================== RADIO =====================
+
+    def inject(self, sender: str, message: str, source_id: Optional[int] = None,
+               rssi: Optional[float] = None):
+        """
+        Recibe un mensaje de chat de otro nodo (armado como la trama real)
+
+        Args:
+            sender: Nombre del remitente
+            message: Texto
+            source_id: DEVICE_ID del remitente (default: al azar)
+            rssi: RSSI de la trama (default: self.rssi)
+        """
+        if source_id is None:
+            source_id = random_device_id(self._rng)
+        self.receive(encode_chat_frame(source_id, source_id, sender, message), rssi)
+
+    def receive(self, raw: bytes, rssi: Optional[float] = None):
+        """
+        Entrega una trama tal como llegó por el aire (puede ser inválida);
+        el firmware la procesa en su loop
+        """
+        if not self._running:
+            self.stats["lost"] += 1  # Apagado o arrancando: la radio no escucha
+            return
+        self._radio_rx.put((bytes(raw), self.rssi if rssi is None else rssi))
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+
+    def _process_frame(self, raw: bytes, rssi: float):
+        """Process_Received_Message: mismas validaciones y líneas que el firmware"""
+        try:
+            frame = decode_frame(raw)
+        except FrameError as e:
+            self.stats["filtered"] += 1
+            if e.reason == CRC_INVALID:
+                self._println("ERROR:CRC_INVALID")
+            elif e.reason == INVALID_MAGIC_BYTES:
+                self._println("DEBUG:INVALID_MAGIC_BYTES:NOISE_FILTERED")
+            else:
+                self._println(f"DEBUG:{e.reason}")
+            return
+
+        if frame.source_id == self.device_id:
+            self.stats["filtered"] += 1
+            self._println("DEBUG:IGNORING_OWN_MESSAGE")
+            return
+
+        self.stats["received"] += 1
+        self.last_rssi = rssi
+        sender, message = frame.chat()
+        self._println(f"RX:{sender}:{message}:{_float_text(rssi)}")
+
+    def _traffic(self):
+        """Mensajes de otros nodos con llegadas de Poisson a rx_rate por segundo"""
+        count = 0
+        while not self._stop.wait(self._rng.expovariate(self.rx_rate)):
+            count += 1
+            source_id = 0x1000 + count % 8
+            raw = bytearray(encode_chat_frame(source_id, source_id, f"nodo{count % 8}",
+                                              f"mensaje simulado {count}"))
+            if self._rng.random() < self.noise_rate:
+                if self._rng.random() < 0.5:
+                    raw[:4] = b"\x40\x00\x01\x02"  # LoRaWAN u otro protocolo
+                else:
+                    raw[self._rng.randrange(len(raw))] ^= 1 << self._rng.randrange(8)
+            rssi = self.rssi + self._rng.gauss(0, 2)
+            self.receive(bytes(raw), round(rssi, 1))
+
+    # ===================== PUERTO SERIAL =====================
+
+    def _println(self, line: str):
+        """Serial.println: escribe la línea terminada en \\r\\n"""
+        self._write((line + "\r\n").encode("utf-8"))
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            try:
+                os.write(self.master, data)
+            except OSError:
+                pass  # Puerto cerrado: la salida se pierde como en la placa
+
+    def _discard_input(self):
+        while select.select([self.master], [], [], 0)[0]:
+            try:
+                os.read(self.master, 4096)
+            except OSError:
+                return
+
+    def _boot(self):
+        """setup(): banner, DEVICE_ID, LoRa y READY; lo recibido mientras tanto se pierde"""
+        self.boots += 1
+        if self._stop.wait(self.boot_delay):
+            return
+        self._discard_input()
+        self._write(BANNER.encode())
+        self._println(f"DEVICE_ID: 0x{self.device_id:X}")
+        self._println(f"PROTOCOL_MAGIC: 0x{PROTOCOL_MAGIC:X}")
+        self._println("")
+        self._println("STATUS:LORA_READY")
+        self._println("READY")
+        self._running = True
+
+    def _loop(self):
+        """loop(): tramas recibidas y comandos seriales, en orden"""
+        buffer = bytearray()
+        opened = False
+        while not self._stop.is_set():
+            readable = select.select([self.master, self._wake_r], [], [], 0.1)[0]
+            if self._wake_r in readable:
+                os.read(self._wake_r, 4096)
+
+            if self.master in readable:
+                try:
+                    data = os.read(self.master, 4096)
+                except OSError as e:
+                    if e.errno != errno.EIO:
+                        return
+                    if opened:
+                        # Puerto cerrado: al reabrirlo la placa se reinicia
+                        opened, self._running = False, False
+                        buffer.clear()
+                    self._stop.wait(0.01)
+                    continue
+                if not opened:
+                    opened = True
+                    self._boot()
+                    continue
+                for byte in data:
+                    if byte in (0x0A, 0x0D):
+                        if buffer:
+                            self._command(buffer.decode("utf-8", "replace"))
+                            buffer.clear()
+                    elif len(buffer) < COMMAND_BUFFER_SIZE:
+                        buffer.append(byte)
+
+            while self._running:
+                try:
+                    raw, rssi = self._radio_rx.get_nowait()
+                except queue.Empty:
+                    break
+                self._process_frame(raw, rssi)
+
+    def _command(self, command: str):
+        """Process_Serial_Command"""
+        command = command.strip()
+        if not command:
+            return
+        self.stats["commands"] += 1
+        if self.latency:
+            self._stop.wait(self.latency)
+
+        if command.startswith("TX:"):
+            first_colon = command.find(":", 3)
+            if first_colon > 0:
+                self._send(command[3:first_colon], command[first_colon + 1:])
+            else:
+                self._println("ERROR:INVALID_TX_FORMAT")
+        elif command == "PING":
+            self._println("PONG:LORA_P2P")
+        elif command == "STATUS":
+            # (unsigned long)DEVICE_ID: el ESP32 imprime solo los 32 bits bajos
+            self._println(f"STATUS:OK:ID:{self.device_id & 0xFFFFFFFF:X}")
+        elif command.startswith("ID:"):
+            self.device_id = _strtoull_hex(command[3:])
+            self._println(f"CONFIG:ID:{self.device_id & 0xFFFFFFFF:X}")
+        elif command == "RSSI":
+            self._println(f"RSSI:{_float_text(self.last_rssi)}")
+        else:
+            self._println("ERROR:UNKNOWN_COMMAND")
+
+    def _send(self, name: str, message: str):
+        """Send_LoRa_Message: la transmisión bloquea el loop durante el tiempo en aire"""
+        raw = encode_chat_frame(self.device_id, self.device_id, name, message)
+        if self.on_transmit:
+            self.on_transmit(raw)
+        if self.radio is not None:
+            self._stop.wait(lora_time_on_air(len(raw), self.radio))
+        self.stats["sent"] += 1
+        self._println(f"SENT:OK:{name}:{message}")
+
+
+# Simulador interactivo: python esp32_simulator.py [--boot S] [--latency S] [--rx-rate N]
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ESP32 LoRa P2P simulado sobre un pty")
+    parser.add_argument("--boot", type=float, default=BOOT_DELAY, help="Demora de arranque (s)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Demora por comando (s)")
+    parser.add_argument("--rx-rate", type=float, default=0.0, help="Mensajes recibidos por segundo")
+    parser.add_argument("--noise", type=float, default=0.0, help="Fracción de tramas con ruido")
+    args = parser.parse_args()
+
+    try:
+        simulator = ESP32Simulator(boot_delay=args.boot, latency=args.latency,
+                                   rx_rate=args.rx_rate, noise_rate=args.noise)
+    except NotImplementedError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    with simulator:
+        print(f"✅ ESP32 simulado en {simulator.port} (DEVICE_ID 0x{simulator.device_id:X})")
+        print("   Ctrl+C para terminar")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    print(f"📊 {simulator.stats}")
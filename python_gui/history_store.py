@@ -0,0 +1,235 @@
+"""
+Historial persistente de mensajes en SQLite
+Las escrituras se encolan sin bloquear y un thread escritor las agrupa en
+transacciones; la base usa WAL para que las lecturas no esperen a las
+escrituras. Los mensajes más viejos que la retención se borran por tandas
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_SIZE = 100000   # Mensajes pendientes de escribir antes de descartar
+BATCH_SIZE = 500            # Máximo de mensajes por transacción
+FLUSH_INTERVAL = 0.2        # Espera máxima para juntar una tanda (segundos)
+PURGE_INTERVAL = 3600.0     # Cada cuánto se aplica la retención (segundos)
+PURGE_CHUNK = 10000         # Filas borradas por transacción al purgar
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL NOT NULL,
+    sender  TEXT NOT NULL,
+    content TEXT NOT NULL,
+    rssi    REAL,
+    device  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender, ts);
+"""
+
+
+class StoredMessage(NamedTuple):
+    """Fila del historial"""
+    id: int
+    ts: float
+    sender: str
+    content: str
+    rssi: Optional[float]
+    device: Optional[str]
+
+
+class MessageHistoryStore:
+    """Historial de mensajes en SQLite con escrituras en un thread aparte"""
+
+    def __init__(self, path: str, retention_days: float = 0,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_pending: int = WRITE_QUEUE_SIZE):
+        """
+        Args:
+            path: Archivo de la base de datos
+            retention_days: Días que se conservan los mensajes (0 = para siempre)
+            batch_size: Máximo de mensajes por transacción
+            flush_interval: Espera máxima para juntar una tanda en segundos
+            max_pending: Mensajes en espera de escritura antes de descartar
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._read_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._reader = self._open()
+        self._reader.executescript(_SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ===================== ESCRITURA =====================
+
+    def start(self):
+        """Inicia el thread escritor"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer_loop, daemon=True,
+                                            name="history-writer")
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el thread escritor"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        with self._read_lock:
+            self._reader.close()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def append(self, sender: str, content: str, rssi: Optional[float] = None,
+               device: Optional[str] = None, ts: Optional[float] = None,
+               msg_id: Optional[int] = None) -> bool:
+        """
+        Encola un mensaje para escribirlo (no bloquea)
+
+        Returns:
+            True si se encoló, False si la cola de escritura estaba llena
+        """
+        row = (msg_id, ts if ts is not None else time.time(), sender, content, rssi, device)
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"⚠️  Historial: cola de escritura llena, "
+                               f"{self.dropped} mensaje(s) sin guardar")
+            return False
+
+    def _writer_loop(self):
+        conn = self._open()
+        next_purge = 0.0
+        running = True
+        try:
+            while running:
+                batch = []
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                    deadline = time.monotonic() + self.flush_interval
+                    while item is not None:
+                        batch.append(item)
+                        if len(batch) >= self.batch_size:
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        item = self._queue.get(timeout=remaining)
+                    if item is None:
+                        running = False
+                except queue.Empty:
+                    pass
+
+                if batch:
+                    self._write_batch(conn, batch)
+
+                if self.retention_days > 0 and time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + PURGE_INTERVAL
+                    self._purge(conn)
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO messages (id, ts, sender, content, rssi, device) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", batch)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Historial: error escribiendo {len(batch)} mensaje(s): {e}")
+
+    def _purge(self, conn: sqlite3.Connection):
+        """Borra por tandas los mensajes más viejos que la retención"""
+        cutoff = time.time() - self.retention_days * 86400
+        deleted = 0
+        try:
+            while True:
+                with conn:
+                    cursor = conn.execute(
+                        "DELETE FROM messages WHERE id IN "
+                        "(SELECT id FROM messages WHERE ts < ? ORDER BY ts LIMIT ?)",
+                        (cutoff, PURGE_CHUNK))
+                deleted += cursor.rowcount
+                if cursor.rowcount < PURGE_CHUNK:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"❌ Historial: error aplicando la retención: {e}")
+        if deleted:
+            logger.info(f"🧹 Historial: {deleted} mensaje(s) anteriores a "
+                        f"{self.retention_days:g} días eliminados")
+
+    # ===================== LECTURA =====================
+
+    def recent(self, limit: int) -> List[StoredMessage]:
+        """Últimos mensajes guardados, del más viejo al más nuevo"""
+        return self.page(limit=limit)
+
+    def page(self, after: Optional[int] = None, before: Optional[int] = None,
+             limit: int = 100, sender: Optional[str] = None) -> List[StoredMessage]:
+        """
+        Página de mensajes por ID, del más viejo al más nuevo
+
+        Args:
+            after: Solo IDs mayores (los primeros `limit` a partir de ahí)
+            before: Solo IDs menores (los últimos `limit` antes de ahí)
+            limit: Máximo de mensajes
+            sender: Solo mensajes de este remitente
+        """
+        conditions, args = [], []
+        if sender is not None:
+            conditions.append("sender = ?")
+            args.append(sender)
+        if after is not None:
+            conditions.append("id > ?")
+            args.append(after)
+        if before is not None:
+            conditions.append("id < ?")
+            args.append(before)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        # Con `after` se avanza desde el cursor; si no, se toman los últimos
+        order = "ASC" if after is not None else "DESC"
+
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT id, ts, sender, content, rssi, device FROM messages "
+                f"{where}ORDER BY id {order} LIMIT ?", (*args, limit)).fetchall()
+        if order == "DESC":
+            rows.reverse()
+        return [StoredMessage(*row) for row in rows]
+
+    def last_id(self) -> int:
+        """Mayor ID guardado (0 si está vacío)"""
+        with self._read_lock:
+            return self._reader.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0
+
+    def count(self) -> int:
+        """Cantidad de mensajes guardados"""
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
@@ -0,0 +1,197 @@
+"""
+Logging que no bloquea el camino caliente serial
+Quien registra (el thread de lectura, el loop de asyncio) solo crea el
+LogRecord y lo encola; un thread de fondo (QueueListener) lo formatea y lo
+escribe en la consola / logs de Docker, juntando en una sola escritura lo
+que se acumuló. Así una ráfaga de líneas no queda frenada por escrituras
+lentas a stdout.
+
+Además incluye la traza cruda del serial (cada línea tal cual llega del
+ESP32, antes un print incondicional), apagada por defecto:
+
+    setup_logging()                 # En el punto de entrada (web, GUI, scripts)
+    set_raw_trace(True)             # O LORA_RAW_TRACE=1 en el entorno
+
+Los argumentos de cada registro se formatean en el listener, más tarde:
+deben ser valores que no cambien después de registrarlos (str, números,
+eventos de lora_protocol).
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Optional
+
+from metrics import LOG_DROPPED
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_QUEUE_SIZE = 10000        # Registros pendientes; en una ráfaga mayor se descartan (y se cuentan)
+WRITE_BATCH = 256             # Líneas como máximo por escritura del listener
+RAW_TRACE_ENV = "LORA_RAW_TRACE"
+
+# Traza de cada línea cruda del serial: se prende bajando su nivel a DEBUG
+raw_logger = logging.getLogger("serial.raw")
+raw_logger.setLevel(logging.INFO)
+
+_handler: Optional["_QueueHandler"] = None
+_listener: Optional["_QueueListener"] = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin formatearlo (mensaje, fecha y traceback los arma
+    el listener) y sin esperar: con la cola llena lo descarta
+    """
+
+    def __init__(self, records: queue.SimpleQueue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # SimpleQueue no tiene tope (ni locks de Python): el límite se mira acá
+        if self.queue.qsize() >= LOG_QUEUE_SIZE:
+            self.dropped += 1
+            LOG_DROPPED.inc()
+            return
+        self.queue.put(record)
+
+
+class _Formatter(logging.Formatter):
+    """Arma la fecha una vez por segundo (en una ráfaga se repite)"""
+
+    def __init__(self, fmt: str):
+        super().__init__(fmt)
+        self._second = None
+        self._date = ""
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._date = time.strftime(self.default_time_format, self.converter(record.created))
+        return self.default_msec_format % (self._date, record.msecs)
+
+
+class _BatchStreamHandler(logging.StreamHandler):
+    """Junta las líneas formateadas y las escribe de una vez en flush()"""
+
+    def __init__(self, stream, fmt: str):
+        super().__init__(stream)
+        self.setFormatter(_Formatter(fmt))
+        self.pending = []
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+        if len(self.pending) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        text = self.terminator.join(self.pending) + self.terminator
+        self.pending.clear()
+        try:
+            self.stream.write(text)
+            super().flush()
+        except Exception:
+            pass  # Sin consola (ej: cerrada al salir) no hay dónde avisar
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """Escribe los registros encolados y avisa cuántos se descartaron"""
+
+    def __init__(self, records: queue.SimpleQueue, output: _BatchStreamHandler,
+                 source: _QueueHandler):
+        super().__init__(records, output, respect_handler_level=True)
+        self.output = output
+        self.source = source
+        self.reported = 0
+
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        if not self.queue.empty():
+            return
+        # Ya no hay más pendiente: se escribe lo juntado (y el aviso de la ráfaga)
+        dropped = self.source.dropped
+        if dropped != self.reported:
+            warning = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                "⚠️  %d registro(s) de log descartados (cola de log llena)",
+                (dropped - self.reported,), None)
+            self.reported = dropped
+            super().handle(warning)
+        self.output.flush()
+
+    def stop(self):
+        super().stop()
+        self.output.flush()
+
+
+def setup_logging(level=logging.INFO, fmt: str = LOG_FORMAT,
+                  stream=None, raw_trace: Optional[bool] = None) -> logging.handlers.QueueListener:
+    """
+    Configura el logger raíz con la cola y el thread de escritura
+    (reemplaza a logging.basicConfig; se puede llamar de nuevo para cambiar
+    el destino)
+
+    Args:
+        level: Nivel del logger raíz (ej: logging.INFO o "DEBUG")
+        fmt: Formato de cada línea
+        stream: Destino (default: sys.stderr, como basicConfig)
+        raw_trace: Traza cruda del serial (None = según LORA_RAW_TRACE)
+
+    Returns:
+        El listener en marcha
+    """
+    global _handler, _listener
+    stop_logging()
+
+    records = queue.SimpleQueue()
+    _handler = _QueueHandler(records)
+    _listener = _QueueListener(records, _BatchStreamHandler(stream or sys.stderr, fmt), _handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_handler)
+    _listener.start()
+
+    if raw_trace is None:
+        raw_trace = os.environ.get(RAW_TRACE_ENV, "") not in ("", "0")
+    set_raw_trace(raw_trace)
+    return _listener
+
+
+def stop_logging():
+    """Escribe lo que quedó en la cola y saca el handler del logger raíz"""
+    global _handler, _listener
+    if _handler:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def set_raw_trace(enabled: bool):
+    """Prende o apaga la traza de cada línea cruda del serial"""
+    raw_logger.setLevel(logging.DEBUG if enabled else logging.INFO)
+
+
+def raw_trace_enabled() -> bool:
+    """Si la traza cruda está prendida (se consulta una vez por bloque leído)"""
+    return raw_logger.isEnabledFor(logging.DEBUG)
+
+
+atexit.register(stop_logging)
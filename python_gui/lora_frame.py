@@ -0,0 +1,246 @@
+"""
+Formato de trama LoRa en el aire (src/main.cpp)
+Codifica y decodifica las tramas que intercambian los ESP32:
+
+    magic (4, 0x50505050) | DEVICE_ID (8) | MESSAGE_SOURCE_ID (8) |
+    DATA_BYTE_SIZE (1) | datos (Chat_Message_Data: nombre 32 + mensaje 96) |
+    CRC-16 (2)
+
+Enteros little-endian como en el ESP32. El CRC (poly 0xA001 reflejado,
+inicial 0xFFFF) cubre todo lo anterior y se agrega en little-endian, así que
+el CRC de la trama completa da 0. Sirve para analizar capturas offline y
+para simuladores y pruebas sin hardware
+"""
+
+import struct
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Opcional: validación en lote vectorizada
+    np = None
+
+PROTOCOL_MAGIC = 0x50505050
+CRC_POLY = 0xA001
+CRC_INIT = 0xFFFF
+
+MAX_NAME_LENGTH = 32
+MAX_MESSAGE_LENGTH = 96
+CHAT_DATA_SIZE = MAX_NAME_LENGTH + MAX_MESSAGE_LENGTH
+
+HEADER_SIZE = 21                 # magic + DEVICE_ID + MESSAGE_SOURCE_ID + DATA_BYTE_SIZE
+CRC_SIZE = 2
+MIN_FRAME_SIZE = HEADER_SIZE + CRC_SIZE
+FRAME_SIZE = HEADER_SIZE + CHAT_DATA_SIZE + CRC_SIZE   # Trama de chat: 151 bytes
+MAX_FRAME_SIZE = 192             # BUFFER_SIZE del firmware
+
+_HEADER = struct.Struct("<IQQB")
+_MAGIC_BYTES = struct.pack("<I", PROTOCOL_MAGIC)
+
+# Motivos de rechazo: los mismos códigos DEBUG/ERROR que reporta el firmware
+PACKET_TOO_SHORT = "PACKET_TOO_SHORT"
+PACKET_TOO_LARGE = "PACKET_TOO_LARGE"
+INVALID_MAGIC_BYTES = "INVALID_MAGIC_BYTES"
+CRC_INVALID = "CRC_INVALID"
+INVALID_DATA_SIZE = "INVALID_DATA_SIZE"
+
+
+class FrameError(ValueError):
+    """Trama inválida; `reason` es el código con que la rechaza el firmware"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+class LoRaFrame(NamedTuple):
+    """Trama decodificada"""
+    device_id: int
+    source_id: int
+    data: bytes
+
+    def chat(self) -> Tuple[str, str]:
+        """(remitente, mensaje) de los datos Chat_Message_Data"""
+        return decode_chat(self.data)
+
+
+# ===================== CRC-16 =====================
+
+def _make_crc_table(poly: int) -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _make_crc_table(CRC_POLY)
+
+
+def crc16(data: bytes, crc: int = CRC_INIT) -> int:
+    """
+    CRC-16 por tabla (un paso por byte), igual a Calculate_CRC del firmware
+
+    Args:
+        data: Bytes a cubrir
+        crc: Valor inicial (para continuar un cálculo por partes)
+    """
+    table = CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_bitwise(data: bytes, poly: int = CRC_POLY) -> int:
+    """Calculate_CRC de src/main.cpp bit a bit (referencia para comparar)"""
+    crc = CRC_INIT
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+    return crc
+
+
+# ===================== CODIFICACIÓN =====================
+
+def _fixed_text(text: str, size: int) -> bytes:
+    # strncpy(dst, src, size - 1) sobre un buffer en cero: siempre termina en NUL
+    raw = text.encode('utf-8')[:size - 1]
+    return raw + bytes(size - len(raw))
+
+
+def encode_chat(sender: str, message: str) -> bytes:
+    """
+    Chat_Message_Data: nombre y mensaje en campos fijos terminados en NUL
+    (se truncan a 31 y 95 bytes como hace el firmware)
+    """
+    return _fixed_text(sender, MAX_NAME_LENGTH) + _fixed_text(message, MAX_MESSAGE_LENGTH)
+
+
+def decode_chat(data: bytes) -> Tuple[str, str]:
+    """(remitente, mensaje) de un Chat_Message_Data (completo o truncado)"""
+    name = data[:MAX_NAME_LENGTH].split(b"\0", 1)[0]
+    message = data[MAX_NAME_LENGTH:CHAT_DATA_SIZE].split(b"\0", 1)[0]
+    return name.decode('utf-8', 'replace'), message.decode('utf-8', 'replace')
+
+
+def encode_frame(device_id: int, source_id: int, data: bytes) -> bytes:
+    """
+    Arma una trama con su CRC
+
+    Args:
+        device_id: DEVICE_ID (64 bits)
+        source_id: MESSAGE_SOURCE_ID (64 bits; el receptor ignora los suyos)
+        data: Datos (hasta 255 bytes y que la trama quepa en MAX_FRAME_SIZE)
+    """
+    if len(data) > MAX_FRAME_SIZE - MIN_FRAME_SIZE:
+        raise ValueError(f"Datos demasiado largos ({len(data)} bytes)")
+    body = _HEADER.pack(PROTOCOL_MAGIC, device_id, source_id, len(data)) + data
+    return body + crc16(body).to_bytes(2, 'little')
+
+
+def encode_chat_frame(device_id: int, source_id: int, sender: str, message: str) -> bytes:
+    """Trama de chat como la que transmite Send_LoRa_Message (FRAME_SIZE bytes)"""
+    return encode_frame(device_id, source_id, encode_chat(sender, message))
+
+
+# ===================== DECODIFICACIÓN =====================
+
+def decode_frame(raw: bytes) -> LoRaFrame:
+    """
+    Valida y decodifica una trama con las mismas reglas que el receptor del
+    firmware (Process_Received_Message)
+
+    Raises:
+        FrameError: Con el motivo del rechazo
+    """
+    length = len(raw)
+    if length < MIN_FRAME_SIZE:
+        raise FrameError(PACKET_TOO_SHORT, f"{length} bytes")
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(PACKET_TOO_LARGE, f"{length} bytes")
+    if raw[:4] != _MAGIC_BYTES:
+        raise FrameError(INVALID_MAGIC_BYTES, raw[:4].hex())
+    if crc16(raw) != 0:
+        raise FrameError(CRC_INVALID)
+
+    _, device_id, source_id, size = _HEADER.unpack_from(raw)
+    if HEADER_SIZE + size + CRC_SIZE > length:
+        raise FrameError(INVALID_DATA_SIZE, f"{size} bytes de datos en {length}")
+    return LoRaFrame(device_id, source_id, bytes(raw[HEADER_SIZE:HEADER_SIZE + size]))
+
+
+def frame_error(raw: bytes) -> Optional[str]:
+    """Motivo de rechazo de una trama, o None si es válida"""
+    try:
+        decode_frame(raw)
+    except FrameError as e:
+        return e.reason
+    return None
+
+
+# ===================== VALIDACIÓN EN LOTE =====================
+
+def crc16_batch(frames):
+    """
+    CRC-16 de muchas tramas del mismo largo a la vez (requiere NumPy)
+
+    Recorre las columnas de bytes aplicando la tabla a todas las tramas en
+    cada paso: tantas operaciones vectoriales como bytes tiene una trama.
+
+    Args:
+        frames: Matriz uint8 de (tramas, largo)
+
+    Returns:
+        Vector uint16 con el CRC de cada trama
+    """
+    if np is None:
+        raise RuntimeError("crc16_batch requiere NumPy")
+    frames = np.asarray(frames, dtype=np.uint8)
+    table = np.array(CRC_TABLE, dtype=np.uint16)
+    crc = np.full(frames.shape[0], CRC_INIT, dtype=np.uint16)
+    for column in frames.T:
+        crc = (crc >> 8) ^ table[(crc ^ column) & 0xFF]
+    return crc
+
+
+def validate_frames(frames: Sequence[bytes]) -> List[Optional[str]]:
+    """
+    Valida muchas tramas capturadas (con NumPy si está instalado)
+
+    Las tramas se agrupan por largo y cada grupo se valida con crc16_batch;
+    sin NumPy se valida una por una con frame_error.
+
+    Returns:
+        Por cada trama, None si es válida o el motivo de rechazo
+    """
+    if np is None:
+        return [frame_error(raw) for raw in frames]
+
+    errors: List[Optional[str]] = [None] * len(frames)
+    by_length = {}
+    for i, raw in enumerate(frames):
+        length = len(raw)
+        if length < MIN_FRAME_SIZE:
+            errors[i] = PACKET_TOO_SHORT
+        elif length > MAX_FRAME_SIZE:
+            errors[i] = PACKET_TOO_LARGE
+        else:
+            by_length.setdefault(length, []).append(i)
+
+    magic = np.frombuffer(_MAGIC_BYTES, dtype=np.uint8)
+    for length, indexes in by_length.items():
+        batch = np.frombuffer(b"".join(frames[i] for i in indexes),
+                              dtype=np.uint8).reshape(len(indexes), length)
+        bad_magic = (batch[:, :4] != magic).any(axis=1)
+        bad_crc = crc16_batch(batch) != 0
+        bad_size = batch[:, HEADER_SIZE - 1].astype(np.int32) + MIN_FRAME_SIZE > length
+        for row in np.flatnonzero(bad_magic | bad_crc | bad_size):
+            errors[indexes[row]] = (INVALID_MAGIC_BYTES if bad_magic[row] else
+                                    CRC_INVALID if bad_crc[row] else INVALID_DATA_SIZE)
+    return errors
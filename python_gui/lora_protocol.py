@@ -0,0 +1,218 @@
+"""
+Protocolo serial ESP32 → PC
+Convierte cada línea del firmware en un evento tipado mediante una tabla de
+despacho indexada por el prefijo de la línea (RX, SENT, STATUS, ...)
+"""
+
+from typing import Callable, Dict, Optional
+
+
+# ===================== EVENTOS =====================
+
+class LoRaEvent:
+    """Evento base: conserva la línea original recibida"""
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}"
+                           for cls in type(self).__mro__
+                           for name in getattr(cls, "__slots__", ()))
+        return f"{type(self).__name__}({fields})"
+
+
+class RxEvent(LoRaEvent):
+    """Mensaje recibido por LoRa: RX:Nombre:Mensaje:RSSI"""
+
+    __slots__ = ("sender", "text", "rssi")
+
+    def __init__(self, raw: str, sender: str, text: str, rssi: Optional[float]):
+        self.raw = raw
+        self.sender = sender
+        self.text = text
+        self.rssi = rssi
+
+
+class SentEvent(LoRaEvent):
+    """Confirmación de transmisión: SENT:OK:Nombre:Mensaje"""
+
+    __slots__ = ("sender", "text")
+
+    def __init__(self, raw: str, sender: str, text: str):
+        self.raw = raw
+        self.sender = sender
+        self.text = text
+
+
+class StatusEvent(LoRaEvent):
+    """Estado del dispositivo: STATUS:OK:ID:XXXX o STATUS:LORA_READY"""
+
+    __slots__ = ("code", "device_id")
+
+    def __init__(self, raw: str, code: str, device_id: Optional[str] = None):
+        self.raw = raw
+        self.code = code
+        self.device_id = device_id
+
+
+class RssiEvent(LoRaEvent):
+    """Respuesta al comando RSSI: RSSI:-87.50"""
+
+    __slots__ = ("rssi",)
+
+    def __init__(self, raw: str, rssi: Optional[float]):
+        self.raw = raw
+        self.rssi = rssi
+
+
+class ErrorEvent(LoRaEvent):
+    """Error del firmware: ERROR:CODIGO[:detalle]"""
+
+    __slots__ = ("code", "detail")
+
+    def __init__(self, raw: str, code: str, detail: str = ""):
+        self.raw = raw
+        self.code = code
+        self.detail = detail
+
+
+class DebugEvent(LoRaEvent):
+    """Diagnóstico del firmware: DEBUG:CATEGORIA[:detalle]"""
+
+    __slots__ = ("category", "detail")
+
+    def __init__(self, raw: str, category: str, detail: str = ""):
+        self.raw = raw
+        self.category = category
+        self.detail = detail
+
+
+class PongEvent(LoRaEvent):
+    """Respuesta al PING: PONG:LORA_P2P"""
+
+    __slots__ = ("device_type",)
+
+    def __init__(self, raw: str, device_type: str):
+        self.raw = raw
+        self.device_type = device_type
+
+
+class ConfigEvent(LoRaEvent):
+    """Confirmación de configuración: CONFIG:ID:XXXX"""
+
+    __slots__ = ("key", "value")
+
+    def __init__(self, raw: str, key: str, value: str):
+        self.raw = raw
+        self.key = key
+        self.value = value
+
+
+class ReadyEvent(LoRaEvent):
+    """El firmware terminó de inicializarse: READY"""
+
+    __slots__ = ()
+
+
+class InfoEvent(LoRaEvent):
+    """Cualquier otra línea (banner de arranque, FATAL, líneas mal formadas)"""
+
+    __slots__ = ()
+
+
+# ===================== PARSERS POR PREFIJO =====================
+# Cada parser recibe (línea, resto tras el primer ':') y devuelve el evento,
+# o None si la línea está mal formada (se emite entonces como InfoEvent)
+
+def _to_float(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _parse_rx(line: str, rest: str) -> Optional[LoRaEvent]:
+    # El nombre no puede contener ':' (el firmware corta en el primero) y el
+    # RSSI siempre es el último campo, así que el mensaje puede contener ':'
+    sender, sep, tail = rest.partition(':')
+    text, sep_rssi, rssi = tail.rpartition(':')
+    if not sep or not sep_rssi:
+        return None
+    return RxEvent(line, sender, text, _to_float(rssi))
+
+
+def _parse_sent(line: str, rest: str) -> Optional[LoRaEvent]:
+    parts = rest.split(':', 2)
+    if len(parts) < 3 or parts[0] != "OK":
+        return None
+    return SentEvent(line, parts[1], parts[2])
+
+
+def _parse_status(line: str, rest: str) -> LoRaEvent:
+    code, _, tail = rest.partition(':')
+    key, _, value = tail.partition(':')
+    return StatusEvent(line, code, value if key == "ID" else None)
+
+
+def _parse_rssi(line: str, rest: str) -> LoRaEvent:
+    return RssiEvent(line, _to_float(rest))
+
+
+def _parse_error(line: str, rest: str) -> LoRaEvent:
+    code, _, detail = rest.partition(':')
+    return ErrorEvent(line, code, detail)
+
+
+def _parse_debug(line: str, rest: str) -> LoRaEvent:
+    category, _, detail = rest.partition(':')
+    return DebugEvent(line, category, detail)
+
+
+def _parse_pong(line: str, rest: str) -> LoRaEvent:
+    return PongEvent(line, rest)
+
+
+def _parse_config(line: str, rest: str) -> Optional[LoRaEvent]:
+    key, sep, value = rest.partition(':')
+    if not sep:
+        return None
+    return ConfigEvent(line, key, value)
+
+
+def _parse_ready(line: str, rest: str) -> Optional[LoRaEvent]:
+    return ReadyEvent(line) if line == "READY" else None
+
+
+_PARSERS: Dict[str, Callable[[str, str], Optional[LoRaEvent]]] = {
+    "RX": _parse_rx,
+    "SENT": _parse_sent,
+    "STATUS": _parse_status,
+    "RSSI": _parse_rssi,
+    "ERROR": _parse_error,
+    "DEBUG": _parse_debug,
+    "PONG": _parse_pong,
+    "CONFIG": _parse_config,
+    "READY": _parse_ready,
+}
+
+
+def parse_line(line: str) -> LoRaEvent:
+    """
+    Convierte una línea del firmware en un evento tipado
+
+    Args:
+        line: Línea recibida, sin '\\n' ni espacios en los extremos
+
+    Returns:
+        Evento correspondiente al prefijo, o InfoEvent si no se reconoce
+    """
+    prefix, _, rest = line.partition(':')
+    parser = _PARSERS.get(prefix)
+    if parser is not None:
+        event = parser(line, rest)
+        if event is not None:
+            return event
+    return InfoEvent(line)
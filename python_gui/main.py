@@ -8,7 +8,9 @@ from tkinter import ttk, scrolledtext, messagebox
 from datetime import datetime
 import json
 import os
+from log_pipeline import setup_logging
 from serial_comm import LoRaSerialCommunicator
+from serial_supervisor import SerialSupervisor, STATE_CONNECTED, STATE_RECONNECTING
 
 
 class LoRaChatGUI:
@@ -37,6 +39,8 @@ class LoRaChatGUI:
         self.communicator.on_message_received = self.on_message_received
         self.communicator.on_status_update = self.on_status_update
         self.communicator.on_error = self.on_error
+        # Reconexión automática mientras dura la sesión
+        self.supervisor = None
         
         # Construir interfaz
         self.build_ui()
@@ -192,10 +196,11 @@ class LoRaChatGUI:
         self.setup_status_label.config(text="Detectando dispositivos LoRa...", foreground="blue")
         self.root.update()
         
-        def progress_callback(port, current, total):
+        def progress_callback(port, current, total, is_lora):
             """Actualiza el estado durante la detección"""
+            result = "LoRa detectado" if is_lora else "sin respuesta"
             self.setup_status_label.config(
-                text=f"Probando {current}/{total}: {port.split(' - ')[0]}...",
+                text=f"[{current}/{total}] {port.split(' - ')[0]}: {result}",
                 foreground="blue"
             )
             self.root.update()
@@ -258,7 +263,14 @@ class LoRaChatGUI:
         self.setup_status_label.config(text="Conectando...", foreground="blue")
         self.root.update()
         
+        if self.supervisor:
+            self.supervisor.stop()
+            self.supervisor = None
+        
         if self.communicator.connect(port):
+            self.supervisor = SerialSupervisor(self.communicator, port,
+                                               on_state_change=self.on_link_state)
+            self.supervisor.start()
             self.show_chat_window()
         else:
             messagebox.showerror(
@@ -497,12 +509,26 @@ class LoRaChatGUI:
         """Callback para errores"""
         self.root.after(0, lambda: self.add_system_message(f"ERROR: {error}"))
     
+    def on_link_state(self, link: str, detail: str):
+        """Callback del supervisor al perder o recuperar el enlace"""
+        def update():
+            if link == STATE_CONNECTED:
+                self.connection_label.config(text="● Conectado", foreground="green")
+                self.add_system_message(f"Dispositivo {detail}")
+            elif link == STATE_RECONNECTING:
+                self.connection_label.config(text="● Reconectando...", foreground="orange")
+                self.add_system_message(f"Enlace perdido ({detail}), reconectando...")
+        self.root.after(0, update)
+    
     # ==================== CIERRE DE APLICACIÓN ====================
     
     def on_closing(self):
         """Maneja el cierre de la aplicación"""
         if messagebox.askokcancel("Salir", "¿Deseas cerrar la aplicación?"):
-            self.communicator.disconnect()
+            if self.supervisor:
+                self.supervisor.stop()
+            else:
+                self.communicator.disconnect()
             self.save_config()
             self.root.destroy()
 
@@ -532,4 +558,5 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -0,0 +1,132 @@
+"""
+Historial de mensajes en memoria como buffer circular
+Capacidad fija preasignada: agregar y desalojar el más viejo es O(1), las
+búsquedas por ID son binarias sobre el orden del buffer y un índice por
+remitente permite filtrar sin recorrer todo el historial
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+MAX_CAPACITY = 100000
+
+
+class MessageRing:
+    """
+    Buffer circular de mensajes ordenados por ID creciente
+
+    Los mensajes solo necesitan los atributos `id` y `sender`.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Mensajes que se conservan (1 a MAX_CAPACITY)
+        """
+        if not 1 <= capacity <= MAX_CAPACITY:
+            raise ValueError(f"Capacidad del historial inválida: {capacity} (1 a {MAX_CAPACITY})")
+        self.capacity = capacity
+        self._slots: List[Any] = [None] * capacity
+        self._start = 0     # Posición del mensaje más viejo
+        self._count = 0
+        self._by_sender: Dict[str, Deque[Any]] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._count):
+            yield self._at(i)
+
+    def _at(self, i: int) -> Any:
+        """Mensaje en la posición lógica i (0 = el más viejo)"""
+        return self._slots[(self._start + i) % self.capacity]
+
+    @property
+    def first_id(self) -> Optional[int]:
+        return self._at(0).id if self._count else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self._at(self._count - 1).id if self._count else None
+
+    def append(self, message: Any) -> Optional[Any]:
+        """
+        Agrega un mensaje (con ID mayor que todos los anteriores)
+
+        Returns:
+            El mensaje desalojado si el buffer estaba lleno, o None
+        """
+        evicted = None
+        if self._count == self.capacity:
+            evicted = self._slots[self._start]
+            self._start = (self._start + 1) % self.capacity
+            # Es también el más viejo de su remitente
+            senders = self._by_sender[evicted.sender]
+            senders.popleft()
+            if not senders:
+                del self._by_sender[evicted.sender]
+        else:
+            self._count += 1
+
+        self._slots[(self._start + self._count - 1) % self.capacity] = message
+        self._by_sender.setdefault(message.sender, deque()).append(message)
+        return evicted
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._by_sender.clear()
+
+    def _bisect(self, msg_id: int) -> int:
+        """Primera posición lógica con ID mayor o igual a msg_id"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(mid).id < msg_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def page(self, after: Optional[int] = None, before: Optional[int] = None,
+             limit: int = 100) -> List[Any]:
+        """
+        Mensajes por ID, del más viejo al más nuevo
+
+        Args:
+            after: Solo IDs mayores (los primeros `limit` a partir de ahí)
+            before: Solo IDs menores (los últimos `limit` antes de ahí)
+            limit: Máximo de mensajes
+        """
+        lo = self._bisect(after + 1) if after is not None else 0
+        hi = self._bisect(before) if before is not None else self._count
+        if after is not None:
+            hi = min(hi, lo + limit)
+        else:
+            lo = max(lo, hi - limit)
+        return [self._at(i) for i in range(lo, hi)]
+
+    def by_sender(self, sender: str, after: Optional[int] = None,
+                  before: Optional[int] = None, limit: int = 100) -> List[Any]:
+        """Mensajes de un remitente por ID, con los mismos cursores que page()"""
+        messages = self._by_sender.get(sender)
+        if not messages:
+            return []
+        page = []
+        # Con `after` se avanza desde el cursor; si no, se toman los últimos
+        for message in (messages if after is not None else reversed(messages)):
+            if (after is not None and message.id <= after) or \
+                    (before is not None and message.id >= before):
+                continue
+            page.append(message)
+            if len(page) >= limit:
+                break
+        if after is None:
+            page.reverse()
+        return page
+
+    def senders(self) -> Dict[str, int]:
+        """Cantidad de mensajes en memoria por remitente"""
+        return {sender: len(messages) for sender, messages in self._by_sender.items()}
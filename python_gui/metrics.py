@@ -0,0 +1,304 @@
+"""
+Métricas del gateway en el formato de texto de Prometheus
+Contadores, gauges e histogramas mínimos sin dependencias externas. En el
+camino caliente solo se suman enteros (sin locks ni formateo); el texto se
+arma recién cuando alguien consulta /metrics, y los valores que se pueden
+leer del estado (cola de TX, clientes WebSocket) se calculan en ese momento.
+
+Las sumas desde varios threads no usan lock: en el peor caso se pierde
+algún incremento, aceptable para métricas.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lora_protocol import RxEvent, ErrorEvent, DebugEvent
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+MAX_LABEL_VALUES = 200        # Valores distintos por métrica (ej: remitentes); el resto va a "_other"
+OTHER_LABEL = "_other"
+PARSE_SAMPLE_EVERY = 16       # Se cronometra el parseo de 1 de cada N líneas
+
+# Segundos: parseo de una línea (µs) y entrega WebSocket (ms)
+PARSE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+LATENCY_BUCKETS = (1e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base: nombre, ayuda, etiquetas e hijos por combinación de etiquetas"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names:
+            self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Serie para una combinación de etiquetas (conviene guardarla si se
+        usa en el camino caliente)
+        """
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} espera las etiquetas {self.label_names}")
+            if len(self._children) >= MAX_LABEL_VALUES:
+                key = (OTHER_LABEL,) * len(key)
+                child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _samples(self) -> Iterable[Tuple[str, str, float]]:
+        """(sufijo, etiquetas, valor) de cada serie"""
+        for key, child in list(self._children.items()):
+            yield "", _label_text(self.label_names, key), child.value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_number(value)}")
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Contador que solo crece (el nombre debería terminar en _total)"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    Valor que sube y baja; con set_function se calcula al consultar
+
+        TX_QUEUE_DEPTH.set_function(lambda: {(dev.key,): dev.pending for dev in devices})
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self._function: Optional[Callable] = None
+        super().__init__(name, help_text, labels, registry)
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable):
+        """
+        Args:
+            function: Sin etiquetas devuelve un número; con etiquetas, un
+                      dict {(valores de etiquetas): número}
+        """
+        self._function = function
+
+    def _samples(self):
+        if self._function is None:
+            yield from super()._samples()
+            return
+        result = self._function()
+        if not self.label_names:
+            yield "", "", result
+            return
+        for key, value in result.items():
+            yield "", _label_text(self.label_names, tuple(map(str, key))), value
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribución en buckets acumulativos (le = límite superior incluido)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS,
+                 registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            bounds = self.buckets + (float("inf"),)
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                labels = _label_text(self.label_names + ("le",), key + (_number(bound),))
+                yield "_bucket", labels, cumulative
+            labels = _label_text(self.label_names, key)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ===================== MÉTRICAS DEL GATEWAY =====================
+
+SERIAL_LINES = Counter("lora_serial_lines_total", "Líneas leídas del puerto serial", ["port"])
+PARSE_SECONDS = Histogram("lora_serial_parse_seconds",
+                          f"Tiempo de parseo de una línea (1 de cada {PARSE_SAMPLE_EVERY})",
+                          buckets=PARSE_BUCKETS)
+RX_MESSAGES = Counter("lora_rx_messages_total", "Mensajes LoRa recibidos por remitente", ["sender"])
+FIRMWARE_ERRORS = Counter("lora_firmware_errors_total",
+                          "Líneas ERROR del firmware por código (CRC_INVALID, RX_FAILED, TX_FAILED...)",
+                          ["code"])
+FIRMWARE_FILTERED = Counter("lora_firmware_filtered_total",
+                            "Tramas descartadas por el firmware según las líneas DEBUG", ["reason"])
+TX_QUEUE_DEPTH = Gauge("lora_tx_queue_depth", "Mensajes esperando transmisión", ["device"])
+BROADCAST_SECONDS = Histogram("lora_ws_broadcast_latency_seconds",
+                              "Desde la difusión de un evento hasta su envío a cada cliente WebSocket")
+WS_CLIENTS = Gauge("lora_ws_clients", "Clientes WebSocket conectados")
+LOG_DROPPED = Counter("lora_log_records_dropped_total",
+                      "Registros de log descartados por la cola de log llena")
+
+
+# Series ya resueltas por valor de etiqueta: evita labels() en cada línea
+_RX_SERIES: Dict[str, _Value] = {}
+_ERROR_SERIES: Dict[str, _Value] = {}
+_FILTERED_SERIES: Dict[str, _Value] = {}
+
+
+def _series(metric: _Metric, cache: Dict[str, _Value], value: str) -> _Value:
+    series = metric.labels(value)
+    if len(cache) < MAX_LABEL_VALUES:
+        cache[value] = series
+    return series
+
+
+class LineMetrics:
+    """
+    Instrumentación de las líneas de un puerto, para los comunicadores:
+
+        started = self.metrics.parse_started()
+        event = parse_line(line)
+        self.metrics.observe(event, started)
+    """
+
+    __slots__ = ("port", "lines")
+
+    def __init__(self, port: str = ""):
+        self.port = port
+        self.lines: Optional[_Value] = None   # La serie aparece con la primera línea
+
+    def parse_started(self) -> int:
+        """
+        Cuenta la línea; devuelve el instante de inicio si a esta le toca
+        cronometrarse, si no 0
+        """
+        lines = self.lines
+        if lines is None:
+            lines = self.lines = SERIAL_LINES.labels(self.port)
+        lines.value += 1
+        if lines.value % PARSE_SAMPLE_EVERY:
+            return 0
+        return time.perf_counter_ns()
+
+    def observe(self, event, started: int = 0):
+        """Clasifica el evento de la línea (y registra el parseo si se cronometró)"""
+        if started:
+            PARSE_SECONDS.observe((time.perf_counter_ns() - started) / 1e9)
+        kind = type(event)
+        if kind is RxEvent:
+            sender = event.sender
+            series = _RX_SERIES.get(sender) or _series(RX_MESSAGES, _RX_SERIES, sender)
+        elif kind is ErrorEvent:
+            code = event.code
+            series = _ERROR_SERIES.get(code) or _series(FIRMWARE_ERRORS, _ERROR_SERIES, code)
+        elif kind is DebugEvent:
+            reason = event.category
+            series = (_FILTERED_SERIES.get(reason) or
+                      _series(FIRMWARE_FILTERED, _FILTERED_SERIES, reason))
+        else:
+            return
+        series.value += 1
@@ -0,0 +1,264 @@
+"""
+Canal de radio LoRa compartido entre ESP32 simulados
+Conecta muchos ESP32Simulator (cada uno un pty que abre
+LoRaSerialCommunicator) a través de un canal que modela:
+
+- tiempo en aire de cada trama según SF/BW/CR (lora_time_on_air)
+- colisiones entre transmisiones superpuestas, con efecto captura: la
+  trama sobrevive si supera a cada interferente por CAPTURE_THRESHOLD dB
+- half-duplex: un nodo que transmite no escucha
+- RSSI con pérdida de trayecto log-distancia y sombreado aleatorio, y
+  la sensibilidad del receptor para el SF/BW configurado
+- tráfico ajeno opcional (LoRaWAN u otras redes) en el mismo canal
+
+Las tramas llegan a cada firmware simulado, que aplica su filtrado de
+magic y CRC: una colisión se ve como ERROR:CRC_INVALID en el receptor
+que estaba enganchado a la trama y el tráfico ajeno como
+DEBUG:INVALID_MAGIC_BYTES.
+
+    with RadioMedium(seed=1) as medium:
+        a = medium.add_node((0, 0), boot_delay=0.1)
+        b = medium.add_node((800, 300), boot_delay=0.1)
+        # a.port y b.port se abren con LoRaSerialCommunicator
+"""
+
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from esp32_simulator import ESP32Simulator
+from serial_comm import lora_time_on_air, LoRaRadioConfig, DEFAULT_RADIO
+
+TX_POWER_DBM = 10.0          # LORA_TX_POWER de src/main.cpp
+PATH_LOSS_1M = 31.7          # Pérdida en espacio libre a 1 m en 915 MHz (dB)
+PATH_LOSS_EXPONENT = 2.7     # Suburbano; 2.0 = espacio libre
+SHADOWING_SIGMA = 4.0        # Desvío del sombreado por trama (dB)
+CAPTURE_THRESHOLD = 6.0      # Ventaja para sobrevivir a una colisión (dB, mismo SF)
+
+# Sensibilidad del SX1262 a 125 kHz por SF (dBm)
+SENSITIVITY_125KHZ = {7: -124.0, 8: -127.0, 9: -130.0, 10: -133.0, 11: -135.5, 12: -138.0}
+
+FOREIGN_MAGIC = b"\x40\x00\x01\x02"  # Trama LoRaWAN típica (otra red)
+
+Position = Tuple[float, float]
+
+
+class Transmission(NamedTuple):
+    """Una trama en el aire"""
+    sender: Optional[ESP32Simulator]   # None = tráfico ajeno
+    position: Position
+    raw: bytes
+    start: float
+    end: float
+    rssi: Dict[ESP32Simulator, float]  # Con qué potencia llega a cada nodo
+
+
+def sensitivity(radio: LoRaRadioConfig) -> float:
+    """Sensibilidad del receptor (dBm) para el SF y el ancho de banda"""
+    base = SENSITIVITY_125KHZ.get(radio.spreading_factor, -124.0)
+    return base + 10 * math.log10(radio.bandwidth_khz / 125.0)
+
+
+class RadioMedium:
+    """
+    Canal compartido: recibe las tramas de cada nodo al comenzar su
+    transmisión y las entrega a los demás cuando terminan, según el modelo
+    """
+
+    def __init__(self, radio: LoRaRadioConfig = DEFAULT_RADIO, tx_power: float = TX_POWER_DBM,
+                 path_loss_exponent: float = PATH_LOSS_EXPONENT,
+                 shadowing: float = SHADOWING_SIGMA, capture_threshold: float = CAPTURE_THRESHOLD,
+                 interference_rate: float = 0.0, area: float = 1000.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            radio: Parámetros de radio de todos los nodos
+            tx_power: Potencia de transmisión (dBm)
+            path_loss_exponent: Exponente de la pérdida log-distancia
+            shadowing: Desvío del sombreado aleatorio por trama (dB, 0 = sin)
+            capture_threshold: dB que una trama debe superar a cada
+                               interferente para sobrevivir
+            interference_rate: Tramas ajenas por segundo (0 = canal exclusivo)
+            area: Lado (m) del cuadrado donde aparecen los transmisores ajenos
+            seed: Semilla del modelo (para repetir una prueba)
+        """
+        self.radio = radio
+        self.tx_power = tx_power
+        self.path_loss_exponent = path_loss_exponent
+        self.shadowing = shadowing
+        self.capture_threshold = capture_threshold
+        self.interference_rate = interference_rate
+        self.area = area
+        self.sensitivity = sensitivity(radio)
+
+        self.nodes: List[ESP32Simulator] = []
+        self.positions: Dict[ESP32Simulator, Position] = {}
+        self.stats = {"transmissions": 0, "foreign": 0, "delivered": 0, "collided": 0,
+                      "half_duplex": 0, "out_of_range": 0}
+
+        self._rng = random.Random(seed)
+        self._seed = seed
+        self._lock = threading.Condition()
+        self._pending = []            # Heap (fin, n, Transmission) por entregar
+        self._air: List[Transmission] = []   # Recientes, para ver superposiciones
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ===================== NODOS =====================
+
+    def add_node(self, position: Position = (0.0, 0.0), **simulator_args) -> ESP32Simulator:
+        """
+        Crea un ESP32 simulado conectado al canal
+
+        Args:
+            position: (x, y) en metros
+            **simulator_args: Argumentos de ESP32Simulator (boot_delay, latency...)
+        """
+        if "seed" not in simulator_args and self._seed is not None:
+            simulator_args["seed"] = self._seed + len(self.nodes) + 1
+        node = ESP32Simulator(radio=self.radio, **simulator_args)
+        node.on_transmit = lambda raw: self.transmit(node, raw)
+        with self._lock:
+            self.nodes.append(node)
+            self.positions[node] = position
+        if self._thread:
+            node.start()
+        return node
+
+    def mean_rssi(self, a: Position, b: Position) -> float:
+        """RSSI medio entre dos posiciones (sin sombreado)"""
+        distance = max(1.0, math.dist(a, b))
+        return self.tx_power - PATH_LOSS_1M - 10 * self.path_loss_exponent * math.log10(distance)
+
+    def _rssi(self, a: Position, b: Position) -> float:
+        rssi = self.mean_rssi(a, b)
+        if self.shadowing:
+            rssi += self._rng.gauss(0, self.shadowing)
+        return rssi
+
+    # ===================== CICLO DE VIDA =====================
+
+    def start(self) -> "RadioMedium":
+        """Arranca el canal y los firmwares de los nodos"""
+        if self._thread:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="radio-medium")
+        self._thread.start()
+        for node in self.nodes:
+            node.start()
+        return self
+
+    def stop(self):
+        """Detiene el canal y los nodos (sus puertos desaparecen)"""
+        self._stop.set()
+        with self._lock:
+            self._lock.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for node in self.nodes:
+            node.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ===================== CANAL =====================
+
+    def transmit(self, sender: Optional[ESP32Simulator], raw: bytes,
+                 position: Optional[Position] = None):
+        """
+        Pone una trama en el aire; se entrega al terminar su tiempo en aire
+
+        Args:
+            sender: Nodo que transmite (None = transmisor ajeno)
+            raw: Trama tal como sale de la radio
+            position: Posición del transmisor ajeno
+        """
+        now = time.monotonic()
+        with self._lock:
+            if sender is not None:
+                position = self.positions[sender]
+                self.stats["transmissions"] += 1
+            else:
+                self.stats["foreign"] += 1
+            # Un sorteo de sombreado por enlace y trama, igual para toda la entrega
+            rssi = {node: self._rssi(position, self.positions[node])
+                    for node in self.nodes if node is not sender}
+            tx = Transmission(sender, position, bytes(raw), now,
+                              now + lora_time_on_air(len(raw), self.radio), rssi)
+            self._air.append(tx)
+            heapq.heappush(self._pending, (tx.end, next(self._counter), tx))
+            self._lock.notify_all()
+
+    def _foreign_frame(self) -> Tuple[bytes, Position]:
+        raw = FOREIGN_MAGIC + self._rng.randbytes(self._rng.randint(19, 47))
+        position = (self._rng.uniform(0, self.area), self._rng.uniform(0, self.area))
+        return raw, position
+
+    def _run(self):
+        next_foreign = (time.monotonic() + self._rng.expovariate(self.interference_rate)
+                        if self.interference_rate > 0 else math.inf)
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_foreign:
+                self.transmit(None, *self._foreign_frame())
+                next_foreign = now + self._rng.expovariate(self.interference_rate)
+
+            with self._lock:
+                due = []
+                while self._pending and self._pending[0][0] <= now:
+                    due.append(heapq.heappop(self._pending)[2])
+                if not due:
+                    wake = min(self._pending[0][0] if self._pending else math.inf, next_foreign)
+                    self._lock.wait(min(0.1, max(0.0, wake - now)))
+                    continue
+                deliveries = [delivery for tx in due for delivery in self._receptions(tx)]
+                # Se olvidan las que ya no se superponen con nada pendiente ni futuro
+                horizon = min([now] + [pending.start for _, _, pending in self._pending])
+                self._air = [tx for tx in self._air if tx.end >= horizon]
+
+            for node, raw, rssi in deliveries:
+                node.receive(raw, rssi)
+
+    def _receptions(self, tx: Transmission) -> List[Tuple[ESP32Simulator, bytes, float]]:
+        """Qué recibe cada nodo de una trama que terminó (con self._lock tomado)"""
+        overlapping = [other for other in self._air
+                       if other is not tx and other.start < tx.end and other.end > tx.start]
+        # Las entregas de tramas ajenas no cuentan en las estadísticas de la red
+        stats = self.stats if tx.sender is not None else dict.fromkeys(self.stats, 0)
+        deliveries = []
+        for node, rssi in tx.rssi.items():
+            if rssi < self.sensitivity:
+                stats["out_of_range"] += 1
+                continue
+            if any(other.sender is node for other in overlapping):
+                stats["half_duplex"] += 1
+                continue
+
+            interferers = [other for other in overlapping if other.sender is not node]
+            if any(other.rssi.get(node, -math.inf) > rssi - self.capture_threshold
+                   for other in interferers):
+                stats["collided"] += 1
+                # Solo el receptor enganchado a esta trama (la primera) la ve dañada
+                if all(tx.start <= other.start for other in interferers):
+                    deliveries.append((node, self._corrupt(tx.raw), round(rssi, 1)))
+                continue
+
+            stats["delivered"] += 1
+            deliveries.append((node, tx.raw, round(rssi, 1)))
+        return deliveries
+
+    def _corrupt(self, raw: bytes) -> bytes:
+        damaged = bytearray(raw)
+        for _ in range(self._rng.randint(1, 8)):
+            damaged[self._rng.randrange(4, len(damaged))] ^= 1 << self._rng.randrange(8)
+        return bytes(damaged)
@@ -0,0 +1,318 @@
+"""
+Captura binaria del tráfico serial y reproducción temporizada
+Formato append-only pensado para leerse con mmap, little-endian:
+
+    cabecera (24 bytes): b"LORACAP\\0" | versión u16 | reservado u16 |
+                         reservado u32 | inicio f64 (epoch, segundos)
+    registros: t u64 (ns desde el inicio) | largo u32 | dirección u8 | bytes
+
+Un registro incompleto al final (corte durante la escritura) se ignora al
+leer y se descarta al volver a abrir el archivo para seguir capturando
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+CAPTURE_MAGIC = b"LORACAP\0"
+CAPTURE_VERSION = 1
+
+# Dirección de cada bloque
+DIRECTION_RX = 0   # Leído del ESP32
+DIRECTION_TX = 1   # Escrito al ESP32
+
+FLUSH_INTERVAL = 1.0          # Segundos como máximo entre volcados a disco
+WRITE_BUFFER_SIZE = 64 * 1024
+
+_HEADER = struct.Struct("<8sHHId")
+_RECORD = struct.Struct("<QIB")
+
+
+class CaptureError(ValueError):
+    """El archivo no es una captura válida"""
+
+
+class CaptureRecord(NamedTuple):
+    """Bloque capturado"""
+    t: float          # Segundos desde el inicio de la captura
+    direction: int    # DIRECTION_RX o DIRECTION_TX
+    data: bytes
+
+
+class ReplayStats(NamedTuple):
+    """Resultado de una reproducción"""
+    records: int
+    bytes: int
+    elapsed: float    # Segundos que duró la reproducción
+    max_lag: float    # Mayor atraso respecto del horario de la captura
+
+
+def _read_header(data) -> float:
+    if len(data) < _HEADER.size:
+        raise CaptureError("Archivo demasiado corto para ser una captura")
+    magic, version, _, _, start_time = _HEADER.unpack_from(data)
+    if magic != CAPTURE_MAGIC:
+        raise CaptureError("No es una captura serial (magic inválido)")
+    if version != CAPTURE_VERSION:
+        raise CaptureError(f"Versión de captura no soportada: {version}")
+    return start_time
+
+
+def _complete_end(data, offset: int) -> int:
+    """Fin del último registro completo a partir de offset"""
+    size = len(data)
+    while offset + _RECORD.size <= size:
+        _, length, _ = _RECORD.unpack_from(data, offset)
+        end = offset + _RECORD.size + length
+        if end > size:
+            break
+        offset = end
+    return offset
+
+
+# ===================== ESCRITURA =====================
+
+class CaptureWriter:
+    """
+    Graba bloques de bytes seriales con su instante
+
+    Se engancha en el comunicador (atributo `recorder`) y recibe cada bloque
+    tal como se leyó del puerto, antes de separar líneas. Seguro para usar
+    desde varios threads (lectura y transmisión).
+    """
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL):
+        """
+        Args:
+            path: Archivo de captura; si ya existe se sigue ampliando
+            flush_interval: Segundos como máximo entre volcados a disco
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Seguir la captura existente: descartar un registro a medias
+            with open(path, "r+b") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.start_time = _read_header(data)
+                end = _complete_end(data, _HEADER.size)
+                truncate = end < len(data)
+            if truncate:
+                os.truncate(path, end)
+            self._file = open(path, "ab", buffering=WRITE_BUFFER_SIZE)
+        else:
+            self.start_time = time.time()
+            self._file = open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+            self._file.write(_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0, 0, self.start_time))
+
+        # Instantes relativos al inicio de la captura, con reloj monótono
+        self._origin_ns = time.monotonic_ns() - int((time.time() - self.start_time) * 1e9)
+        self._last_flush = time.monotonic()
+
+    def record(self, data: bytes, direction: int = DIRECTION_RX, t: Optional[float] = None):
+        """
+        Agrega un bloque
+
+        Args:
+            data: Bytes tal como se leyeron o escribieron
+            direction: DIRECTION_RX (default) o DIRECTION_TX
+            t: Segundos desde el inicio de la captura (default: ahora); para
+               generar capturas sintéticas
+        """
+        now_ns = time.monotonic_ns()
+        t_ns = now_ns - self._origin_ns if t is None else int(t * 1e9)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_RECORD.pack(t_ns, len(data), direction))
+            self._file.write(data)
+            self.records += 1
+            self.bytes += len(data)
+            if now_ns / 1e9 - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now_ns / 1e9
+
+    def flush(self):
+        """Vuelca a disco lo pendiente"""
+        with self._lock:
+            if self._file:
+                self._file.flush()
+
+    def close(self):
+        """Vuelca lo pendiente y cierra el archivo"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===================== LECTURA =====================
+
+class CaptureReader:
+    """
+    Lee una captura mapeada en memoria (no carga el archivo completo)
+
+    Se puede abrir mientras otra instancia la sigue escribiendo: ve los
+    registros completos que había al abrir.
+    """
+
+    def __init__(self, path: str):
+        """
+        Raises:
+            CaptureError: Si el archivo no es una captura válida
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size == 0:
+                raise CaptureError("Archivo de captura vacío")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.start_time = _read_header(self._data)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        return self.records()
+
+    def records(self, direction: Optional[int] = None) -> Iterator[CaptureRecord]:
+        """
+        Recorre los registros completos en orden
+
+        Args:
+            direction: Solo DIRECTION_RX o DIRECTION_TX (None = todos)
+        """
+        data = self._data
+        unpack = _RECORD.unpack_from
+        size = len(data)
+        offset = _HEADER.size
+        while offset + _RECORD.size <= size:
+            t_ns, length, record_direction = unpack(data, offset)
+            start = offset + _RECORD.size
+            offset = start + length
+            if offset > size:
+                return  # Registro a medias al final
+            if direction is None or record_direction == direction:
+                yield CaptureRecord(t_ns / 1e9, record_direction, data[start:offset])
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===================== REPRODUCCIÓN =====================
+
+def replay(records: Iterable[CaptureRecord], sink: Callable[[bytes], None],
+           speed: float = 1.0, direction: Optional[int] = DIRECTION_RX,
+           stop: Optional[threading.Event] = None) -> ReplayStats:
+    """
+    Entrega los bloques de una captura respetando sus tiempos
+
+        with CaptureReader("incidente.lcap") as capture:
+            replay(capture, comm.feed, speed=10)
+
+    Args:
+        records: Registros (ej: un CaptureReader)
+        sink: Recibe cada bloque (ej: LoRaSerialCommunicator.feed, o
+              os.write sobre el maestro de un pty)
+        speed: 1 = tiempo real, N = N veces más rápido, 0 = sin esperas
+        direction: Dirección a reproducir (default: lo recibido del ESP32)
+        stop: Evento para interrumpir la reproducción
+    """
+    count = total = 0
+    max_lag = 0.0
+    first = None
+    start = time.perf_counter()
+    for record in records:
+        if direction is not None and record.direction != direction:
+            continue
+        if stop is not None and stop.is_set():
+            break
+        if speed > 0:
+            if first is None:
+                first = record.t
+            due = start + (record.t - first) / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                if stop is not None:
+                    stop.wait(wait)
+                else:
+                    time.sleep(wait)
+            max_lag = max(max_lag, time.perf_counter() - due)
+        sink(record.data)
+        count += 1
+        total += len(record.data)
+    return ReplayStats(count, total, time.perf_counter() - start, max_lag)
+
+
+async def replay_async(records: Iterable[CaptureRecord], sink: Callable[[bytes], None],
+                       speed: float = 1.0,
+                       direction: Optional[int] = DIRECTION_RX) -> ReplayStats:
+    """
+    replay() para el event loop (ej: con AsyncLoRaSerialCommunicator.feed);
+    con speed=0 cede el loop entre bloques
+    """
+    count = total = 0
+    max_lag = 0.0
+    first = None
+    start = time.perf_counter()
+    for record in records:
+        if direction is not None and record.direction != direction:
+            continue
+        if speed > 0:
+            if first is None:
+                first = record.t
+            due = start + (record.t - first) / speed
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            max_lag = max(max_lag, time.perf_counter() - due)
+        else:
+            await asyncio.sleep(0)
+        sink(record.data)
+        count += 1
+        total += len(record.data)
+    return ReplayStats(count, total, time.perf_counter() - start, max_lag)
+
+
+# Resumen de una captura: python serial_capture.py captura.lcap [--lines]
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python serial_capture.py <captura> [--lines]")
+        sys.exit(1)
+
+    with CaptureReader(sys.argv[1]) as capture:
+        counts = {DIRECTION_RX: [0, 0], DIRECTION_TX: [0, 0]}
+        last = 0.0
+        for record in capture:
+            counts[record.direction][0] += 1
+            counts[record.direction][1] += len(record.data)
+            last = record.t
+            if "--lines" in sys.argv[2:]:
+                arrow = "<-" if record.direction == DIRECTION_RX else "->"
+                print(f"{record.t:10.3f} {arrow} {record.data!r}")
+
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(capture.start_time))
+        print(f"Captura iniciada: {started} | duración: {last:.1f} s")
+        print(f"RX: {counts[DIRECTION_RX][0]} bloques, {counts[DIRECTION_RX][1]} bytes")
+        print(f"TX: {counts[DIRECTION_TX][0]} bloques, {counts[DIRECTION_TX][1]} bytes")
@@ -7,37 +7,502 @@ import serial
 import serial.tools.list_ports
 import threading
 import time
+import math
 import logging
-from typing import Callable, Optional, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, Optional, List, NamedTuple, Tuple
 
-# Configurar logger
-logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from lora_protocol import (
+    parse_line, LoRaEvent, RxEvent, SentEvent, StatusEvent, RssiEvent,
+    ErrorEvent, DebugEvent, PongEvent, ConfigEvent, ReadyEvent, InfoEvent
 )
+from metrics import LineMetrics
+from serial_capture import DIRECTION_TX
+from log_pipeline import raw_logger, raw_trace_enabled, setup_logging
+
+# Configurar logger (la salida la configura cada punto de entrada con setup_logging)
+logger = logging.getLogger(__name__)
+
+# Detección de puertos
+DETECT_MAX_WORKERS = 8        # Puertos sondeados en paralelo como máximo
+DETECT_PING_TIMEOUT = 2.0     # Espera de PONG por puerto, incluye un posible reinicio (segundos)
+DETECT_DEADLINE = 6.0         # Tiempo máximo total de la detección (segundos)
+DETECT_CACHE_TTL = 300.0      # Validez del resultado de un puerto sin cambios (segundos)
+
+# Conexión: en vez de esperar un tiempo fijo al arranque del ESP32, se espera
+# su READY (recién reiniciado) o la respuesta a un PING (ya estaba corriendo)
+READY_TIMEOUT = 3.0           # Espera máxima de READY/PONG al conectar (segundos)
+HANDSHAKE_PING_INTERVAL = 0.25  # Reenvío del PING mientras se espera (segundos)
+HANDSHAKE_READ_TIMEOUT = 0.02   # Timeout de cada lectura durante el saludo (segundos)
+
+# Modos de lectura del puerto serial
+READ_MODE_BLOCKING = "blocking"   # Lectura bloqueante en el kernel con timeout
+READ_MODE_POLL = "poll"           # Sondeo de in_waiting cada POLL_INTERVAL (modo anterior)
+READ_TIMEOUT = 0.2                # Timeout de la lectura bloqueante (segundos)
+POLL_INTERVAL = 0.01              # Pausa entre sondeos en modo poll (segundos)
+
+# Longitud máxima de una línea recibida (las del firmware no superan ~150 bytes)
+MAX_LINE_LENGTH = 1024
+
+
+class LineFramer:
+    """
+    Separa el flujo de bytes del puerto serial en líneas completas
+    
+    Trabaja sobre un bytearray: busca '\\n' desde donde terminó la búsqueda
+    anterior y solo decodifica UTF-8 la región de líneas completas, por lo
+    que una ráfaga de N líneas cuesta trabajo lineal. Las líneas más largas que
+    max_line_length se descartan hasta el siguiente salto de línea.
+    """
+    
+    __slots__ = ("max_line_length", "dropped_lines", "_buffer", "_scan_from", "_discarding")
+    
+    def __init__(self, max_line_length: int = MAX_LINE_LENGTH):
+        """
+        Args:
+            max_line_length: Bytes máximos de una línea sin terminar
+        """
+        self.max_line_length = max_line_length
+        self.dropped_lines = 0
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._discarding = False
+    
+    def feed(self, data: bytes) -> List[str]:
+        """
+        Agrega bytes recibidos y devuelve las líneas completas
+        
+        Args:
+            data: Bytes leídos del puerto
+            
+        Returns:
+            Líneas completas decodificadas, sin espacios ni '\\r' y sin vacías
+        """
+        buffer = self._buffer
+        buffer += data
+        end = buffer.rfind(b'\n', self._scan_from)
+        
+        if end == -1:
+            # Sin línea completa: solo vigilar el tamaño de la línea parcial
+            if len(buffer) > self.max_line_length:
+                if not self._discarding:
+                    self.dropped_lines += 1
+                    self._discarding = True
+                buffer.clear()
+            self._scan_from = len(buffer)
+            return []
+        
+        # Decodificar de una vez solo la región de líneas completas
+        complete = buffer[:end].decode('utf-8', errors='ignore').split('\n')
+        del buffer[:end + 1]
+        self._scan_from = len(buffer)
+        
+        if self._discarding:
+            # Cola de una línea demasiado larga ya descartada
+            complete[0] = ""
+            self._discarding = False
+        
+        lines = []
+        max_length = self.max_line_length
+        for line in complete:
+            if len(line) > max_length:
+                self.dropped_lines += 1
+                continue
+            line = line.strip()
+            if line:
+                lines.append(line)
+        
+        if len(buffer) > max_length:
+            self.dropped_lines += 1
+            self._discarding = True
+            buffer.clear()
+            self._scan_from = 0
+        
+        return lines
+    
+    def reset(self):
+        """Descarta cualquier línea parcial pendiente"""
+        self._buffer.clear()
+        self._scan_from = 0
+        self._discarding = False
+
+
+# ===================== DETECCIÓN DE PUERTOS Y SALUDO =====================
+
+class PortIdentity(NamedTuple):
+    """Identidad USB estable de un puerto según serial.tools.list_ports"""
+    device: str
+    vid: Optional[int]
+    pid: Optional[int]
+    serial_number: Optional[str]
+    location: Optional[str]
+    
+    @classmethod
+    def from_port_info(cls, info) -> "PortIdentity":
+        return cls(info.device, info.vid, info.pid, info.serial_number, info.location)
+
+
+class DetectionCache:
+    """
+    Resultados de detección por puerto, válidos mientras la identidad USB
+    del puerto no cambie y no expire el TTL
+    
+    Si en el mismo puerto aparece otro dispositivo (otro VID/PID/número de
+    serie/ubicación), la entrada deja de valer y el puerto se vuelve a sondear.
+    """
+    
+    def __init__(self, ttl: float = DETECT_CACHE_TTL):
+        """
+        Args:
+            ttl: Segundos que vale un resultado (0 desactiva la caché)
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[PortIdentity, bool, float]] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, identity: PortIdentity) -> Optional[bool]:
+        """Resultado guardado para esa identidad, o None si hay que sondear"""
+        with self._lock:
+            entry = self._entries.get(identity.device)
+            if entry and entry[0] == identity and time.monotonic() - entry[2] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+    
+    def store(self, identity: PortIdentity, is_lora: bool):
+        with self._lock:
+            self._entries[identity.device] = (identity, is_lora, time.monotonic())
+    
+    def invalidate(self, device: Optional[str] = None):
+        """Olvida un puerto (nombre sin descripción) o, sin argumento, todos"""
+        with self._lock:
+            if device is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device, None)
+
+
+DETECTION_CACHE = DetectionCache()
+
+
+def serial_handshake(ser: serial.Serial, timeout: float, accept_ready: bool = True,
+                     framer: Optional["LineFramer"] = None
+                     ) -> Tuple[Optional[LoRaEvent], List[str], List[float]]:
+    """
+    Espera a que el firmware esté listo: READY tras un reinicio o
+    PONG:LORA_P2P a un PING (que se reenvía periódicamente)
+    
+    Los PING reenviados pueden seguir teniendo respuesta después del saludo:
+    el firmware contesta cada uno en orden, y esos PONG llegan tarde.
+    
+    Args:
+        ser: Puerto ya abierto (sus timeouts se restauran al terminar)
+        timeout: Espera máxima en segundos
+        accept_ready: Si False solo vale el PONG (identificación de puertos)
+        framer: LineFramer a usar, para que los bytes de una línea a medias
+                sigan disponibles para el lector posterior
+    
+    Returns:
+        (evento READY/PONG o None si expiró, líneas recibidas mientras tanto,
+         instantes de envío (time.monotonic) de los PING aún sin respuesta)
+    """
+    framer = framer if framer is not None else LineFramer()
+    lines: List[str] = []
+    pings: List[float] = []
+    booted = None   # Primer dato recibido: lo enviado antes se pierde en el arranque
+    deadline = time.monotonic() + timeout
+    next_ping = 0.0
+    previous_timeouts = (ser.timeout, ser.write_timeout)
+    ser.timeout = HANDSHAKE_READ_TIMEOUT
+    ser.write_timeout = HANDSHAKE_PING_INTERVAL
+    
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return None, lines, pings
+            if now >= next_ping:
+                try:
+                    ser.write(b"PING\n")
+                    pings.append(now)
+                except serial.SerialTimeoutException:
+                    pass  # El USB aún no acepta datos (arrancando)
+                next_ping = now + HANDSHAKE_PING_INTERVAL
+            
+            data = ser.read(max(1, ser.in_waiting))
+            if not data:
+                continue
+            if booted is None:
+                booted = time.monotonic()
+            for line in framer.feed(data):
+                lines.append(line)
+                event = parse_line(line)
+                kind = type(event)
+                if kind is PongEvent and event.device_type == "LORA_P2P":
+                    # Responde al PING más antiguo; los siguientes siguen pendientes
+                    return event, lines, pings[1:]
+                if accept_ready and kind is ReadyEvent:
+                    return event, lines, [sent for sent in pings if sent >= booted]
+    finally:
+        ser.timeout, ser.write_timeout = previous_timeouts
+
+
+# ===================== TIEMPO EN AIRE Y PLANIFICACIÓN DE TX =====================
+
+class LoRaRadioConfig(NamedTuple):
+    """Parámetros de radio (deben coincidir con los LORA_* de src/main.cpp)"""
+    frequency_mhz: float = 915.0
+    bandwidth_khz: float = 125.0
+    spreading_factor: int = 7
+    coding_rate: int = 5          # Denominador de 4/x, igual que LORA_CODING_RATE
+    preamble_length: int = 8
+
+
+DEFAULT_RADIO = LoRaRadioConfig()
+
+# Trama del firmware: magic(4) + DEVICE_ID(8) + MESSAGE_SOURCE_ID(8) + size(1) + CRC(2)
+# más Chat_Message_Data completo (nombre 32 + mensaje 96), sin importar el texto
+LORA_FRAME_OVERHEAD = 23
+CHAT_DATA_SIZE = 32 + 96
+LORA_FRAME_SIZE = LORA_FRAME_OVERHEAD + CHAT_DATA_SIZE
+
+TX_QUEUE_SIZE = 32            # Mensajes pendientes de transmitir como máximo
+TX_GUARD_TIME = 0.05          # Margen tras cada trama para el firmware (segundos)
+TX_RETRY_DELAY = 0.1          # Primera espera tras una escritura fallida (segundos, se duplica)
+TX_RETRY_MAX_DELAY = 2.0      # Espera máxima entre reintentos de escritura (segundos)
+
+
+def lora_time_on_air(payload_bytes: int, radio: LoRaRadioConfig = DEFAULT_RADIO,
+                     explicit_header: bool = True, crc: bool = True) -> float:
+    """
+    Calcula el tiempo en aire de una trama LoRa (fórmula de Semtech AN1200.13)
+    
+    Args:
+        payload_bytes: Bytes de la trama
+        radio: Parámetros de radio
+        explicit_header: Cabecera explícita (default de RadioLib)
+        crc: CRC de capa física activado (default de RadioLib)
+    
+    Returns:
+        Tiempo en aire en segundos
+    """
+    sf = radio.spreading_factor
+    symbol_time = (2 ** sf) / (radio.bandwidth_khz * 1000)
+    # Optimización de baja tasa: obligatoria si el símbolo dura más de 16 ms
+    low_data_rate = 1 if symbol_time > 0.016 else 0
+    
+    numerator = 8 * payload_bytes - 4 * sf + 28 + 16 * int(crc) - 20 * int(not explicit_header)
+    payload_symbols = 8 + max(
+        math.ceil(numerator / (4 * (sf - 2 * low_data_rate))) * radio.coding_rate, 0)
+    
+    return (radio.preamble_length + 4.25 + payload_symbols) * symbol_time
+
+
+class TxQueueFullError(Exception):
+    """La cola de transmisión está llena (el radio no da abasto)"""
+
+
+class AirtimePacer:
+    """
+    Espacía las transmisiones según el tiempo en aire de cada trama y mide
+    el throughput efectivo
+    """
+    
+    def __init__(self, radio: LoRaRadioConfig = DEFAULT_RADIO,
+                 frame_size: int = LORA_FRAME_SIZE, guard_time: float = TX_GUARD_TIME):
+        """
+        Args:
+            radio: Parámetros de radio
+            frame_size: Bytes en aire de cada mensaje
+            guard_time: Margen adicional tras cada trama
+        """
+        self.airtime = lora_time_on_air(frame_size, radio)
+        self.guard_time = guard_time
+        self.sent = 0
+        self.rejected = 0
+        self.payload_bytes = 0
+        self._channel_free_at = 0.0
+        self._first_tx: Optional[float] = None
+        self._last_tx_end = 0.0
+    
+    def delay(self) -> float:
+        """Segundos a esperar antes de poder transmitir la siguiente trama"""
+        return max(0.0, self._channel_free_at - time.monotonic())
+    
+    def record(self, payload_bytes: int):
+        """Registra una trama entregada al firmware y reserva el canal"""
+        now = time.monotonic()
+        if self._first_tx is None:
+            self._first_tx = now
+        self._last_tx_end = now + self.airtime
+        self._channel_free_at = self._last_tx_end + self.guard_time
+        self.sent += 1
+        self.payload_bytes += payload_bytes
+    
+    def stats(self) -> dict:
+        """Throughput efectivo medido desde la primera transmisión"""
+        elapsed = (self._last_tx_end - self._first_tx) if self._first_tx is not None else 0.0
+        return {
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "airtime_per_frame_ms": round(self.airtime * 1000, 1),
+            "max_messages_per_s": round(1 / (self.airtime + self.guard_time), 2),
+            "messages_per_s": round(self.sent / elapsed, 2) if elapsed else 0.0,
+            "payload_bytes_per_s": round(self.payload_bytes / elapsed, 1) if elapsed else 0.0,
+            "channel_utilization": round(self.sent * self.airtime / elapsed, 3) if elapsed else 0.0,
+        }
+
+
+class TxScheduler:
+    """
+    Cola acotada de transmisiones con un thread que las entrega al firmware
+    al ritmo que permite el tiempo en aire
+    
+    Un mensaje que no se pudo escribir (ej: timeout de escritura mientras
+    el firmware transmite) queda al frente de la cola y se reintenta con
+    esperas crecientes hasta lograrlo o hasta stop(); si el enlace murió,
+    el latido del supervisor lo detecta y reconecta.
+    """
+    
+    def __init__(self, write: Callable[[str], bool], max_queue: int = TX_QUEUE_SIZE,
+                 pacer: Optional[AirtimePacer] = None):
+        """
+        Args:
+            write: Función que escribe un comando en el puerto; devuelve False si falla
+            max_queue: Mensajes pendientes como máximo
+            pacer: Control de tiempo en aire (default: radio de src/main.cpp)
+        """
+        self.max_queue = max_queue
+        self.pacer = pacer or AirtimePacer()
+        self._write = write
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.write_failures = 0   # Escrituras fallidas (cada una se reintenta)
+    
+    @property
+    def pending(self) -> int:
+        """Mensajes esperando transmisión"""
+        return len(self._queue)
+    
+    def submit(self, command: str, payload_bytes: int = 0,
+               block: bool = False, timeout: Optional[float] = None):
+        """
+        Encola un comando TX
+        
+        Args:
+            command: Línea de comando sin '\\n'
+            payload_bytes: Bytes de usuario (para el throughput efectivo)
+            block: Esperar lugar en la cola en vez de rechazar
+            timeout: Espera máxima si block=True (None = sin límite)
+        
+        Raises:
+            TxQueueFullError: Si la cola está llena (o sigue llena tras timeout)
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                has_room = block and self._cond.wait_for(
+                    lambda: len(self._queue) < self.max_queue, timeout)
+                if not has_room:
+                    self.pacer.rejected += 1
+                    raise TxQueueFullError(
+                        f"Cola de transmisión llena ({self.max_queue} mensajes pendientes)")
+            self._queue.append((command, payload_bytes))
+            self._cond.notify_all()
+    
+    def start(self):
+        """Inicia el thread de transmisión"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Detiene el thread; los mensajes pendientes se conservan"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+    
+    def _run(self):
+        retry_delay = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._running:
+                    return
+                
+                # Esperar a que el canal quede libre (interrumpible por stop())
+                delay = self.pacer.delay()
+                if delay > 0:
+                    self._cond.wait_for(lambda: not self._running, delay)
+                    continue
+                
+                command, payload_bytes = self._queue[0]
+            
+            if not self._write(command):
+                # Conservar el mensaje al frente y reintentar (interrumpible por stop())
+                retry_delay = min(TX_RETRY_MAX_DELAY, retry_delay * 2) if retry_delay else TX_RETRY_DELAY
+                self.write_failures += 1
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, retry_delay)
+                continue
+            
+            retry_delay = 0.0
+            self.pacer.record(payload_bytes)
+            with self._cond:
+                self._queue.popleft()
+                self._cond.notify_all()
 
 
 class LoRaSerialCommunicator:
     """Clase para manejar la comunicación serial con el módulo LoRa"""
     
-    def __init__(self, baudrate: int = 115200):
+    def __init__(self, baudrate: int = 115200, read_mode: str = READ_MODE_BLOCKING):
         """
         Inicializa el comunicador serial
         
         Args:
             baudrate: Velocidad de comunicación (default: 115200)
+            read_mode: READ_MODE_BLOCKING (default) bloquea en el kernel hasta
+                      que llegan datos; READ_MODE_POLL sondea in_waiting
         """
+        if read_mode not in (READ_MODE_BLOCKING, READ_MODE_POLL):
+            raise ValueError(f"Modo de lectura inválido: {read_mode}")
+        
         self.baudrate = baudrate
+        self.read_mode = read_mode
         self.serial_port: Optional[serial.Serial] = None
         self.is_connected = False
         self.read_thread: Optional[threading.Thread] = None
         self.running = False
+        self._write_lock = threading.Lock()
+        self._framer = LineFramer()
+        # Última vez que llegaron datos del puerto (time.monotonic)
+        self.last_rx = 0.0
+        # Captura opcional de lo leído y escrito (serial_capture.CaptureWriter)
+        self.recorder = None
+        # Contadores de /metrics (con el nombre del puerto al conectar)
+        self.metrics = LineMetrics()
+        
+        # Transmisiones LoRa espaciadas según el tiempo en aire
+        self.tx_scheduler = TxScheduler(self._write_command)
         
         # Callbacks
         self.on_message_received: Optional[Callable] = None
         self.on_status_update: Optional[Callable] = None
         self.on_error: Optional[Callable] = None
+        # Recibe cada línea ya interpretada como evento tipado (lora_protocol)
+        self.on_event: Optional[Callable[[LoRaEvent], None]] = None
         
     @staticmethod
     def list_available_ports() -> List[str]:
@@ -50,22 +515,19 @@ class LoRaSerialCommunicator:
             o solo "PUERTO" si no hay descripción disponible
         """
         ports = serial.tools.list_ports.comports()
-        port_list = []
-        
-        for port in sorted(ports, key=lambda x: x.device):
-            # Construir descripción informativa
-            if port.description and port.description != port.device:
-                # Incluir fabricante si está disponible
-                if port.manufacturer and port.manufacturer not in port.description:
-                    desc = f"{port.device} - {port.manufacturer} - {port.description}"
-                else:
-                    desc = f"{port.device} - {port.description}"
-            else:
-                desc = port.device
-            
-            port_list.append(desc)
-        
-        return port_list
+        return [LoRaSerialCommunicator._describe_port(port)
+                for port in sorted(ports, key=lambda x: x.device)]
+    
+    @staticmethod
+    def _describe_port(port) -> str:
+        """Nombre del puerto con descripción (ver list_available_ports)"""
+        # Construir descripción informativa
+        if port.description and port.description != port.device:
+            # Incluir fabricante si está disponible
+            if port.manufacturer and port.manufacturer not in port.description:
+                return f"{port.device} - {port.manufacturer} - {port.description}"
+            return f"{port.device} - {port.description}"
+        return port.device
     
     @staticmethod
     def ping_port(port: str, timeout: float = 2.0) -> bool:
@@ -79,6 +541,14 @@ class LoRaSerialCommunicator:
         Returns:
             True si el dispositivo responde con PONG:LORA_P2P, False en caso contrario
         """
+        return bool(LoRaSerialCommunicator._probe_port(port, timeout))
+    
+    @staticmethod
+    def _probe_port(port: str, timeout: float) -> Optional[bool]:
+        """
+        Como ping_port, pero devuelve None si no se pudo abrir o usar el
+        puerto (ocupado, sin permisos): ese resultado no se guarda en caché
+        """
         try:
             # Extraer el nombre del puerto si viene con descripción
             port_name = port.split(' - ')[0] if ' - ' in port else port
@@ -91,65 +561,125 @@ class LoRaSerialCommunicator:
                 write_timeout=1
             )
             
-            # Esperar inicialización
-            time.sleep(0.5)
-            
-            # Limpiar buffers
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-            
-            # Enviar PING
-            ser.write(b"PING\n")
-            ser.flush()
-            
-            # Esperar respuesta
-            start_time = time.time()
-            while (time.time() - start_time) < timeout:
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode('utf-8', errors='ignore').strip()
-                    if line.startswith("PONG:LORA_P2P"):
-                        ser.close()
-                        return True
-                time.sleep(0.1)
-            
-            ser.close()
-            return False
+            # PING (reenviado periódicamente) hasta recibir PONG:LORA_P2P; un
+            # equipo que se reinicia al abrir el puerto contesta tras su READY
+            try:
+                pong, _, _ = serial_handshake(ser, timeout, accept_ready=False)
+            finally:
+                ser.close()
+            return pong is not None
             
         except Exception as e:
-            return False
+            return None
     
     @staticmethod
-    def detect_lora_ports(progress_callback: Optional[Callable] = None) -> List[str]:
+    def detect_lora_ports(progress_callback: Optional[Callable] = None,
+                          max_workers: int = DETECT_MAX_WORKERS,
+                          deadline: float = DETECT_DEADLINE,
+                          ping_timeout: float = DETECT_PING_TIMEOUT,
+                          cache: Optional[DetectionCache] = DETECTION_CACHE) -> List[str]:
         """
         Detecta automáticamente los puertos con dispositivos LoRa P2P conectados
         mediante PING/PONG
         
+        Todos los puertos se sondean en paralelo con un pool de hilos acotado.
+        La detección termina cuando todos los puertos respondieron o expiraron,
+        o al cumplirse el plazo global (los puertos pendientes cuentan como
+        no detectados).
+        
+        Los puertos cuya identidad USB no cambió desde la última detección
+        responden desde la caché sin abrirse; solo se sondean los nuevos, los
+        que cambiaron y los expirados.
+        
         Args:
             progress_callback: Función opcional para reportar progreso
-                              Recibe (puerto_actual, total_puertos)
+                              Recibe (puerto, completados, total_puertos, es_lora)
+                              a medida que cada puerto termina su sondeo
+            max_workers: Número máximo de puertos sondeados a la vez
+            deadline: Tiempo máximo total de la detección en segundos
+            ping_timeout: Tiempo de espera del PONG en cada puerto
+            cache: Caché de resultados por identidad USB (None = sondear todo)
         
         Returns:
-            Lista de puertos que respondieron al PING (con descripción)
+            Lista de puertos que respondieron al PING (con descripción),
+            en el mismo orden que list_available_ports()
         """
-        all_ports = LoRaSerialCommunicator.list_available_ports()
-        lora_ports = []
+        infos = sorted(serial.tools.list_ports.comports(), key=lambda x: x.device)
+        if not infos:
+            return []
+        
+        all_ports = [LoRaSerialCommunicator._describe_port(info) for info in infos]
+        identities = {port: PortIdentity.from_port_info(info)
+                      for port, info in zip(all_ports, infos)}
+        total = len(all_ports)
+        found = set()
+        completed = 0
         
-        for idx, port in enumerate(all_ports):
+        # Primero lo que ya se conoce
+        to_probe = []
+        for port in all_ports:
+            cached = cache.lookup(identities[port]) if cache else None
+            if cached is None:
+                to_probe.append(port)
+                continue
+            if cached:
+                found.add(port)
+            completed += 1
             if progress_callback:
-                progress_callback(port, idx + 1, len(all_ports))
-            
-            if LoRaSerialCommunicator.ping_port(port, timeout=1.5):
-                lora_ports.append(port)
+                progress_callback(port, completed, total, cached)
         
-        return lora_ports
+        if not to_probe:
+            return [port for port in all_ports if port in found]
+        
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(to_probe))),
+            thread_name_prefix="lora-detect"
+        )
+        futures = {
+            executor.submit(LoRaSerialCommunicator._probe_port, port, ping_timeout): port
+            for port in to_probe
+        }
+        
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                port = futures.pop(future)
+                result = future.result()
+                is_lora = bool(result)
+                if is_lora:
+                    found.add(port)
+                if cache and result is not None:
+                    cache.store(identities[port], is_lora)
+                
+                completed += 1
+                if progress_callback:
+                    progress_callback(port, completed, total, is_lora)
+        
+        except FuturesTimeoutError:
+            logger.warning(f"⏱️  Plazo de detección agotado ({deadline}s), "
+                           f"{len(futures)} puerto(s) sin respuesta")
+            for port in futures.values():
+                completed += 1
+                if progress_callback:
+                    progress_callback(port, completed, total, False)
+        
+        finally:
+            # No esperar a los sondeos que siguen en curso: cierran su puerto al expirar
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return [port for port in all_ports if port in found]
     
-    def connect(self, port: str) -> bool:
+    def connect(self, port: str, ready_timeout: Optional[float] = None) -> bool:
         """
         Conecta al puerto serial especificado
         
+        Espera el READY del firmware (o la respuesta a un PING si ya estaba
+        corriendo) en lugar de un tiempo fijo; si no llega dentro del plazo
+        la conexión sigue igual, con una advertencia.
+        
         Args:
             port: Nombre del puerto (ej: 'COM3 - USB Serial' o '/dev/ttyUSB0')
                  Si contiene ' - ', se extrae solo la parte del nombre del puerto
+            ready_timeout: Espera máxima del saludo (default: READY_TIMEOUT)
             
         Returns:
             True si la conexión fue exitosa
@@ -157,31 +687,50 @@ class LoRaSerialCommunicator:
         try:
             # Extraer el nombre del puerto si viene con descripción
             port_name = port.split(' - ')[0] if ' - ' in port else port
+            self.metrics = LineMetrics(port_name)
             
             logger.info(f"🔌 Conectando al puerto {port_name}...")
             
             self.serial_port = serial.Serial(
                 port=port_name,
                 baudrate=self.baudrate,
-                timeout=1,
+                timeout=READ_TIMEOUT,
                 write_timeout=1
             )
             
-            # Esperar a que el ESP32 se inicialice
-            time.sleep(2)
-            
-            # Limpiar buffer
-            self.serial_port.reset_input_buffer()
-            self.serial_port.reset_output_buffer()
+            # Esperar a que el ESP32 esté listo
+            start = time.monotonic()
+            self._framer.reset()
+            ready, lines, _ = serial_handshake(
+                self.serial_port, READY_TIMEOUT if ready_timeout is None else ready_timeout,
+                framer=self._framer)
+            elapsed_ms = (time.monotonic() - start) * 1000
             
             self.is_connected = True
+            self.last_rx = time.monotonic()
+            
+            if ready:
+                logger.info(f"✅ Conectado exitosamente a {port_name} "
+                            f"({ready.raw} en {elapsed_ms:.0f} ms)")
+            else:
+                logger.warning(f"⚠️  Conectado a {port_name} sin READY ni PONG "
+                               f"en {elapsed_ms:.0f} ms")
             
-            logger.info(f"✅ Conectado exitosamente a {port_name}")
+            # Lo recibido durante el saludo (banner, READY) se procesa como siempre
+            if self.recorder and lines:
+                # Las líneas ya separadas: se guardan como un bloque terminado en '\n'
+                self.recorder.record("".join(f"{line}\n" for line in lines).encode('utf-8'))
+            trace = raw_trace_enabled()
+            for line in lines:
+                if trace:
+                    raw_logger.debug("[SERIAL RAW] %s", line)
+                self._process_line(line)
             
             # Iniciar thread de lectura
             self.running = True
             self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
             self.read_thread.start()
+            self.tx_scheduler.start()
             
             # Solicitar estado
             self.request_status()
@@ -189,6 +738,8 @@ class LoRaSerialCommunicator:
             return True
             
         except serial.SerialException as e:
+            if self.serial_port and self.serial_port.is_open:
+                self.serial_port.close()
             if self.on_error:
                 self.on_error(f"Error de conexión: {str(e)}")
             return False
@@ -198,6 +749,14 @@ class LoRaSerialCommunicator:
         logger.info("🔌 Desconectando...")
         
         self.running = False
+        self.tx_scheduler.stop()
+        
+        # Despertar al thread si está bloqueado en una lectura
+        if self.serial_port and self.serial_port.is_open:
+            try:
+                self.serial_port.cancel_read()
+            except (AttributeError, serial.SerialException):
+                pass
         
         if self.read_thread:
             self.read_thread.join(timeout=2)
@@ -208,16 +767,23 @@ class LoRaSerialCommunicator:
         self.is_connected = False
         logger.info("✅ Desconectado exitosamente")
     
-    def send_message(self, sender_name: str, message: str) -> bool:
+    def send_message(self, sender_name: str, message: str,
+                     block: bool = False, timeout: Optional[float] = None) -> bool:
         """
-        Envía un mensaje vía LoRa
+        Encola un mensaje para enviarlo vía LoRa
+        
+        Los mensajes salen al ritmo que permite el tiempo en aire de cada
+        trama (ver TxScheduler). Si la cola está llena el mensaje se rechaza,
+        o se espera lugar si block=True.
         
         Args:
             sender_name: Nombre del remitente
             message: Contenido del mensaje
+            block: Esperar lugar en la cola de transmisión si está llena
+            timeout: Espera máxima en segundos si block=True
             
         Returns:
-            True si el mensaje se envió correctamente
+            True si el mensaje quedó en cola para transmitirse
         """
         if not self.is_connected or not self.serial_port:
             logger.warning("⚠️  Intento de envío sin conexión activa")
@@ -227,41 +793,55 @@ class LoRaSerialCommunicator:
         
         try:
             # Formato: TX:Nombre:Mensaje\n
-            command = f"TX:{sender_name}:{message}\n"
-            self.serial_port.write(command.encode('utf-8'))
-            self.serial_port.flush()
-            logger.info(f"📡 Enviando mensaje de '{sender_name}': {message}")
+            self.tx_scheduler.submit(f"TX:{sender_name}:{message}",
+                                     len(message.encode('utf-8')), block, timeout)
+            logger.info("📡 Enviando mensaje de '%s': %s", sender_name, message)
             return True
             
-        except serial.SerialException as e:
-            logger.error(f"❌ Error al enviar mensaje: {str(e)}")
+        except TxQueueFullError as e:
+            logger.warning(f"⚠️  {e}")
             if self.on_error:
-                self.on_error(f"Error al enviar: {str(e)}")
+                self.on_error(str(e))
             return False
     
-    def request_status(self) -> bool:
-        """Solicita el estado del dispositivo"""
+    def _write_command(self, command: str) -> bool:
+        """
+        Escribe una línea de comando en el puerto serial
+        
+        Args:
+            command: Comando sin '\\n'
+        
+        Returns:
+            True si se escribió correctamente
+        """
         if not self.is_connected or not self.serial_port:
             return False
         
         try:
-            self.serial_port.write(b"STATUS\n")
-            self.serial_port.flush()
+            payload = f"{command}\n".encode('utf-8')
+            with self._write_lock:
+                self.serial_port.write(payload)
+                self.serial_port.flush()
+            if self.recorder:
+                self.recorder.record(payload, DIRECTION_TX)
             return True
-        except serial.SerialException:
+        except serial.SerialException as e:
+            logger.error(f"❌ Error al enviar comando: {str(e)}")
+            if self.on_error:
+                self.on_error(f"Error al enviar: {str(e)}")
             return False
     
+    def request_status(self) -> bool:
+        """Solicita el estado del dispositivo"""
+        return self._write_command("STATUS")
+    
     def request_rssi(self) -> bool:
         """Solicita el RSSI del último mensaje"""
-        if not self.is_connected or not self.serial_port:
-            return False
-        
-        try:
-            self.serial_port.write(b"RSSI\n")
-            self.serial_port.flush()
-            return True
-        except serial.SerialException:
-            return False
+        return self._write_command("RSSI")
+    
+    def request_ping(self) -> bool:
+        """Envía PING (el firmware responde PONG)"""
+        return self._write_command("PING")
     
     def set_device_id(self, device_id: str) -> bool:
         """
@@ -270,47 +850,75 @@ class LoRaSerialCommunicator:
         Args:
             device_id: ID en formato hexadecimal
         """
-        if not self.is_connected or not self.serial_port:
-            return False
+        return self._write_command(f"ID:{device_id}")
+    
+    def _read_chunk(self) -> bytes:
+        """
+        Lee el siguiente bloque de datos del puerto según el modo de lectura
         
-        try:
-            command = f"ID:{device_id}\n"
-            self.serial_port.write(command.encode('utf-8'))
-            self.serial_port.flush()
-            return True
-        except serial.SerialException:
-            return False
+        Returns:
+            Bytes leídos (vacío si no llegó nada)
+        """
+        if self.read_mode == READ_MODE_POLL:
+            waiting = self.serial_port.in_waiting
+            if waiting > 0:
+                return self.serial_port.read(waiting)
+            time.sleep(POLL_INTERVAL)  # Pequeño delay para no saturar CPU
+            return b""
+        
+        # Bloquear en el kernel hasta el primer byte (o READ_TIMEOUT) y luego
+        # vaciar lo que ya esté disponible sin volver a esperar
+        data = self.serial_port.read(1)
+        if data:
+            waiting = self.serial_port.in_waiting
+            if waiting > 0:
+                data += self.serial_port.read(waiting)
+        return data
     
     def _read_loop(self):
         """Loop de lectura en thread separado"""
-        buffer = ""
+        # Continúa con lo que quedó a medias del saludo
+        framer = self._framer
         
         while self.running and self.serial_port and self.serial_port.is_open:
             try:
-                if self.serial_port.in_waiting > 0:
-                    # Leer datos disponibles
-                    data = self.serial_port.read(self.serial_port.in_waiting)
-                    buffer += data.decode('utf-8', errors='ignore')
-                    
-                    # Procesar líneas completas
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        line = line.strip()
-                        
-                        if line:
-                            # SIEMPRE imprimir TODO lo que viene del serial (DEBUG)
-                            print(f"[SERIAL RAW] {line}")
-                            self._process_line(line)
-                
-                time.sleep(0.01)  # Pequeño delay para no saturar CPU
+                data = self._read_chunk()
+                if data:
+                    self.last_rx = time.monotonic()
+                    if self.recorder:
+                        self.recorder.record(data)
+                    self.feed(data)
                 
             except serial.SerialException as e:
+                if not self.running:
+                    break  # Puerto cerrado durante la desconexión
+                self.is_connected = False
                 if self.on_error:
                     self.on_error(f"Error de lectura: {str(e)}")
                 break
             except Exception as e:
                 if self.on_error:
                     self.on_error(f"Error inesperado: {str(e)}")
+        
+        if framer.dropped_lines:
+            logger.warning(f"⚠️  {framer.dropped_lines} línea(s) descartadas por exceder "
+                           f"{framer.max_line_length} bytes")
+    
+    def feed(self, data: bytes):
+        """
+        Procesa bytes como si se hubieran leído del puerto
+        
+        Lo usa el thread de lectura; también permite reproducir una captura
+        sin hardware (ver serial_capture.replay).
+        
+        Args:
+            data: Bytes crudos (pueden cortar líneas a la mitad)
+        """
+        trace = raw_trace_enabled()
+        for line in self._framer.feed(data):
+            if trace:
+                raw_logger.debug("[SERIAL RAW] %s", line)
+            self._process_line(line)
     
     def _process_line(self, line: str):
         """
@@ -319,87 +927,107 @@ class LoRaSerialCommunicator:
         Args:
             line: Línea de texto recibida
         """
-        # Mensaje recibido: RX:Nombre:Mensaje:RSSI
-        if line.startswith("RX:"):
-            parts = line.split(':', 3)
-            if len(parts) >= 4:
-                sender_name = parts[1]
-                message = parts[2]
-                rssi = parts[3]
-                
-                logger.info(f"📥 Mensaje recibido de '{sender_name}': {message} (RSSI: {rssi} dBm)")
-                
-                if self.on_message_received:
-                    self.on_message_received(sender_name, message, rssi)
-        
-        # Mensaje enviado confirmado: SENT:OK:Nombre:Mensaje
-        elif line.startswith("SENT:OK:"):
-            parts = line.split(':', 3)
-            if len(parts) >= 4:
-                name = parts[2]
-                msg = parts[3]
-                logger.info(f"📤 Mensaje enviado exitosamente por '{name}': {msg}")
-            
-            if self.on_status_update:
-                self.on_status_update("Mensaje enviado correctamente")
-        
-        # Estado del dispositivo
-        elif line.startswith("STATUS:"):
-            logger.info(f"ℹ️  Estado: {line}")
-            if self.on_status_update:
-                self.on_status_update(line)
-        
-        # RSSI
-        elif line.startswith("RSSI:"):
-            logger.debug(f"📊 {line}")
-            if self.on_status_update:
-                self.on_status_update(line)
-        
-        # Errores
-        elif line.startswith("ERROR:"):
-            # Identificar tipos de error específicos
-            if "CRC_INVALID" in line:
-                logger.error(f"❌ Error de CRC - Datos corruptos recibidos")
-            elif "TX_FAILED" in line:
-                logger.error(f"❌ Error de transmisión LoRa: {line}")
-            elif "RX_FAILED" in line:
-                logger.error(f"❌ Error de recepción LoRa: {line}")
-            else:
-                logger.error(f"❌ {line}")
-            
+        started = self.metrics.parse_started()
+        event = parse_line(line)
+        self.metrics.observe(event, started)
+        log_event(event)
+        
+        if type(event) is RxEvent:
+            if self.on_message_received:
+                rssi = "" if event.rssi is None else str(event.rssi)
+                self.on_message_received(event.sender, event.text, rssi)
+        elif type(event) is ErrorEvent:
             if self.on_error:
-                self.on_error(line)
-        
-        # Ready
-        elif line == "READY":
-            logger.info(f"✅ Dispositivo LoRa inicializado y listo")
-            if self.on_status_update:
-                self.on_status_update("Dispositivo listo")
-        
-        # PONG response
-        elif line.startswith("PONG:"):
-            logger.debug(f"🏓 Respuesta PING recibida: {line}")
-            if self.on_status_update:
-                self.on_status_update(line)
-        
-        # Debug messages
-        elif line.startswith("DEBUG:"):
-            if "IGNORING_OWN_MESSAGE" in line:
-                logger.debug(f"🔇 Mensaje propio ignorado (evitando eco)")
-            elif "INVALID_MAGIC_BYTES" in line:
-                logger.debug(f"🛡️ Ruido filtrado - Magic bytes inválidos (probablemente LoRaWAN u otro protocolo)")
-            elif "PACKET_TOO_SHORT" in line:
-                logger.debug(f"🛡️ Paquete demasiado corto ignorado")
-            else:
-                logger.debug(f"🐛 {line}")
-            if self.on_status_update:
-                self.on_status_update(line)
+                self.on_error(event.raw)
+        elif self.on_status_update:
+            self.on_status_update(status_text(event))
         
-        # Otros mensajes informativos
-        else:
-            logger.debug(f"▪️  {line}")
-            if self.on_status_update:
-                self.on_status_update(line)
+        if self.on_event:
+            self.on_event(event)
+
+
+# ===================== LOG DE EVENTOS =====================
+
+# Mensajes de log por código de ERROR y categoría de DEBUG. Se registran
+# con formato % diferido: el texto se arma en el thread de log, solo si el
+# nivel está habilitado
+_ERROR_MESSAGES = {
+    "CRC_INVALID": "❌ Error de CRC - Datos corruptos recibidos",
+    "TX_FAILED": "❌ Error de transmisión LoRa: %(raw)s",
+    "RX_FAILED": "❌ Error de recepción LoRa: %(raw)s",
+}
+_DEBUG_MESSAGES = {
+    "IGNORING_OWN_MESSAGE": "🔇 Mensaje propio ignorado (evitando eco)",
+    "INVALID_MAGIC_BYTES": "🛡️ Ruido filtrado - Magic bytes inválidos (probablemente LoRaWAN u otro protocolo)",
+    "PACKET_TOO_SHORT": "🛡️ Paquete demasiado corto ignorado",
+}
+
+
+def _log_rx(event: RxEvent):
+    logger.info("📥 Mensaje recibido de '%s': %s (RSSI: %s dBm)", event.sender, event.text, event.rssi)
+
+
+def _log_sent(event: SentEvent):
+    logger.info("📤 Mensaje enviado exitosamente por '%s': %s", event.sender, event.text)
+
+
+def _log_status(event: StatusEvent):
+    logger.info("ℹ️  Estado: %s", event.raw)
+
+
+def _log_rssi(event: RssiEvent):
+    logger.debug("📊 %s", event.raw)
+
+
+def _log_error(event: ErrorEvent):
+    logger.error(_ERROR_MESSAGES.get(event.code, "❌ %(raw)s"), {"raw": event.raw})
+
+
+def _log_ready(event: ReadyEvent):
+    logger.info("✅ Dispositivo LoRa inicializado y listo")
+
+
+def _log_pong(event: PongEvent):
+    logger.debug("🏓 Respuesta PING recibida: %s", event.raw)
+
+
+def _log_debug(event: DebugEvent):
+    logger.debug(_DEBUG_MESSAGES.get(event.category, "🐛 %(raw)s"), {"raw": event.raw})
+
+
+def _log_info(event: LoRaEvent):
+    logger.debug("▪️  %s", event.raw)
+
+
+_EVENT_LOGGERS = {
+    RxEvent: _log_rx,
+    SentEvent: _log_sent,
+    StatusEvent: _log_status,
+    RssiEvent: _log_rssi,
+    ErrorEvent: _log_error,
+    ReadyEvent: _log_ready,
+    PongEvent: _log_pong,
+    DebugEvent: _log_debug,
+    ConfigEvent: _log_info,
+    InfoEvent: _log_info,
+}
+
+
+def log_event(event: LoRaEvent):
+    """Registra en el log un evento recibido del ESP32"""
+    _EVENT_LOGGERS[type(event)](event)
+
+
+def status_text(event: LoRaEvent) -> str:
+    """
+    Texto que se reporta como actualización de estado para un evento
+    que no es un mensaje RX ni un error
+    """
+    if type(event) is SentEvent:
+        return "Mensaje enviado correctamente"
+    if type(event) is ReadyEvent:
+        return "Dispositivo listo"
+    return event.raw
 
 
 # Ejemplo de uso
@@ -413,6 +1041,8 @@ if __name__ == "__main__":
     def on_error(error):
         print(f"[ERROR]: {error}")
     
+    setup_logging(raw_trace=True)
+    
     # Listar puertos disponibles
     ports = LoRaSerialCommunicator.list_available_ports()
     print("Puertos disponibles:", ports)
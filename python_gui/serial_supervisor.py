@@ -0,0 +1,487 @@
+"""
+Supervisión del enlace serial con el ESP32
+Vigila la aparición y desaparición de puertos USB (hot-plug), envía PING
+cuando el dispositivo lleva un rato en silencio para detectar un firmware
+colgado, y reconecta con espera exponencial. La cola de transmisión del
+comunicador se conserva entre reconexiones: lo encolado sale al volver.
+
+Reabrir el puerto también sirve para un firmware colgado: en las placas
+ESP32 con auto-reset, DTR/RTS al abrir reinician el microcontrolador.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import serial.tools.list_ports
+
+from lora_protocol import LoRaEvent
+from serial_comm import PortIdentity, DetectionCache, DETECTION_CACHE
+
+logger = logging.getLogger(__name__)
+
+WATCH_INTERVAL = 1.0      # Segundos entre revisiones de puertos y del enlace
+HEARTBEAT_IDLE = 5.0      # Silencio del dispositivo antes de enviar PING
+HEARTBEAT_TIMEOUT = 2.0   # Espera de cada PONG (cubre una trama en aire)
+HEARTBEAT_MISSES = 2      # PING sin respuesta antes de dar el enlace por perdido
+BACKOFF_INITIAL = 0.5     # Primera espera entre intentos de reconexión
+BACKOFF_MAX = 30.0        # Espera máxima entre intentos
+
+# Estados del enlace supervisado
+STATE_CONNECTED = "connected"
+STATE_RECONNECTING = "reconnecting"
+STATE_STOPPED = "stopped"
+
+
+def _port_name(port: str) -> str:
+    return port.split(' - ')[0] if ' - ' in port else port
+
+
+class Backoff:
+    """Espera exponencial entre intentos: initial, initial*factor, ... hasta maximum"""
+
+    def __init__(self, initial: float = BACKOFF_INITIAL, maximum: float = BACKOFF_MAX,
+                 factor: float = 2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.attempts = 0
+
+    def next(self) -> float:
+        """Espera antes del próximo intento (y cuenta el intento)"""
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay
+
+    def reset(self):
+        self.attempts = 0
+
+
+class Heartbeat:
+    """
+    Latido según el silencio del puerto: cualquier dato recibido (incluido
+    el PONG) cuenta como señal de vida
+
+    Tras `idle` segundos sin datos envía PING cada `timeout` segundos; si
+    pasan `misses` PING sin que llegue nada, el firmware se da por colgado.
+    """
+
+    OK = "ok"
+    PING = "ping"
+    STALLED = "stalled"
+
+    def __init__(self, idle: float = HEARTBEAT_IDLE, timeout: float = HEARTBEAT_TIMEOUT,
+                 misses: int = HEARTBEAT_MISSES):
+        self.idle = idle
+        self.timeout = timeout
+        self.misses = misses
+        self._last_ping = 0.0
+
+    def check(self, last_rx: float, now: float) -> str:
+        """
+        Args:
+            last_rx: Última recepción de datos (time.monotonic)
+            now: Instante actual (time.monotonic)
+
+        Returns:
+            OK, PING (enviar uno ahora) o STALLED
+        """
+        silent = now - last_rx
+        if silent < self.idle:
+            return self.OK
+        if silent >= self.idle + self.timeout * self.misses:
+            return self.STALLED
+        # Primer PING de este silencio, o el anterior ya venció
+        if self._last_ping <= last_rx or now - self._last_ping >= self.timeout:
+            self._last_ping = now
+            return self.PING
+        return self.OK
+
+
+class PortWatcher:
+    """
+    Puertos presentes según serial.tools.list_ports
+
+    Sigue a un dispositivo USB por VID/PID/número de serie aunque al
+    reenchufarlo cambie de nombre (ej: /dev/ttyUSB0 → /dev/ttyUSB1).
+    """
+
+    def __init__(self, cache: Optional[DetectionCache] = DETECTION_CACHE):
+        """
+        Args:
+            cache: Caché de detección a invalidar para los puertos que desaparecen
+        """
+        self.cache = cache
+        self.ports: Dict[str, PortIdentity] = {}
+
+    def poll(self) -> Tuple[List[PortIdentity], List[PortIdentity]]:
+        """
+        Vuelve a listar los puertos (bloqueante)
+
+        Returns:
+            (aparecidos, desaparecidos) desde la revisión anterior; un puerto
+            que cambió de identidad figura en ambos
+        """
+        current = {identity.device: identity for identity in
+                   map(PortIdentity.from_port_info, serial.tools.list_ports.comports())}
+        appeared = [identity for device, identity in current.items()
+                    if self.ports.get(device) != identity]
+        removed = [identity for device, identity in self.ports.items()
+                   if current.get(device) != identity]
+        self.ports = current
+
+        if self.cache:
+            for identity in removed:
+                self.cache.invalidate(identity.device)
+        return appeared, removed
+
+    def find(self, identity: PortIdentity) -> Optional[str]:
+        """
+        Puerto actual de un dispositivo: el del mismo número de serie USB o,
+        si no tiene, el del mismo nombre
+
+        Returns:
+            Nombre del puerto, o None si no está presente
+        """
+        if identity.serial_number:
+            key = (identity.vid, identity.pid, identity.serial_number)
+            for port in self.ports.values():
+                if (port.vid, port.pid, port.serial_number) == key:
+                    return port.device
+            return None
+        return identity.device if identity.device in self.ports else None
+
+
+class _Supervisor:
+    """Estado y decisiones comunes a las versiones con thread y asyncio"""
+
+    def __init__(self, communicator, port: str, watch_interval: float,
+                 heartbeat: Optional[Heartbeat], backoff: Optional[Backoff],
+                 watcher: Optional[PortWatcher],
+                 on_state_change: Optional[Callable[[str, str], None]]):
+        self.communicator = communicator
+        self.port = _port_name(port)
+        self.watch_interval = watch_interval
+        self.heartbeat = heartbeat or Heartbeat()
+        self.backoff = backoff or Backoff()
+        self.watcher = watcher or PortWatcher()
+        # Recibe (estado, detalle) en cada cambio del enlace
+        self.on_state_change = on_state_change
+
+        self.state = STATE_CONNECTED if communicator.is_connected else STATE_RECONNECTING
+        self.reconnects = 0
+        # Identidad USB del puerto; None si no figura en list_ports (ej: pty)
+        self.identity: Optional[PortIdentity] = None
+        self._connected_at = time.monotonic()
+        self._confirmed = communicator.is_connected
+        self._reappeared = False  # El dispositivo apareció en la última revisión
+        self._polled = False      # La primera revisión solo toma el inventario
+
+    def _set_state(self, state: str, detail: str = ""):
+        if state == self.state and not detail:
+            return
+        self.state = state
+        if self.on_state_change:
+            try:
+                self.on_state_change(state, detail)
+            except Exception as e:
+                logger.error(f"❌ Error en on_state_change: {e}")
+
+    def _track_ports(self, appeared: List[PortIdentity],
+                     removed: List[PortIdentity]) -> Optional[str]:
+        """Registra los cambios de puertos; devuelve un motivo si el nuestro desapareció"""
+        if self._polled:
+            for identity in removed:
+                logger.info(f"🔌 Puerto desconectado: {identity.device}")
+            for identity in appeared:
+                logger.info(f"🔌 Puerto conectado: {identity.device}")
+        self._polled = True
+
+        self._reappeared = any(map(self._matches, appeared))
+        if self.identity is None:
+            self.identity = self.watcher.ports.get(self.port)
+        elif self.state == STATE_CONNECTED and self.identity in removed:
+            return f"puerto {self.port} desconectado"
+        return None
+
+    def _matches(self, identity: PortIdentity) -> bool:
+        """Si el puerto corresponde a nuestro dispositivo"""
+        if self.identity is not None and self.identity.serial_number:
+            return ((identity.vid, identity.pid, identity.serial_number) ==
+                    (self.identity.vid, self.identity.pid, self.identity.serial_number))
+        return identity.device == self.port
+
+    def _check_link(self, now: float) -> str:
+        """Heartbeat.OK / PING / STALLED para el enlace actual"""
+        last_rx = self.communicator.last_rx
+        if not self._confirmed and last_rx > self._connected_at:
+            # Llegaron datos tras reconectar: el enlace funciona
+            self._confirmed = True
+            self.backoff.reset()
+        return self.heartbeat.check(last_rx, now)
+
+    def _target(self) -> Optional[str]:
+        """Puerto donde reconectar, o None mientras el dispositivo no esté presente"""
+        if self.identity is None:
+            # Sin identidad USB no se puede saber si está: probar siempre por nombre
+            return self.port
+        return self.watcher.find(self.identity)
+
+    def _connected(self, port: str):
+        if port != self.port:
+            logger.info(f"🔀 Dispositivo ahora en {port} (antes {self.port})")
+            self.port = port
+        self.identity = self.watcher.ports.get(port, self.identity)
+        self.reconnects += 1
+        self._connected_at = time.monotonic()
+        self._confirmed = False
+        logger.info(f"✅ Reconectado a {port} (reconexión #{self.reconnects})")
+        self._set_state(STATE_CONNECTED, f"reconectado a {port}")
+
+    def _lost(self, reason: str):
+        logger.warning(f"⚠️  Enlace con {self.port} perdido: {reason}")
+        self._set_state(STATE_RECONNECTING, reason)
+
+    def _retry_delay(self) -> float:
+        delay = self.backoff.next()
+        logger.info(f"🔄 Reintentando {self.port} en {delay:.1f} s "
+                    f"(intento {self.backoff.attempts})")
+        return delay
+
+
+class SerialSupervisor(_Supervisor):
+    """
+    Mantiene conectado un LoRaSerialCommunicator desde un thread propio
+
+        comm = LoRaSerialCommunicator()
+        comm.connect("/dev/ttyUSB0")
+        supervisor = SerialSupervisor(comm, "/dev/ttyUSB0")
+        supervisor.start()
+        ...
+        supervisor.stop()   # También desconecta
+
+    on_state_change se llama desde el thread del supervisor.
+    """
+
+    def __init__(self, communicator, port: str, watch_interval: float = WATCH_INTERVAL,
+                 heartbeat: Optional[Heartbeat] = None, backoff: Optional[Backoff] = None,
+                 watcher: Optional[PortWatcher] = None,
+                 on_state_change: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            communicator: LoRaSerialCommunicator (conectado o no)
+            port: Puerto del dispositivo
+            watch_interval: Segundos entre revisiones (no mayor que heartbeat.timeout)
+            heartbeat: Política de PING (default: Heartbeat())
+            backoff: Espera entre intentos (default: Backoff())
+            watcher: Vigilancia de puertos (default: PortWatcher())
+            on_state_change: Callback (estado, detalle) al cambiar el enlace
+        """
+        super().__init__(communicator, port, watch_interval, heartbeat, backoff,
+                         watcher, on_state_change)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia el thread de supervisión"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene la supervisión y desconecta (la cola de TX se conserva)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.communicator.disconnect()
+        self._set_state(STATE_STOPPED)
+
+    def _link_up(self) -> bool:
+        comm = self.communicator
+        return comm.is_connected and comm.read_thread is not None and comm.read_thread.is_alive()
+
+    def _poll(self) -> Optional[str]:
+        try:
+            return self._track_ports(*self.watcher.poll())
+        except Exception as e:
+            logger.error(f"❌ Error al listar puertos: {e}")
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            gone = self._poll()
+
+            if self.state == STATE_CONNECTED:
+                reason = gone
+                if reason is None and not self._link_up():
+                    reason = "error de lectura"
+                if reason is None:
+                    action = self._check_link(time.monotonic())
+                    if action == Heartbeat.PING:
+                        self.communicator.request_ping()
+                    elif action == Heartbeat.STALLED:
+                        reason = "el firmware no responde al PING"
+                if reason is None:
+                    self._stop.wait(self.watch_interval)
+                    continue
+                self._lost(reason)
+                self.communicator.disconnect()
+                if not self._confirmed:
+                    # El enlace nunca respondió tras reconectar: cuenta como intento fallido
+                    self._wait_for_port(self._retry_delay())
+                    continue
+
+            port = self._target()
+            if port is None:
+                # Esperar a que el dispositivo vuelva a aparecer
+                self._stop.wait(self.watch_interval)
+                continue
+            if self.communicator.connect(port):
+                self._connected(port)
+                continue
+            self._wait_for_port(self._retry_delay())
+
+    def _wait_for_port(self, delay: float):
+        """Espera `delay` segundos, o menos si el dispositivo reaparece"""
+        deadline = time.monotonic() + delay
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop.wait(min(self.watch_interval, remaining))
+            self._poll()
+            if self._reappeared:
+                return
+
+
+class AsyncSerialSupervisor(_Supervisor):
+    """
+    Versión asyncio para AsyncLoRaSerialCommunicator
+
+    run() entrega los eventos del comunicador a través de las reconexiones
+    (la iteración del comunicador termina con cada pérdida del enlace):
+
+        supervisor = AsyncSerialSupervisor(comm, "/dev/ttyUSB0")
+        task = asyncio.create_task(supervisor.run(handle_event))
+        ...
+        await supervisor.stop()   # También desconecta
+        await task
+    """
+
+    def __init__(self, communicator, port: str, watch_interval: float = WATCH_INTERVAL,
+                 heartbeat: Optional[Heartbeat] = None, backoff: Optional[Backoff] = None,
+                 watcher: Optional[PortWatcher] = None,
+                 on_state_change: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            communicator: AsyncLoRaSerialCommunicator (conectado o no)
+            port: Puerto del dispositivo
+            watch_interval: Segundos entre revisiones (no mayor que heartbeat.timeout)
+            heartbeat: Política de PING (default: Heartbeat())
+            backoff: Espera entre intentos (default: Backoff())
+            watcher: Vigilancia de puertos (default: PortWatcher())
+            on_state_change: Callback (estado, detalle) al cambiar el enlace (no debe bloquear)
+        """
+        super().__init__(communicator, port, watch_interval, heartbeat, backoff,
+                         watcher, on_state_change)
+        self._stopping = asyncio.Event()
+        self._reason: Optional[str] = None  # Por qué _watch() abortó el enlace
+
+    async def stop(self):
+        """Detiene la supervisión y desconecta (la cola de TX se conserva)"""
+        self._stopping.set()
+        await self.communicator.disconnect()
+        self._set_state(STATE_STOPPED)
+
+    async def run(self, handle: Callable[[LoRaEvent], Awaitable[None]]):
+        """
+        Entrega cada evento a handle() hasta stop(), reconectando cuando el
+        enlace se pierde
+
+        Args:
+            handle: Corrutina que procesa un evento
+        """
+        while not self._stopping.is_set():
+            if self.communicator.is_connected:
+                watch = asyncio.create_task(self._watch())
+                try:
+                    async for event in self.communicator:
+                        await handle(event)
+                finally:
+                    watch.cancel()
+                    await asyncio.gather(watch, return_exceptions=True)
+                if not self._stopping.is_set():
+                    self._lost(self._reason or "error de lectura")
+                    if not self._confirmed:
+                        # El enlace nunca respondió tras reconectar: cuenta como intento fallido
+                        await self._wait_for_port(self._retry_delay())
+            else:
+                await self._reconnect()
+
+    async def _poll(self) -> Optional[str]:
+        try:
+            changes = await asyncio.get_running_loop().run_in_executor(None, self.watcher.poll)
+        except Exception as e:
+            logger.error(f"❌ Error al listar puertos: {e}")
+            return None
+        return self._track_ports(*changes)
+
+    async def _sleep(self, delay: float) -> bool:
+        """Espera `delay` segundos; True si stop() la interrumpió"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _watch(self):
+        """Revisa puertos y latido mientras el enlace está arriba; lo aborta si falla"""
+        self._reason = None
+        while not await self._sleep(self.watch_interval):
+            reason = await self._poll()
+            if reason is None:
+                action = self._check_link(time.monotonic())
+                if action == Heartbeat.PING:
+                    await self.communicator.send("PING")
+                    continue
+                if action != Heartbeat.STALLED:
+                    continue
+                reason = "el firmware no responde al PING"
+            # La iteración de run() termina con el ERROR:SERIAL_LOST del comunicador
+            self._reason = reason
+            self.communicator.abort(reason)
+            return
+
+    async def _reconnect(self):
+        """Un intento de reconexión (o la espera hasta el próximo)"""
+        await self._poll()
+        port = self._target()
+        if port is None:
+            # Esperar a que el dispositivo vuelva a aparecer
+            await self._sleep(self.watch_interval)
+            return
+
+        if await self.communicator.connect(port):
+            if self._stopping.is_set():
+                # stop() llegó durante el saludo
+                await self.communicator.disconnect()
+                return
+            self._connected(port)
+            return
+
+        await self._wait_for_port(self._retry_delay())
+
+    async def _wait_for_port(self, delay: float):
+        """Espera `delay` segundos, o menos si el dispositivo reaparece"""
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or await self._sleep(min(self.watch_interval, remaining)):
+                return
+            await self._poll()
+            if self._reappeared:
+                return
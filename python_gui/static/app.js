@@ -6,6 +6,11 @@ const WS_URL = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${win
 let ws = null;
 let userName = '';
 let isConnected = false;
+let lastSeq = 0;            // ID del último mensaje mostrado
+let historyLoaded = false;  // Ya se cargaron los últimos mensajes del historial
+let lastEventSeq = null;    // "seq" del último evento WebSocket recibido
+let serverEpoch = null;     // Identifica el arranque del servidor (para reanudar)
+let keepAliveTimer = null;
 
 // ===================== INICIALIZACIÓN =====================
 
@@ -30,15 +35,21 @@ document.addEventListener('DOMContentLoaded', () => {
 // ===================== WEBSOCKET =====================
 
 function connectWebSocket() {
-    ws = new WebSocket(WS_URL);
+    // Al reconectarse, pedir al servidor los eventos perdidos desde el último recibido
+    const resume = lastEventSeq !== null ? `?last_seq=${lastEventSeq}&epoch=${serverEpoch}` : '';
+    ws = new WebSocket(WS_URL + resume);
     
     ws.onopen = () => {
         console.log('✅ WebSocket conectado');
-        setInterval(() => ws.send('ping'), 30000); // Keep-alive cada 30s
+        clearInterval(keepAliveTimer);
+        keepAliveTimer = setInterval(() => ws.send('ping'), 30000); // Keep-alive cada 30s
     };
     
     ws.onmessage = (event) => {
+        if (event.data === 'pong') return;
         const data = JSON.parse(event.data);
+        if (data.epoch) serverEpoch = data.epoch;
+        if (data.seq !== undefined) lastEventSeq = data.seq;
         handleWebSocketMessage(data);
     };
     
@@ -68,6 +79,15 @@ function handleWebSocketMessage(data) {
         case 'error':
             showAlert(data.data, 'error');
             break;
+        case 'detect_progress': {
+            const p = data.data;
+            showAlert(`🔍 Detectando... ${p.completed}/${p.total} ${p.is_lora ? '✅' : '➖'} ${p.port}`, 'info');
+            break;
+        }
+        case 'resync':
+            // Se perdieron más eventos de los que el servidor guarda: traer lo nuevo por REST
+            if (historyLoaded) loadMessages();
+            break;
     }
 }
 
@@ -103,8 +123,16 @@ async function autoDetectPorts() {
     try {
         showAlert('🔍 Detectando dispositivos LoRa P2P...', 'info');
         
-        const response = await fetch(`${API_URL}/api/ports/detect`);
-        const data = await response.json();
+        // La detección corre en segundo plano: el progreso llega por WebSocket
+        // y aquí solo se espera el resultado
+        let response = await fetch(`${API_URL}/api/ports/detect`, { method: 'POST' });
+        let data = await response.json();
+        while (data.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            response = await fetch(`${API_URL}/api/ports/detect/${data.job_id}`);
+            data = await response.json();
+        }
+        if (data.status === 'error') throw new Error(data.error);
         
         const portSelect = document.getElementById('portSelect');
         portSelect.innerHTML = '';
@@ -242,17 +270,30 @@ async function sendMessage() {
 
 async function loadMessages() {
     try {
-        const response = await fetch(`${API_URL}/api/messages`);
-        const data = await response.json();
-        
-        data.messages.forEach(msg => {
-            addMessageToUI({
-                sender: msg.sender,
-                content: msg.content,
-                timestamp: msg.timestamp,
-                is_own: msg.is_own
-            }, false);
-        });
+        // La primera vez los últimos mensajes; después solo los nuevos (por ID)
+        let hasMore = true;
+        while (hasMore) {
+            const query = historyLoaded ? `after=${lastSeq}&limit=500` : 'limit=100';
+            const response = await fetch(`${API_URL}/api/messages?${query}`);
+            if (response.status === 304) break;
+            const data = await response.json();
+            
+            // El servidor se reinició sin historial persistente: los IDs volvieron a empezar
+            if (data.last_seq < lastSeq) lastSeq = data.last_seq;
+            
+            data.messages.forEach(msg => {
+                addMessageToUI({
+                    id: msg.id,
+                    sender: msg.sender,
+                    content: msg.content,
+                    timestamp: msg.timestamp,
+                    is_own: msg.is_own
+                }, false);
+            });
+            
+            hasMore = historyLoaded && data.has_more;
+            historyLoaded = true;
+        }
         
         scrollToBottom();
     } catch (error) {
@@ -274,6 +315,12 @@ async function getStatus() {
 // ===================== UI FUNCTIONS =====================
 
 function addMessageToUI(data, scroll = true) {
+    // Evitar duplicados entre el historial y el WebSocket
+    if (data.id) {
+        if (data.id <= lastSeq) return;
+        lastSeq = data.id;
+    }
+    
     const messagesArea = document.getElementById('messagesArea');
     const messageDiv = document.createElement('div');
     
@@ -0,0 +1,134 @@
+"""
+Agrupación y limitación de eventos de estado/diagnóstico
+Entre los eventos seriales y la difusión WebSocket: las líneas DEBUG se
+cuentan por categoría y se resumen periódicamente, y los estados periódicos
+(RSSI) se limitan a uno por intervalo con el último valor. Los mensajes de
+chat y los errores no pasan por aquí
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+from lora_protocol import LoRaEvent, DebugEvent, RssiEvent
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INTERVAL = 5.0   # Segundos entre resúmenes de DEBUG
+STATUS_INTERVAL = 1.0    # Mínimo entre estados repetitivos del mismo tipo
+
+# Estados periódicos de los que solo interesa el último valor. InfoEvent
+# (banner de arranque, FATAL, líneas mal formadas) no: cada línea cuenta
+COALESCED_EVENTS = (RssiEvent,)
+
+
+class StatusCoalescer:
+    """
+    Agrupa eventos de estado por dispositivo antes de difundirlos
+
+    Los eventos que no son DEBUG ni de COALESCED_EVENTS (envío confirmado,
+    dispositivo listo, ID, banner, FATAL, etc.) se publican de inmediato.
+    """
+
+    def __init__(self, publish: Callable[[dict], None],
+                 summary_interval: float = SUMMARY_INTERVAL,
+                 status_interval: float = STATUS_INTERVAL):
+        """
+        Args:
+            publish: Función que difunde un evento (no debe bloquear)
+            summary_interval: Segundos entre resúmenes de DEBUG (0 = no resumir)
+            status_interval: Mínimo entre estados repetitivos del mismo tipo
+        """
+        self.publish = publish
+        self.summary_interval = summary_interval
+        self.status_interval = status_interval
+
+        self.debug_totals: Counter = Counter()   # Por categoría desde el arranque
+        self.suppressed = 0                      # Estados que no se difundieron
+        self._debug_counts: Dict[str, Counter] = {}
+        self._pending: Dict[Tuple[str, type], dict] = {}
+        self._last_sent: Dict[Tuple[str, type], float] = {}
+        self._last_summary = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Inicia la tarea que vacía los pendientes (requiere event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene la tarea y publica lo que quedó pendiente"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush(force_summary=True)
+
+    def submit(self, device: str, event: LoRaEvent, message: dict):
+        """
+        Difunde un evento de estado, o lo agrupa si es repetitivo
+
+        Args:
+            device: Clave del dispositivo que lo generó
+            event: Evento parseado
+            message: Mensaje WebSocket ya armado para el evento
+        """
+        kind = type(event)
+        if kind is DebugEvent:
+            self.debug_totals[event.category] += 1
+            if self.summary_interval > 0:
+                self._debug_counts.setdefault(device, Counter())[event.category] += 1
+            return
+
+        if kind not in COALESCED_EVENTS:
+            self.publish(message)
+            return
+
+        key = (device, kind)
+        now = time.monotonic()
+        if now - self._last_sent.get(key, 0.0) >= self.status_interval:
+            self._last_sent[key] = now
+            self.publish(message)
+        else:
+            # Reemplaza al anterior pendiente: solo se envía el último valor
+            if key in self._pending:
+                self.suppressed += 1
+            self._pending[key] = message
+
+    def flush(self, force_summary: bool = False):
+        """Publica los estados pendientes y, si corresponde, el resumen de DEBUG"""
+        now = time.monotonic()
+        for key in [key for key in self._pending
+                    if now - self._last_sent.get(key, 0.0) >= self.status_interval]:
+            self._last_sent[key] = now
+            self.publish(self._pending.pop(key))
+
+        elapsed = now - self._last_summary
+        if self._debug_counts and (force_summary or elapsed >= self.summary_interval):
+            for device, counts in self._debug_counts.items():
+                self.publish(self._summary(device, counts, elapsed))
+            self._debug_counts = {}
+        if force_summary or elapsed >= self.summary_interval:
+            self._last_summary = now
+
+    @staticmethod
+    def _summary(device: str, counts: Counter, elapsed: float) -> dict:
+        detail = ", ".join(f"{category} ×{count}" for category, count in counts.most_common())
+        return {
+            "type": "status",
+            "device": device,
+            "data": f"DEBUG ×{sum(counts.values())} en {elapsed:.0f} s: {detail}",
+            "summary": {"interval": round(elapsed, 1), "counts": dict(counts)}
+        }
+
+    async def _run(self):
+        period = min((interval for interval in (self.status_interval, self.summary_interval)
+                      if interval > 0), default=1.0)
+        while True:
+            await asyncio.sleep(period)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Error publicando estados agrupados: {e}")
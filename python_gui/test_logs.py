@@ -3,13 +3,11 @@ Script de prueba para verificar que los logs funcionan correctamente
 """
 
 import logging
+from log_pipeline import setup_logging
 from serial_comm import LoRaSerialCommunicator
 
-# Configurar logging para ver todos los niveles
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configurar logging para ver todos los niveles (y cada línea serial cruda)
+setup_logging(logging.DEBUG, raw_trace=True)
 
 logger = logging.getLogger(__name__)
 
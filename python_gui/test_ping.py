@@ -3,6 +3,7 @@ Script de prueba para verificar la funcionalidad PING/PONG
 Detecta automáticamente puertos con dispositivos LoRa P2P
 """
 
+from log_pipeline import setup_logging
 from serial_comm import LoRaSerialCommunicator
 import sys
 
@@ -29,12 +30,12 @@ def main():
     print("🔍 Detectando dispositivos LoRa P2P (esto puede tardar unos segundos)...")
     print()
     
-    def progress_callback(port, current, total):
+    def progress_callback(port, current, total, is_lora):
         port_name = port.split(' - ')[0]
-        print(f"   [{current}/{total}] Probando {port_name}...", end='\r')
+        result = "✅ LoRa P2P" if is_lora else "—"
+        print(f"   [{current}/{total}] {port_name}: {result}")
     
     lora_ports = LoRaSerialCommunicator.detect_lora_ports(progress_callback)
-    print(" " * 80, end='\r')  # Limpiar línea
     
     # 3. Mostrar resultados
     print()
@@ -61,6 +62,7 @@ def main():
     print("=" * 60)
 
 if __name__ == "__main__":
+    setup_logging()
     try:
         main()
     except KeyboardInterrupt:
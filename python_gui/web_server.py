@@ -3,30 +3,45 @@ Backend Web para Sistema LoRa P2P Chat
 API REST con FastAPI y WebSockets para comunicación en tiempo real
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import asyncio
 import json
 from datetime import datetime
 import os
+import time
+import uuid
+import zlib
 import sys
-import threading
 import logging
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
 # Importar el comunicador serial existente
 sys.path.append(os.path.dirname(__file__))
-from serial_comm import LoRaSerialCommunicator
+from log_pipeline import setup_logging
+
+# Configurar logging: los registros se escriben desde un thread aparte.
+# LORA_LOG_LEVEL elige el nivel y LORA_RAW_TRACE=1 agrega cada línea serial cruda
+setup_logging(os.environ.get("LORA_LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
+from serial_comm import LoRaSerialCommunicator, TxQueueFullError, status_text, DETECTION_CACHE
+from async_serial_comm import AsyncLoRaSerialCommunicator
+from ws_fanout import WebSocketFanout, CLIENT_QUEUE_SIZE, SLOW_CLIENT_DROP, REPLAY_LOG_SIZE
+from status_coalescer import StatusCoalescer, SUMMARY_INTERVAL, STATUS_INTERVAL
+from history_store import MessageHistoryStore, StoredMessage
+from message_ring import MessageRing
+from serial_capture import CaptureWriter
+from metrics import REGISTRY, CONTENT_TYPE, TX_QUEUE_DEPTH, WS_CLIENTS
+from serial_supervisor import (
+    AsyncSerialSupervisor, Heartbeat, Backoff, STATE_CONNECTED, STATE_RECONNECTING
+)
+from lora_protocol import (
+    LoRaEvent, RxEvent, ErrorEvent, StatusEvent, RssiEvent, ConfigEvent, PongEvent
+)
 
 # ===================== CONFIGURACIÓN =====================
 
@@ -36,6 +51,36 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# Difusión WebSocket: eventos pendientes por cliente y qué hacer con los lentos
+# ("drop" desconecta al cliente, "skip" descarta sus eventos más antiguos)
+WS_CLIENT_QUEUE_SIZE = int(os.environ.get("LORA_WS_QUEUE_SIZE", CLIENT_QUEUE_SIZE))
+WS_SLOW_CLIENT_POLICY = os.environ.get("LORA_WS_SLOW_CLIENT_POLICY", SLOW_CLIENT_DROP)
+# Eventos recientes que se reenvían a un cliente que se reconecta con ?last_seq=
+WS_REPLAY_SIZE = int(os.environ.get("LORA_WS_REPLAY_SIZE", REPLAY_LOG_SIZE))
+
+# Eventos de estado: segundos entre resúmenes de DEBUG (0 = solo contar) y
+# mínimo entre estados periódicos (RSSI) por dispositivo
+DEBUG_SUMMARY_INTERVAL = float(os.environ.get("LORA_DEBUG_SUMMARY_INTERVAL", SUMMARY_INTERVAL))
+STATUS_MIN_INTERVAL = float(os.environ.get("LORA_STATUS_INTERVAL", STATUS_INTERVAL))
+
+# Historial persistente (SQLite): archivo ("" lo desactiva) y días de retención (0 = siempre)
+HISTORY_DB = os.environ.get("LORA_HISTORY_DB",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                         "data", "lora_chat_history.db"))
+HISTORY_RETENTION_DAYS = float(os.environ.get("LORA_HISTORY_RETENTION_DAYS", 30))
+# Mensajes recientes que se mantienen en memoria (buffer circular, hasta 100000)
+HISTORY_MEMORY_SIZE = int(os.environ.get("LORA_HISTORY_MEMORY_SIZE", 1000))
+MESSAGES_PAGE_LIMIT = 1000  # Máximo de mensajes por página en /api/messages
+
+# Supervisión del enlace serial: silencio antes de enviar PING y espera
+# máxima entre intentos de reconexión (segundos)
+SERIAL_HEARTBEAT_IDLE = float(os.environ.get("LORA_HEARTBEAT_IDLE", 5.0))
+SERIAL_RECONNECT_MAX_DELAY = float(os.environ.get("LORA_RECONNECT_MAX_DELAY", 30.0))
+
+# Directorio donde grabar el tráfico serial de cada dispositivo ("" = no grabar);
+# las capturas se reproducen con serial_capture.replay
+SERIAL_CAPTURE_DIR = os.environ.get("LORA_CAPTURE_DIR", "")
+
 # CORS para permitir acceso desde navegador
 app.add_middleware(
     CORSMiddleware,
@@ -51,10 +96,15 @@ class UserConfig(BaseModel):
     name: str
     port: str
 
+class DeviceSelection(BaseModel):
+    device: Optional[str] = None
+
 class Message(BaseModel):
     sender: str
     content: str
     timestamp: Optional[str] = None
+    device: Optional[str] = None
+    id: Optional[int] = None
 
 class ConnectionStatus(BaseModel):
     connected: bool
@@ -66,95 +116,475 @@ class SystemStatus(BaseModel):
     messages_count: int = 0
     uptime: str = "0s"
 
+# ===================== GESTIÓN DE DISPOSITIVOS =====================
+
+class Device:
+    """Un stick LoRa conectado al servidor"""
+    
+    def __init__(self, key: str, port: str, user_name: str):
+        self.key = key
+        self.port = port
+        self.user_name = user_name
+        self.communicator = AsyncLoRaSerialCommunicator()
+        # Reconecta si se pierde el puerto o el firmware deja de responder
+        self.supervisor = AsyncSerialSupervisor(
+            self.communicator, port,
+            heartbeat=Heartbeat(idle=SERIAL_HEARTBEAT_IDLE),
+            backoff=Backoff(maximum=SERIAL_RECONNECT_MAX_DELAY))
+        self.reader_task: Optional[asyncio.Task] = None
+        self.device_id: Optional[str] = None
+        self.rssi: Optional[float] = None
+        self.connected_at = datetime.now()
+    
+    @property
+    def is_connected(self) -> bool:
+        return self.communicator.is_connected
+    
+    def status(self) -> dict:
+        """Estado del dispositivo para /api/status"""
+        uptime = datetime.now() - self.connected_at
+        scheduler = self.communicator.tx_scheduler
+        return {
+            "device": self.key,
+            "port": self.port,
+            "device_id": self.device_id,
+            "user_name": self.user_name,
+            "connected": self.is_connected,
+            "link": self.supervisor.state,
+            "reconnects": self.supervisor.reconnects,
+            "rssi": self.rssi,
+            "uptime": str(uptime).split('.')[0],
+            "tx_queue": scheduler.pending,
+            "tx": scheduler.pacer.stats()
+        }
+
+
+class DeviceManager:
+    """
+    Gestiona varios sticks LoRa en un mismo proceso, indexados por nombre
+    de puerto. Cada dispositivo tiene su comunicador y su tarea consumidora
+    de eventos en el event loop del servidor, que reconecta el dispositivo
+    si se pierde el enlace (ver serial_supervisor).
+    """
+    
+    def __init__(self):
+        self.devices: Dict[str, Device] = {}
+        self.default_key: Optional[str] = None
+        # Usuario de cada puerto; se conserva al desconectar para seguir
+        # reconociendo sus mensajes en el historial
+        self.user_names: Dict[str, str] = {}
+        self.names_tag = 0  # CRC de user_names (para los ETag)
+    
+    @staticmethod
+    def key_for_port(port: str) -> str:
+        """Clave del dispositivo: nombre del puerto sin descripción"""
+        return port.split(' - ')[0] if ' - ' in port else port
+    
+    @property
+    def any_connected(self) -> bool:
+        return any(device.is_connected for device in self.devices.values())
+    
+    @property
+    def default_user_name(self) -> str:
+        """Usuario del dispositivo por defecto ("" si no hay ninguno)"""
+        device = self.get()
+        return device.user_name if device else ""
+    
+    def is_own(self, sender: str, key: Optional[str]) -> bool:
+        """Si un mensaje lo envió el usuario del dispositivo que lo registró"""
+        return key is not None and self.user_names.get(key) == sender
+    
+    def get(self, key: Optional[str] = None) -> Optional[Device]:
+        """
+        Busca un dispositivo por puerto o por DEVICE_ID
+        
+        Args:
+            key: Puerto o DEVICE_ID; None para el dispositivo por defecto
+                 (el último conectado)
+        """
+        if key is None:
+            return self.devices.get(self.default_key) if self.default_key else None
+        
+        device = self.devices.get(self.key_for_port(key))
+        if device:
+            return device
+        for device in self.devices.values():
+            if device.device_id and device.device_id.upper() == key.upper():
+                return device
+        return None
+    
+    async def connect(self, port: str, user_name: str) -> Optional[Device]:
+        """
+        Conecta un dispositivo (reconecta si el puerto ya estaba en uso)
+        
+        Returns:
+            El dispositivo conectado, o None si falló la conexión
+        """
+        key = self.key_for_port(port)
+        await self.disconnect(key)
+        
+        device = Device(key, port, user_name)
+        if SERIAL_CAPTURE_DIR:
+            name = f"{os.path.basename(key)}-{datetime.now():%Y%m%d-%H%M%S}.lcap"
+            device.communicator.recorder = CaptureWriter(os.path.join(SERIAL_CAPTURE_DIR, name))
+            logger.info(f"⏺️  Grabando tráfico serial en {device.communicator.recorder.path}")
+        if not await device.communicator.connect(port):
+            if device.communicator.recorder:
+                device.communicator.recorder.close()
+            return None
+        
+        device.supervisor.on_state_change = \
+            lambda link, detail: on_link_state(device, link, detail)
+        device.reader_task = asyncio.create_task(consume_events(device))
+        self.devices[key] = device
+        self.default_key = key
+        self.user_names[key] = user_name
+        self.names_tag = zlib.crc32(repr(sorted(self.user_names.items())).encode())
+        return device
+    
+    async def disconnect(self, key: str):
+        """Desconecta un dispositivo y espera el fin de su consumidor"""
+        device = self.devices.pop(key, None)
+        if device is None:
+            return
+        
+        await device.supervisor.stop()
+        if device.reader_task:
+            await device.reader_task
+        if device.communicator.recorder:
+            device.communicator.recorder.close()
+        
+        if self.default_key == key:
+            self.default_key = next(iter(self.devices), None)
+    
+    async def disconnect_all(self):
+        """Desconecta todos los dispositivos"""
+        for key in list(self.devices):
+            await self.disconnect(key)
+
+# ===================== DETECCIÓN DE PUERTOS =====================
+
+DETECT_JOBS_KEPT = 10  # Trabajos terminados que se conservan para consultar
+
+class DetectionJob:
+    """
+    Detección de puertos LoRa en segundo plano
+    
+    El sondeo bloqueante corre en un executor; cada puerto terminado se
+    difunde por WebSocket como "detect_progress" y el resultado final como
+    "detect_done" (también disponible en /api/ports/detect/{job_id}).
+    """
+    
+    def __init__(self, refresh: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.refresh = refresh
+        self.status = "running"
+        self.completed = 0
+        self.total = 0
+        self.results: Dict[str, bool] = {}
+        self.lora_ports: List[str] = []
+        self.all_ports: List[str] = []
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        def progress(port: str, completed: int, total: int, is_lora: bool):
+            # Llamado desde los threads de sondeo: pasar al event loop
+            loop.call_soon_threadsafe(self._progress, port, completed, total, is_lora)
+        
+        logger.info(f"🔍 Detección {self.id}: iniciando...")
+        try:
+            if self.refresh:
+                DETECTION_CACHE.invalidate()
+            self.lora_ports = await loop.run_in_executor(
+                None, LoRaSerialCommunicator.detect_lora_ports, progress)
+            self.all_ports = await loop.run_in_executor(
+                None, LoRaSerialCommunicator.list_available_ports)
+            self.status = "done"
+            if self.lora_ports:
+                logger.info(f"✅ Dispositivos LoRa detectados: {', '.join(self.lora_ports)}")
+            else:
+                logger.warning("⚠️  No se detectaron dispositivos LoRa")
+        except Exception as e:
+            self.status = "error"
+            self.error = str(e)
+            logger.error(f"❌ Detección {self.id} fallida: {e}")
+        finally:
+            self.finished_at = datetime.now()
+            state.clients.publish({"type": "detect_done", "data": self.result()})
+    
+    def _progress(self, port: str, completed: int, total: int, is_lora: bool):
+        self.completed, self.total = completed, total
+        self.results[port] = is_lora
+        state.clients.publish({
+            "type": "detect_progress",
+            "data": {
+                "job_id": self.id,
+                "port": port,
+                "is_lora": is_lora,
+                "completed": completed,
+                "total": total
+            }
+        })
+    
+    def result(self) -> dict:
+        """Estado del trabajo para la API"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "completed": self.completed,
+            "total": self.total,
+            "results": self.results,
+            "lora_ports": self.lora_ports,
+            "all_ports": self.all_ports,
+            "detected": len(self.lora_ports) > 0,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None
+        }
+
+
+def start_detection(refresh: bool = False) -> DetectionJob:
+    """Inicia una detección, o devuelve la que ya está en curso"""
+    for job in state.detect_jobs.values():
+        if job.status == "running":
+            return job
+    
+    job = DetectionJob(refresh)
+    state.detect_jobs[job.id] = job
+    while len(state.detect_jobs) > DETECT_JOBS_KEPT:
+        state.detect_jobs.pop(next(iter(state.detect_jobs)))
+    job.start()
+    return job
+
 # ===================== GESTIÓN DE ESTADO =====================
 
 class ChatState:
     """Gestiona el estado global del chat"""
     
     def __init__(self):
-        self.communicator: Optional[LoRaSerialCommunicator] = None
-        self.active_connections: List[WebSocket] = []
-        self.messages: List[Message] = []
-        self.user_name: str = ""
-        self.is_connected: bool = False
-        self.current_port: Optional[str] = None
+        self.devices = DeviceManager()
+        self.clients = WebSocketFanout(WS_CLIENT_QUEUE_SIZE, WS_SLOW_CLIENT_POLICY,
+                                       replay_size=WS_REPLAY_SIZE)
+        self.status = StatusCoalescer(self.clients.publish, DEBUG_SUMMARY_INTERVAL,
+                                      STATUS_MIN_INTERVAL)
+        self.messages = MessageRing(HISTORY_MEMORY_SIZE)
+        self.detect_jobs: Dict[str, DetectionJob] = {}
+        self.history: Optional[MessageHistoryStore] = None
+        self.last_seq = 0  # ID del último mensaje (monótono, continúa el del historial)
+        self.instance = format(int(time.time()), 'x')  # Distingue reinicios en los ETag
         self.start_time = datetime.now()
         self.rssi: Optional[float] = None
-        self.loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def is_connected(self) -> bool:
+        return self.devices.any_connected
+    
+    async def open_history(self):
+        """Abre el historial persistente y carga los mensajes más recientes"""
+        if not HISTORY_DB:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            self.history = await loop.run_in_executor(
+                None, MessageHistoryStore, HISTORY_DB, HISTORY_RETENTION_DAYS)
+            stored = await loop.run_in_executor(None, self.history.recent, HISTORY_MEMORY_SIZE)
+            last_id = await loop.run_in_executor(None, self.history.last_id)
+        except Exception as e:
+            logger.error(f"❌ No se pudo abrir el historial {HISTORY_DB}: {e}")
+            self.history = None
+            return
+        
+        self.messages.clear()
+        for row in stored:
+            self.messages.append(self._from_stored(row))
+        self.last_seq = max(self.last_seq, last_id)
+        self.history.start()
+        logger.info(f"💾 Historial: {HISTORY_DB} ({len(stored)} mensaje(s) recientes cargados)")
+    
+    @staticmethod
+    def _from_stored(row: StoredMessage) -> Message:
+        return Message(id=row.id, sender=row.sender, content=row.content, device=row.device,
+                       timestamp=datetime.fromtimestamp(row.ts).strftime("%H:%M:%S"))
+    
+    async def page(self, after: Optional[int] = None, before: Optional[int] = None,
+                   limit: int = 100, sender: Optional[str] = None) -> List[Message]:
+        """
+        Página de mensajes por ID, del más viejo al más nuevo
+        
+        Sale de memoria si la cubre; lo anterior a la memoria se lee del
+        historial SQLite en un executor.
+        
+        Args:
+            after: Solo IDs mayores (los primeros `limit` a partir de ahí)
+            before: Solo IDs menores (los últimos `limit` antes de ahí)
+            limit: Máximo de mensajes
+            sender: Solo mensajes de este remitente
+        """
+        if sender is None:
+            recent = self.messages.page(after, before, limit)
+        else:
+            recent = self.messages.by_sender(sender, after, before, limit)
+        first_in_memory = self.messages.first_id or self.last_seq + 1
+        
+        if after is not None:
+            missing = after + 1 < first_in_memory
+        else:
+            missing = len(recent) < limit
+        if not missing or self.history is None:
+            return recent
+        
+        # Completar con lo que ya no está en memoria (IDs menores al primero en memoria)
+        upper = first_in_memory if before is None else min(before, first_in_memory)
+        count = limit if after is not None else limit - len(recent)
+        stored = await asyncio.get_running_loop().run_in_executor(
+            None, self.history.page, after, upper, count, sender)
+        older = [self._from_stored(row) for row in stored]
+        return (older + recent)[:limit]
+    
+    async def close_history(self):
+        """Escribe lo pendiente y cierra el historial"""
+        if self.history:
+            history, self.history = self.history, None
+            await asyncio.get_running_loop().run_in_executor(None, history.close)
     
     async def broadcast(self, message: dict):
-        """Envía un mensaje a todos los clientes WebSocket conectados"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Error broadcasting to client: {e}")
-    
-    def add_message(self, sender: str, content: str, rssi: Optional[str] = None):
-        """Agrega un mensaje al historial"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        msg = Message(sender=sender, content=content, timestamp=timestamp)
+        """
+        Envía un mensaje a todos los clientes WebSocket conectados
+        
+        Solo encola en la cola de cada cliente: no espera a ningún envío.
+        """
+        self.clients.publish(message)
+    
+    def add_message(self, sender: str, content: str, rssi: Optional[float] = None,
+                    device: Optional[str] = None):
+        """Agrega un mensaje al historial (en memoria y, si hay, en SQLite)"""
+        now = datetime.now()
+        self.last_seq += 1
+        msg = Message(id=self.last_seq, sender=sender, content=content,
+                      timestamp=now.strftime("%H:%M:%S"), device=device)
+        # Buffer circular: al llenarse desaloja el más viejo en O(1)
         self.messages.append(msg)
         
-        # Limitar historial a 100 mensajes
-        if len(self.messages) > 100:
-            self.messages.pop(0)
+        # Solo encola: el thread escritor lo guarda junto con otros
+        if self.history:
+            self.history.append(sender, content, rssi, device, now.timestamp(), msg.id)
         
         # Actualizar RSSI si se proporciona
-        if rssi:
-            try:
-                self.rssi = float(rssi)
-            except (ValueError, TypeError) as e:
-                logger.debug(f"No se pudo convertir RSSI a float: {rssi}")
-                pass
+        if rssi is not None:
+            self.rssi = rssi
         
         return msg
 
 state = ChatState()
 
-# ===================== CALLBACKS DEL COMUNICADOR =====================
+# Valores de /metrics que se leen del estado al consultar
+TX_QUEUE_DEPTH.set_function(lambda: {(device.key,): device.communicator.tx_scheduler.pending
+                                     for device in state.devices.devices.values()})
+WS_CLIENTS.set_function(lambda: len(state.clients))
 
-def on_message_received(sender: str, message: str, rssi: str):
-    """Callback cuando se recibe un mensaje LoRa"""
-    msg = state.add_message(sender, message, rssi)
+# ===================== EVENTOS DE LOS DISPOSITIVOS =====================
+
+async def on_message_received(device: Device, event: RxEvent):
+    """Mensaje LoRa recibido"""
+    if event.rssi is not None:
+        device.rssi = event.rssi
+    msg = state.add_message(event.sender, event.text, event.rssi, device.key)
     
     # Broadcast a todos los clientes web
-    if state.loop and state.loop.is_running():
-        asyncio.run_coroutine_threadsafe(
-            state.broadcast({
-                "type": "message",
-                "data": {
-                    "sender": sender,
-                    "content": message,
-                    "timestamp": msg.timestamp,
-                    "rssi": rssi,
-                    "is_own": False
-                }
-            }),
-            state.loop
-        )
-
-def on_status_update(status: str):
-    """Callback para actualizaciones de estado"""
-    if state.loop and state.loop.is_running():
-        asyncio.run_coroutine_threadsafe(
-            state.broadcast({
-                "type": "status",
-                "data": status
-            }),
-            state.loop
-        )
-
-def on_error(error: str):
-    """Callback para errores"""
-    if state.loop and state.loop.is_running():
-        asyncio.run_coroutine_threadsafe(
-            state.broadcast({
-                "type": "error",
-                "data": error
-            }),
-            state.loop
-        )
+    await state.broadcast({
+        "type": "message",
+        "device": device.key,
+        "data": {
+            "id": msg.id,
+            "sender": event.sender,
+            "content": event.text,
+            "timestamp": msg.timestamp,
+            "rssi": event.rssi,
+            "is_own": False,
+            "device": device.key
+        }
+    })
+
+async def on_error(device: Device, event: ErrorEvent):
+    """Error reportado por el dispositivo o pérdida del puerto"""
+    await state.broadcast({
+        "type": "error",
+        "device": device.key,
+        "data": event.raw
+    })
+
+async def on_status_update(device: Device, event: LoRaEvent):
+    """Cualquier otro evento: actualización de estado (agrupada si es repetitiva)"""
+    kind = type(event)
+    if kind is StatusEvent and event.device_id:
+        device.device_id = event.device_id
+    elif kind is ConfigEvent and event.key == "ID":
+        device.device_id = event.value
+    elif kind is RssiEvent and event.rssi is not None:
+        device.rssi = event.rssi
+    
+    state.status.submit(device.key, event, {
+        "type": "status",
+        "device": device.key,
+        "data": status_text(event)
+    })
+
+async def on_pong(device: Device, event: PongEvent):
+    """
+    Respuesta a un PING: el latido del supervisor (cada SERIAL_HEARTBEAT_IDLE
+    de silencio) o /api/link, que devuelve la latencia en su respuesta. Solo
+    cuenta como actividad del enlace (last_rx), no se difunde a los clientes
+    """
+
+def on_link_state(device: Device, link: str, detail: str):
+    """Cambio del enlace supervisado (reconectando / reconectado)"""
+    device.port = device.supervisor.port
+    if link == STATE_CONNECTED:
+        text = f"Dispositivo {device.key} {detail}"
+    elif link == STATE_RECONNECTING:
+        text = f"Reconectando {device.key}: {detail}"
+    else:
+        return
+    state.clients.publish({
+        "type": "status",
+        "device": device.key,
+        "data": text
+    })
+
+_EVENT_HANDLERS = {
+    RxEvent: on_message_received,
+    ErrorEvent: on_error,
+    PongEvent: on_pong,
+}
+
+async def consume_events(device: Device):
+    """Consume los eventos de un dispositivo en el event loop del servidor"""
+    async def handle(event: LoRaEvent):
+        try:
+            await _EVENT_HANDLERS.get(type(event), on_status_update)(device, event)
+        except Exception as e:
+            logger.error(f"❌ Error procesando evento {event!r} de {device.key}: {e}")
+    
+    # Los eventos siguen llegando a través de las reconexiones
+    await device.supervisor.run(handle)
+
+def require_device(key: Optional[str] = None) -> Device:
+    """Devuelve el dispositivo pedido (o el por defecto) si está conectado"""
+    device = state.devices.get(key)
+    if device is None:
+        detail = f"Dispositivo desconocido: {key}" if key else "No conectado al dispositivo"
+        raise HTTPException(status_code=404 if key else 400, detail=detail)
+    if not device.is_connected:
+        raise HTTPException(status_code=400, detail=f"Dispositivo {device.key} sin conexión")
+    return device
 
 # ===================== ENDPOINTS REST =====================
 
@@ -172,88 +602,101 @@ async def get_available_ports():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/ports/detect", status_code=202)
+async def start_port_detection(refresh: bool = False):
+    """
+    Inicia la detección de dispositivos LoRa P2P en segundo plano
+    
+    El progreso llega por WebSocket ("detect_progress" / "detect_done") y el
+    resultado se consulta en /api/ports/detect/{job_id}. Si ya hay una
+    detección en curso se devuelve esa. Los puertos sin cambios responden
+    desde la caché; refresh=true vuelve a sondear todos.
+    """
+    job = start_detection(refresh)
+    return job.result()
+
+@app.get("/api/ports/detect/{job_id}")
+async def get_port_detection(job_id: str):
+    """Estado y resultado de una detección"""
+    job = state.detect_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Detección desconocida: {job_id}")
+    return job.result()
+
 @app.get("/api/ports/detect")
-async def detect_lora_ports():
-    """Detecta automáticamente puertos con dispositivos LoRa P2P mediante PING/PONG"""
-    try:
-        logger.info("🔍 Iniciando detección automática de dispositivos LoRa...")
-        lora_ports = LoRaSerialCommunicator.detect_lora_ports()
-        all_ports = LoRaSerialCommunicator.list_available_ports()
-        
-        if lora_ports:
-            logger.info(f"✅ Dispositivos LoRa detectados: {', '.join(lora_ports)}")
-        else:
-            logger.warning("⚠️  No se detectaron dispositivos LoRa")
-        
-        return {
-            "lora_ports": lora_ports,
-            "all_ports": all_ports,
-            "detected": len(lora_ports) > 0
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def detect_lora_ports(refresh: bool = False):
+    """
+    Detecta automáticamente puertos con dispositivos LoRa P2P mediante PING/PONG
+    
+    Espera el resultado de un trabajo en segundo plano sin bloquear el event loop.
+    """
+    job = start_detection(refresh)
+    await asyncio.shield(job.task)
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=job.error)
+    return {
+        "lora_ports": job.lora_ports,
+        "all_ports": job.all_ports,
+        "detected": len(job.lora_ports) > 0
+    }
 
 @app.post("/api/connect")
 async def connect_device(config: UserConfig):
-    """Conecta al dispositivo LoRa"""
+    """Conecta un dispositivo LoRa (se suma a los ya conectados)"""
     try:
         logger.info(f"🔌 Solicitando conexión a {config.port} para usuario '{config.name}'")
         
-        # Desconectar si ya está conectado
-        if state.communicator and state.is_connected:
-            state.communicator.disconnect()
-        
-        # Crear nuevo comunicador
-        state.communicator = LoRaSerialCommunicator()
-        state.communicator.on_message_received = on_message_received
-        state.communicator.on_status_update = on_status_update
-        state.communicator.on_error = on_error
-        
-        # Conectar
-        if state.communicator.connect(config.port):
-            state.is_connected = True
-            state.user_name = config.name
-            state.current_port = config.port
-            state.start_time = datetime.now()
-            
-            logger.info(f"✅ Conexión exitosa - Usuario: {config.name}, Puerto: {config.port}")
-            
-            return {
-                "success": True,
-                "message": "Conectado exitosamente",
-                "name": config.name,
-                "port": config.port
-            }
-        else:
+        device = await state.devices.connect(config.port, config.name)
+        if device is None:
             raise HTTPException(status_code=500, detail="No se pudo conectar al dispositivo")
+        
+        state.start_time = datetime.now()
+        
+        logger.info(f"✅ Conexión exitosa - Usuario: {config.name}, Puerto: {config.port} "
+                    f"({len(state.devices.devices)} dispositivo(s) activos)")
+        
+        return {
+            "success": True,
+            "message": "Conectado exitosamente",
+            "name": config.name,
+            "port": config.port,
+            "device": device.key
+        }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/disconnect")
-async def disconnect_device():
-    """Desconecta del dispositivo LoRa"""
+async def disconnect_device(selection: Optional[DeviceSelection] = None):
+    """Desconecta un dispositivo LoRa, o todos si no se indica cuál"""
     try:
-        logger.info("🔌 Solicitando desconexión...")
+        key = selection.device if selection else None
+        logger.info(f"🔌 Solicitando desconexión de {key or 'todos los dispositivos'}...")
         
-        if state.communicator:
-            state.communicator.disconnect()
-        
-        state.is_connected = False
-        state.current_port = None
+        if key:
+            device = state.devices.get(key)
+            if device is None:
+                raise HTTPException(status_code=404, detail=f"Dispositivo desconocido: {key}")
+            await state.devices.disconnect(device.key)
+        else:
+            await state.devices.disconnect_all()
         
         logger.info("✅ Desconectado exitosamente")
         
         return {"success": True, "message": "Desconectado"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/send")
 async def send_message(message: Message):
-    """Envía un mensaje vía LoRa"""
+    """Envía un mensaje vía LoRa por el dispositivo indicado (o el por defecto)"""
     try:
-        if not state.is_connected or not state.communicator:
+        if not state.is_connected:
             logger.warning("⚠️  Intento de envío sin conexión activa")
             raise HTTPException(status_code=400, detail="No conectado al dispositivo")
         
@@ -263,29 +706,37 @@ async def send_message(message: Message):
             raise HTTPException(status_code=400, detail="Mensaje demasiado largo (máx 96 caracteres)")
         
         logger.info(f"📤 API: Solicitando envío de mensaje de '{message.sender}': {message.content}")
-        if not state.is_connected or not state.communicator:
-            raise HTTPException(status_code=400, detail="No hay conexión con el dispositivo")
+        device = require_device(message.device)
         
-        if not state.user_name:
+        if not device.user_name:
             raise HTTPException(status_code=400, detail="Nombre de usuario no configurado")
         
-        # Enviar mensaje
-        if state.communicator.send_message(state.user_name, message.content):
+        # Enviar mensaje (queda en cola hasta que el canal esté libre)
+        try:
+            queued = await device.communicator.send_message(device.user_name, message.content)
+        except TxQueueFullError as e:
+            logger.warning(f"⚠️  {e}")
+            raise HTTPException(status_code=429, detail=str(e))
+        
+        if queued:
             # Agregar al historial
-            msg = state.add_message(state.user_name, message.content)
+            msg = state.add_message(device.user_name, message.content, device=device.key)
             
             # Broadcast a todos los clientes
             await state.broadcast({
                 "type": "message",
+                "device": device.key,
                 "data": {
-                    "sender": state.user_name,
+                    "id": msg.id,
+                    "sender": device.user_name,
                     "content": message.content,
                     "timestamp": msg.timestamp,
-                    "is_own": True
+                    "is_own": True,
+                    "device": device.key
                 }
             })
             
-            return {"success": True, "message": "Mensaje enviado"}
+            return {"success": True, "message": "Mensaje enviado", "device": device.key}
         else:
             raise HTTPException(status_code=500, detail="Error al enviar mensaje")
     
@@ -295,49 +746,129 @@ async def send_message(message: Message):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/messages")
-async def get_messages():
-    """Obtiene el historial de mensajes"""
+async def get_messages(request: Request, response: Response,
+                       after: Optional[int] = Query(None, ge=0, description="Solo mensajes con ID mayor"),
+                       before: Optional[int] = Query(None, ge=1, description="Solo mensajes con ID menor"),
+                       limit: int = Query(100, ge=1, le=MESSAGES_PAGE_LIMIT),
+                       sender: Optional[str] = Query(None, description="Solo mensajes de este remitente")):
+    """
+    Obtiene el historial de mensajes paginado por ID
+    
+    Sin cursores devuelve los últimos `limit`; con `after` los siguientes a
+    ese ID (para traer solo lo nuevo) y con `before` los anteriores; `sender`
+    filtra por remitente con el índice en memoria. Responde
+    304 si el ETag enviado en If-None-Match sigue vigente.
+    """
+    # La respuesta solo cambia con un mensaje nuevo o con otros usuarios (is_own)
+    etag = f'W/"{state.instance}-{state.last_seq}-{state.devices.names_tag:08x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    messages = await state.page(after, before, limit, sender)
     return {
         "messages": [
             {
+                "id": msg.id,
                 "sender": msg.sender,
                 "content": msg.content,
                 "timestamp": msg.timestamp,
-                "is_own": msg.sender == state.user_name
+                "is_own": state.devices.is_own(msg.sender, msg.device),
+                "device": msg.device
             }
-            for msg in state.messages
-        ]
+            for msg in messages
+        ],
+        "last_seq": state.last_seq,
+        "has_more": len(messages) == limit
     }
 
 @app.get("/api/status")
 async def get_status():
-    """Obtiene el estado del sistema"""
+    """Obtiene el estado del sistema y de cada dispositivo"""
     uptime = datetime.now() - state.start_time
+    default = state.devices.get()
     
     return {
         "connected": state.is_connected,
-        "port": state.current_port,
-        "user_name": state.user_name,
+        "port": default.port if default else None,
+        "user_name": state.devices.default_user_name,
         "rssi": state.rssi,
         "messages_count": len(state.messages),
-        "uptime": str(uptime).split('.')[0]
+        "uptime": str(uptime).split('.')[0],
+        "devices": [device.status() for device in state.devices.devices.values()],
+        "debug_counts": dict(state.status.debug_totals),
+        "status_suppressed": state.status.suppressed,
+        "history": {
+            "written": state.history.written,
+            "pending": state.history.pending,
+            "dropped": state.history.dropped
+        } if state.history else None
     }
 
+@app.get("/api/link")
+async def get_link_metrics(device: Optional[str] = None):
+    """Consulta al dispositivo RSSI, ID y latencia del enlace serial"""
+    target = require_device(device)
+    
+    try:
+        rtt = await target.communicator.ping()
+        status = await target.communicator.query_status()
+        rssi = await target.communicator.query_rssi()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El dispositivo no respondió a tiempo")
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if status.device_id:
+        target.device_id = status.device_id
+    if rssi is not None:
+        target.rssi = rssi
+    
+    return {
+        "device": target.key,
+        "device_id": status.device_id,
+        "rssi": rssi,
+        "serial_rtt_ms": round(rtt * 1000, 2)
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas en el formato de texto de Prometheus (se arman al consultar)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # ===================== WEBSOCKET =====================
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket para comunicación en tiempo real"""
+async def websocket_endpoint(websocket: WebSocket, last_seq: Optional[int] = None,
+                             epoch: Optional[str] = None):
+    """
+    WebSocket para comunicación en tiempo real
+    
+    Al reconectarse, el cliente envía el último "seq" recibido y el "epoch"
+    del servidor: se le reenvía lo que se perdió desde el registro de
+    eventos recientes, o un "resync" si ya no está (debe recargar por REST).
+    """
     await websocket.accept()
-    state.active_connections.append(websocket)
+    state.clients.add(websocket)
     
     try:
+        # Sin esperas entre el alta, la reanudación y el estado inicial: ningún
+        # evento difundido en el medio se pierde ni se duplica
+        if last_seq is not None:
+            resumed = epoch == state.clients.epoch and state.clients.replay(websocket, last_seq)
+            if not resumed:
+                state.clients.send(websocket, {"type": "resync"})
+        
         # Enviar estado actual al conectarse
-        await websocket.send_json({
+        state.clients.send(websocket, {
             "type": "status",
+            "seq": state.clients.seq,
+            "epoch": state.clients.epoch,
             "data": {
                 "connected": state.is_connected,
-                "user_name": state.user_name
+                "user_name": state.devices.default_user_name,
+                "devices": list(state.devices.devices)
             }
         })
         
@@ -348,14 +879,14 @@ async def websocket_endpoint(websocket: WebSocket):
             
             # Echo para keep-alive
             if data == "ping":
-                await websocket.send_text("pong")
+                state.clients.send(websocket, "pong")
     
     except WebSocketDisconnect:
-        state.active_connections.remove(websocket)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
-        if websocket in state.active_connections:
-            state.active_connections.remove(websocket)
+    finally:
+        state.clients.remove(websocket)
 
 # ===================== ARCHIVOS ESTÁTICOS =====================
 
@@ -367,9 +898,8 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.on_event("startup")
 async def startup_event():
     """Eventos al iniciar la aplicación"""
-    # Guardar el event loop para usarlo en callbacks desde threads
-    state.loop = asyncio.get_running_loop()
-    
+    state.status.start()
+    await state.open_history()
     print("=" * 50)
     print("🚀 LoRa P2P Chat Web Server Starting...")
     print("=" * 50)
@@ -381,8 +911,10 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Eventos al cerrar la aplicación"""
-    if state.communicator and state.is_connected:
-        state.communicator.disconnect()
+    await state.devices.disconnect_all()
+    await state.status.stop()
+    await state.clients.close_all()
+    await state.close_history()
     print("\n👋 LoRa P2P Chat Web Server Stopped")
 
 # ===================== EJECUCIÓN =====================
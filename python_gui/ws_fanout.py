@@ -0,0 +1,218 @@
+"""
+Difusión de eventos a clientes WebSocket
+Cada cliente tiene una cola de salida acotada y su propia tarea escritora,
+así un navegador lento o colgado no retrasa a los demás ni al camino de
+los eventos seriales. Los eventos difundidos llevan un número de secuencia
+y los últimos se guardan para reenviarlos a quien se reconecta
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+from metrics import BROADCAST_SECONDS
+
+try:
+    import orjson
+except ImportError:  # Opcional: JSON más rápido si está instalado
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Política con clientes que no consumen a tiempo (cola llena)
+SLOW_CLIENT_DROP = "drop"   # Desconectar al cliente
+SLOW_CLIENT_SKIP = "skip"   # Descartar sus eventos más antiguos y seguir
+
+CLIENT_QUEUE_SIZE = 256     # Eventos pendientes por cliente
+SEND_TIMEOUT = 5.0          # Tiempo máximo de un envío antes de dar al cliente por muerto
+REPLAY_LOG_SIZE = 200       # Eventos recientes que se guardan para reanudar sesiones
+
+
+def encode_event(event: Any) -> str:
+    """
+    Serializa un evento a texto JSON (con orjson si está disponible)
+
+    Mismo formato compacto que WebSocket.send_json de Starlette.
+    """
+    if orjson is not None:
+        return orjson.dumps(event).decode('utf-8')
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+
+
+class ClientSession:
+    """Cliente WebSocket con su cola de salida y su tarea escritora"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        # (texto, instante de difusión en ns o 0 si es un envío individual)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.skipped = 0
+        self.closed = False
+
+
+class WebSocketFanout:
+    """Reparte cada evento a todos los clientes sin esperar a ninguno"""
+
+    def __init__(self, queue_size: int = CLIENT_QUEUE_SIZE,
+                 slow_client_policy: str = SLOW_CLIENT_DROP,
+                 send_timeout: float = SEND_TIMEOUT,
+                 replay_size: int = REPLAY_LOG_SIZE):
+        """
+        Args:
+            queue_size: Eventos pendientes por cliente antes de aplicar la política
+            slow_client_policy: SLOW_CLIENT_DROP o SLOW_CLIENT_SKIP
+            send_timeout: Tiempo máximo de un envío individual en segundos
+            replay_size: Eventos recientes guardados para reanudar sesiones
+        """
+        if slow_client_policy not in (SLOW_CLIENT_DROP, SLOW_CLIENT_SKIP):
+            raise ValueError(f"Política de cliente lento inválida: {slow_client_policy}")
+
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.send_timeout = send_timeout
+        self.clients: Dict[WebSocket, ClientSession] = {}
+        self.dropped_clients = 0
+
+        # Secuencia de eventos difundidos; `epoch` cambia en cada arranque
+        self.seq = 0
+        self.epoch = format(time.time_ns() // 1_000_000, 'x')
+        self._replay: deque = deque(maxlen=replay_size)
+
+    def __len__(self):
+        return len(self.clients)
+
+    def add(self, websocket: WebSocket) -> ClientSession:
+        """Registra un WebSocket ya aceptado e inicia su tarea escritora"""
+        session = ClientSession(websocket, self.queue_size)
+        session.writer_task = asyncio.create_task(self._writer(session))
+        self.clients[websocket] = session
+        return session
+
+    def remove(self, websocket: WebSocket):
+        """Da de baja a un cliente y detiene su tarea escritora"""
+        session = self.clients.pop(websocket, None)
+        if session is None or session.closed:
+            return
+        session.closed = True
+        if session.writer_task and session.writer_task is not asyncio.current_task():
+            session.writer_task.cancel()
+
+    def send(self, websocket: WebSocket, item: Any):
+        """
+        Encola un envío para un solo cliente
+
+        Args:
+            item: Evento (se serializa a JSON) o str (se envía tal cual)
+        """
+        session = self.clients.get(websocket)
+        if session:
+            self._enqueue(session, (item if isinstance(item, str) else encode_event(item), 0))
+
+    def publish(self, item: Any):
+        """
+        Encola un evento para todos los clientes (no bloquea)
+
+        El evento recibe el siguiente número de secuencia (campo "seq"), se
+        serializa una sola vez y el mismo texto se envía a cada cliente.
+
+        Args:
+            item: Evento (se serializa a JSON) o str (se envía tal cual)
+        """
+        self.seq += 1
+        if isinstance(item, dict):
+            item = {**item, "seq": self.seq}
+        if not self.clients:
+            # Sin clientes se guarda sin serializar: solo se paga si alguien lo pide
+            self._replay.append((self.seq, item))
+            return
+        payload = item if isinstance(item, str) else encode_event(item)
+        self._replay.append((self.seq, payload))
+        # El instante de difusión viaja con el texto para medir la entrega
+        entry = (payload, time.perf_counter_ns())
+        for session in list(self.clients.values()):
+            self._enqueue(session, entry)
+
+    def replay(self, websocket: WebSocket, last_seq: int) -> bool:
+        """
+        Encola para un cliente los eventos posteriores a `last_seq`
+
+        Returns:
+            False si esos eventos ya no están en el registro (o no caben en
+            la cola del cliente) y debe resincronizar por REST
+        """
+        session = self.clients.get(websocket)
+        if session is None or last_seq > self.seq:
+            return False
+        missed = self.seq - last_seq
+        if missed == 0:
+            return True
+        if missed > len(self._replay) or missed >= self.queue_size:
+            return False
+
+        for _, payload in islice(self._replay, len(self._replay) - missed, None):
+            self._enqueue(session, (payload if isinstance(payload, str) else encode_event(payload), 0))
+        return True
+
+    async def close_all(self):
+        """Detiene todas las tareas escritoras"""
+        tasks = [session.writer_task for session in self.clients.values() if session.writer_task]
+        for websocket in list(self.clients):
+            self.remove(websocket)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _enqueue(self, session: ClientSession, item: Tuple[Any, int]):
+        try:
+            session.queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_client_policy == SLOW_CLIENT_SKIP:
+            # Descartar el evento más antiguo para hacer lugar al nuevo
+            session.queue.get_nowait()
+            session.queue.put_nowait(item)
+            session.skipped += 1
+        else:
+            logger.warning(f"⚠️  Cliente WebSocket lento desconectado "
+                           f"({self.queue_size} eventos pendientes)")
+            self.dropped_clients += 1
+            self._drop(session)
+
+    def _drop(self, session: ClientSession):
+        self.remove(session.websocket)
+        asyncio.create_task(self._close_quietly(session.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def _writer(self, session: ClientSession):
+        websocket = session.websocket
+        try:
+            # wait_for puede tragarse la cancelación si el envío termina a la vez
+            while not session.closed:
+                item, published = await session.queue.get()
+                if isinstance(item, str):
+                    send = websocket.send_text(item)
+                else:
+                    send = websocket.send_json(item)
+                await asyncio.wait_for(send, self.send_timeout)
+                if published:
+                    BROADCAST_SECONDS.observe((time.perf_counter_ns() - published) / 1e9)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Socket muerto o envío colgado: limpiar de inmediato
+            logger.info(f"Cliente WebSocket eliminado: {e!r}")
+            self.remove(websocket)
+            await self._close_quietly(websocket)